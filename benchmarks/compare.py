@@ -0,0 +1,48 @@
+"""Compare two sets of benchmark suite results
+
+Run with:
+
+    python -m benchmarks.compare old.json new.json
+
+Results are matched by name and params. For each, the median time of both
+runs is shown along with the ratio of new to old (below 1 is faster).
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, Tuple
+
+
+def result_key(result: Dict) -> Tuple:
+    return (result["name"],) + tuple(sorted(result["params"].items()))
+
+
+def load_results(path: Path) -> Dict[Tuple, Dict]:
+    results = json.loads(path.read_text())["results"]
+    return {result_key(result): result for result in results}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    args = parser.parse_args(args)
+
+    old_results = load_results(args.old)
+    new_results = load_results(args.new)
+    print(f"{'benchmark':<80} {'old':>10} {'new':>10} {'ratio':>6}")
+    for key, new_result in new_results.items():
+        old_result = old_results.get(key)
+        if old_result is None:
+            continue
+        name = ", ".join([key[0]] + [f"{k}={v}" for k, v in key[1:]])
+        old_time = old_result["seconds_median"]
+        new_time = new_result["seconds_median"]
+        print(
+            f"{name:<80} {old_time * 1000:>8.3f}ms {new_time * 1000:>8.3f}ms "
+            f"{new_time / old_time:>6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
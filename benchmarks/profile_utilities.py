@@ -0,0 +1,94 @@
+"""Compare the scalar and array versions of the profile utilities
+
+Run with:
+
+    python -m benchmarks.profile_utilities [--points N] [--repeat N]
+
+Each operation is run over a synthetic profile of the given number of points,
+once per point using the scalar (math based) functions, and once using the
+array (numpy based) functions. The best time of each is reported.
+"""
+import argparse
+import timeit
+
+import numpy
+
+from srtm.utilities import (
+    ElevationProfile,
+    apply_curvature,
+    apply_curvature_array,
+    get_clearances,
+    get_clearances_array,
+    haversine,
+    haversine_array,
+)
+
+
+def make_profile(points: int) -> ElevationProfile:
+    latitudes = numpy.linspace(40.1, 40.9, points)
+    longitudes = numpy.linspace(-7.9, -6.1, points)
+    elevations = 500 + 200 * numpy.sin(numpy.linspace(0, 20, points))
+    distances = haversine_array(latitudes[0], longitudes[0], latitudes, longitudes)
+    return ElevationProfile(latitudes, longitudes, elevations, distances)
+
+
+def make_benchmarks(profile: ElevationProfile):
+    """Get a list of (name, scalar function, array function)"""
+    points = profile.to_points()
+    start_latitude = points[0].latitude
+    start_longitude = points[0].longitude
+
+    def haversine_scalar():
+        return [
+            haversine(start_latitude, start_longitude, p.latitude, p.longitude)
+            for p in points
+        ]
+
+    def haversine_vectorised():
+        return haversine_array(
+            start_latitude, start_longitude, profile.latitudes, profile.longitudes
+        )
+
+    return [
+        ("haversine", haversine_scalar, haversine_vectorised),
+        (
+            "apply_curvature",
+            lambda: apply_curvature(points),
+            lambda: apply_curvature_array(
+                profile.latitudes, profile.longitudes, profile.elevations
+            ),
+        ),
+        (
+            "get_clearances",
+            lambda: get_clearances(points, 10, 10),
+            lambda: get_clearances_array(profile, 10, 10),
+        ),
+    ]
+
+
+def best_time(function, repeat: int) -> float:
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    profile = make_profile(args.points)
+    print(f"{args.points} points, best of {args.repeat}")
+    print(f"{'':<16} {'scalar':>12} {'array':>12} {'speedup':>8}")
+    for name, scalar, vectorised in make_benchmarks(profile):
+        scalar_time = best_time(scalar, args.repeat)
+        array_time = best_time(vectorised, args.repeat)
+        print(
+            f"{name:<16} {scalar_time * 1000:>10.3f}ms {array_time * 1000:>10.3f}ms "
+            f"{scalar_time / array_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
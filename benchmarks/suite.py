@@ -0,0 +1,367 @@
+"""Run the benchmark suite against synthetic tiles, writing JSON results
+
+Run with:
+
+    python -m benchmarks.suite --output results.json [--quick]
+
+Synthetic SRTM1 and SRTM3 tiles are generated in plain, zipped and
+block-compressed forms (in a temporary directory unless --data-dir is given,
+in which case existing tiles are reused). Each benchmark records timings of
+several repeats, and the peak memory traced by tracemalloc during one further,
+untimed repeat. Results from different releases can be compared by benchmark
+name and params.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from random import Random
+from typing import Callable, Dict, List
+
+import numpy
+
+from benchmarks.profile_utilities import make_benchmarks, make_profile
+from benchmarks.tiles import write_placeholder_tiles, write_tiles
+from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.height_map_collection import (
+    HeightMapCollection,
+    Srtm1HeightMapCollection,
+    Srtm3HeightMapCollection,
+)
+from srtm.utilities import get_clearances_array
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+RESULTS_VERSION = 1
+COLLECTION_CLASSES = {
+    "srtm1": Srtm1HeightMapCollection,
+    "srtm3": Srtm3HeightMapCollection,
+}
+FORMS = ("plain", "zipped", "blocks")
+# Two tiles side by side, so that lookups & profiles may cross between them
+TILE_BASES = [RasterBaseCoordinates(40, -8), RasterBaseCoordinates(40, -7)]
+
+
+def measure(
+    function: Callable, repeat: int, number: int = 1, setup: Callable = None
+) -> Dict:
+    """Time function, returning a dict of timings & peak memory
+
+    function is called number times per repeat, and timings are per call.
+    setup is called before each repeat, and is not timed. Its return value is
+    passed to function.
+    """
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        for _ in range(number):
+            function(argument)
+        timings.append((time.perf_counter() - start) / number)
+
+    argument = setup() if setup else None
+    tracemalloc.start()
+    try:
+        function(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "repeat": repeat,
+        "number": number,
+        "seconds_min": min(timings),
+        "seconds_median": statistics.median(timings),
+        "seconds_mean": statistics.mean(timings),
+        "peak_traced_bytes": peak,
+    }
+
+
+def result(name: str, params: Dict, timings: Dict, items: int = None) -> Dict:
+    """Create a result record. items is the number of items processed per call"""
+    record = {"name": name, "params": params, **timings}
+    if items is not None:
+        record["items_per_second"] = items / timings["seconds_median"]
+    return record
+
+
+def random_points(collection: HeightMapCollection, count: int, seed: int = 1):
+    """Random points within the benchmark tiles, avoiding the outermost pixels"""
+    random = Random(seed)
+    margin = 2 / collection.height_map_class.values_per_row
+    min_longitude = TILE_BASES[0].longitude + margin
+    max_longitude = TILE_BASES[-1].longitude + 1 - margin
+    latitudes = [random.uniform(40 + margin, 41 - margin) for _ in range(count)]
+    longitudes = [random.uniform(min_longitude, max_longitude) for _ in range(count)]
+    return latitudes, longitudes
+
+
+def bench_get_altitude(collection, params: Dict, quick: bool) -> List[Dict]:
+    results = []
+    latitudes, longitudes = random_points(collection, 1000 if quick else 10000)
+    collection.load_area(TILE_BASES[0], TILE_BASES[-1])
+
+    for interpolation in ("nearest", "bilinear"):
+        points = list(zip(latitudes, longitudes))
+
+        def get_altitudes_one_by_one(_):
+            for latitude, longitude in points:
+                collection.get_altitude(
+                    latitude, longitude, interpolation=interpolation
+                )
+
+        timings = measure(get_altitudes_one_by_one, repeat=3)
+        results.append(
+            result(
+                "get_altitude",
+                {**params, "interpolation": interpolation, "points": len(points)},
+                timings,
+                items=len(points),
+            )
+        )
+
+    for count in (1000, 100000) if quick else (1000, 100000, 1000000):
+        batch_latitudes, batch_longitudes = random_points(collection, count, seed=2)
+        batch_latitudes = numpy.array(batch_latitudes)
+        batch_longitudes = numpy.array(batch_longitudes)
+        for interpolation in ("nearest", "bilinear"):
+            timings = measure(
+                lambda _: collection.get_altitudes(
+                    batch_latitudes, batch_longitudes, interpolation=interpolation
+                ),
+                repeat=3,
+            )
+            results.append(
+                result(
+                    "get_altitudes",
+                    {**params, "interpolation": interpolation, "points": count},
+                    timings,
+                    items=count,
+                )
+            )
+    return results
+
+
+def bench_ensure_loaded(collection, params: Dict, quick: bool) -> List[Dict]:
+    results = []
+    path = next(iter(collection.height_maps.values())).path
+    use_mmap_options = (False,) if params["form"] == "zipped" else (False, True)
+    for use_mmap in use_mmap_options:
+        collection.use_mmap = use_mmap
+        timings = measure(
+            lambda height_map: height_map.ensure_loaded(),
+            repeat=3 if quick else 10,
+            setup=lambda: collection._make_height_map(path),
+        )
+        results.append(
+            result("ensure_loaded", {**params, "use_mmap": use_mmap}, timings)
+        )
+    return results
+
+
+def bench_get_elevation_profile(collection, params: Dict, quick: bool) -> List[Dict]:
+    results = []
+    values_per_degree = collection.height_map_class.values_per_row
+    max_length = len(TILE_BASES) * (values_per_degree - 1)
+    lengths = [length for length in (100, 1000, 10000) if length < max_length]
+    collection.load_area(TILE_BASES[0], TILE_BASES[-1])
+
+    for length in lengths:
+        # A shallow diagonal, with length + 1 points
+        start = (40.2, TILE_BASES[0].longitude + 0.01)
+        end = (
+            start[0] + length / values_per_degree / 4,
+            start[1] + length / values_per_degree,
+        )
+        for method in ("get_elevation_profile", "get_elevation_profile_arrays"):
+            get_profile = getattr(collection, method)
+            timings = measure(
+                lambda _: get_profile(*start, *end), repeat=3, number=3 if quick else 10
+            )
+            results.append(
+                result(method, {**params, "length": length}, timings, items=length + 1)
+            )
+    return results
+
+
+def bench_has_line_of_sight(collection, params: Dict, quick: bool) -> List[Dict]:
+    results = []
+    collection.load_area(TILE_BASES[0], TILE_BASES[-1])
+    latitudes, longitudes = random_points(collection, 40 if quick else 200, seed=3)
+    links = list(
+        zip(latitudes[::2], longitudes[::2], latitudes[1::2], longitudes[1::2])
+    )
+    # High enough to clear everything, within the terrain, and buried
+    for offset in (2000, 100, -2000):
+
+        def check_exactly(_):
+            for link in links:
+                profile = collection.get_elevation_profile_arrays(*link)
+                (get_clearances_array(profile, offset, offset) >= 0).all()
+
+        def check_with_extrema(_):
+            for link in links:
+                collection.has_line_of_sight(*link, offset, offset)
+
+        for method, function in (
+            ("get_clearances_array", check_exactly),
+            ("has_line_of_sight", check_with_extrema),
+        ):
+            timings = measure(function, repeat=3)
+            results.append(
+                result(
+                    method,
+                    {**params, "links": len(links), "offset": offset},
+                    timings,
+                    items=len(links),
+                )
+            )
+    return results
+
+
+def bench_get_viewshed(collection, params: Dict, quick: bool) -> List[Dict]:
+    results = []
+    collection.load_area(TILE_BASES[0], TILE_BASES[-1])
+    for radius in (2000, 5000) if quick else (2000, 5000, 10000):
+        timings = measure(
+            lambda _: collection.get_viewshed(40.5, -7.0, radius, observer_height=10),
+            repeat=3,
+        )
+        results.append(result("get_viewshed", {**params, "radius": radius}, timings))
+    return results
+
+
+def bench_build_file_index(data_dir: Path, quick: bool) -> List[Dict]:
+    results = []
+    for count in (10, 100, 1000) if quick else (10, 100, 1000, 10000):
+        hgt_dir = data_dir / "index" / str(count)
+        if not hgt_dir.exists():
+            write_placeholder_tiles(hgt_dir, count)
+        collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, auto_build_index=False)
+        timings = measure(lambda _: collection.build_file_index(), repeat=3)
+        results.append(
+            result("build_file_index", {"tiles": count}, timings, items=count)
+        )
+    return results
+
+
+def bench_utilities(quick: bool) -> List[Dict]:
+    results = []
+    points = 1000 if quick else 10000
+    for name, scalar, vectorised in make_benchmarks(make_profile(points)):
+        for path, function in (("scalar", scalar), ("array", vectorised)):
+            timings = measure(lambda _: function(), repeat=3, number=3)
+            results.append(
+                result(name, {"path": path, "points": points}, timings, items=points)
+            )
+    return results
+
+
+TILE_BENCHMARKS = [bench_ensure_loaded]
+LOADED_BENCHMARKS = [
+    bench_get_altitude,
+    bench_get_elevation_profile,
+    bench_has_line_of_sight,
+    bench_get_viewshed,
+]
+
+
+def run(data_dir: Path, resolutions: List[str], quick: bool) -> List[Dict]:
+    results = []
+    for resolution in resolutions:
+        collection_class = COLLECTION_CLASSES[resolution]
+        for form in FORMS:
+            hgt_dir = data_dir / resolution / form
+            if not hgt_dir.exists():
+                print(f"Writing {form} {resolution} tiles", file=sys.stderr)
+                write_tiles(
+                    hgt_dir, collection_class.height_map_class, TILE_BASES, form
+                )
+            params = {"resolution": resolution, "form": form}
+            benchmarks = TILE_BENCHMARKS
+            if form != "zipped":
+                # Once loaded, zipped tiles are the same as plain tiles
+                benchmarks = benchmarks + LOADED_BENCHMARKS
+            for benchmark in benchmarks:
+                print(f"Running {benchmark.__name__} {params}", file=sys.stderr)
+                collection = collection_class(hgt_dir=hgt_dir)
+                results.extend(benchmark(collection, params, quick))
+
+    print("Running bench_build_file_index", file=sys.stderr)
+    results.extend(bench_build_file_index(data_dir, quick))
+    print("Running bench_utilities", file=sys.stderr)
+    results.extend(bench_utilities(quick))
+    return results
+
+
+def environment() -> Dict:
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+
+        srtm_version = version("python-srtm")
+    except (ImportError, PackageNotFoundError):
+        srtm_version = None
+
+    return {
+        "srtm_version": srtm_version,
+        "python_version": platform.python_version(),
+        "numpy_version": numpy.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def max_rss_bytes():
+    """The peak resident set size of this process, where available"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", type=Path, help="Defaults to standard output")
+    parser.add_argument("--data-dir", type=Path, help="Where to write tiles")
+    parser.add_argument("--label", help="Recorded in the results, e.g. a release")
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        choices=sorted(COLLECTION_CLASSES),
+        default=sorted(COLLECTION_CLASSES),
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Fewer points, lengths & repeats"
+    )
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory(prefix="srtm-benchmarks-") as temporary_dir:
+        data_dir = args.data_dir or Path(temporary_dir)
+        results = run(data_dir, args.resolutions, args.quick)
+
+    output = {
+        "version": RESULTS_VERSION,
+        "label": args.label,
+        "quick": args.quick,
+        "environment": environment(),
+        "max_rss_bytes": max_rss_bytes(),
+        "results": results,
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
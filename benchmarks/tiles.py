@@ -0,0 +1,81 @@
+"""Generate synthetic HGT tiles for benchmarking
+
+Tiles contain smooth, hilly terrain derived from their global pixel positions,
+so neighbouring tiles join up seamlessly and zipped tiles compress about as
+well as real data would.
+"""
+from pathlib import Path
+from typing import Iterable, List, Type
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import numpy
+
+from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.block_format import BLOCK_FILE_SUFFIX, compress_raster
+from srtm.height_maps import HeightMap
+
+
+def synthetic_terrain(base: RasterBaseCoordinates, values_per_row: int):
+    """Create a raster of hilly terrain for the tile with the given base coordinates"""
+    pixel_width = 1 / (values_per_row - 1)
+    offsets = numpy.arange(values_per_row) * pixel_width
+    latitudes = (base.latitude + 1 - offsets).reshape(-1, 1)
+    longitudes = (base.longitude + offsets).reshape(1, -1)
+    terrain = (
+        800
+        + 400 * numpy.sin(latitudes * 7) * numpy.cos(longitudes * 5)
+        + 150 * numpy.sin(latitudes * 31 + longitudes * 23)
+        + 20 * numpy.cos(latitudes * 173) * numpy.sin(longitudes * 157)
+    )
+    return terrain.astype(">i2")
+
+
+def write_tile(
+    hgt_dir: Path,
+    height_map_class: Type[HeightMap],
+    base: RasterBaseCoordinates,
+    form: str = "plain",
+) -> Path:
+    """Write one synthetic tile into hgt_dir, returning its path
+
+    form is "plain" (.hgt), "zipped" (.hgt.zip) or "blocks" (block-compressed)
+    """
+    hgt_dir.mkdir(parents=True, exist_ok=True)
+    values_per_row = height_map_class.values_per_row
+    data = synthetic_terrain(base, values_per_row).tobytes()
+    if form == "blocks":
+        path = hgt_dir / f"{base.file_name}{BLOCK_FILE_SUFFIX}"
+        path.write_bytes(compress_raster(data, values_per_row))
+    elif form == "zipped":
+        path = hgt_dir / f"{base.file_name}.hgt.zip"
+        with ZipFile(path, "w", compression=ZIP_DEFLATED) as zip_file:
+            zip_file.writestr(f"{base.file_name}.hgt", data)
+    else:
+        path = hgt_dir / f"{base.file_name}.hgt"
+        path.write_bytes(data)
+    return path
+
+
+def write_tiles(
+    hgt_dir: Path,
+    height_map_class: Type[HeightMap],
+    bases: Iterable[RasterBaseCoordinates],
+    form: str = "plain",
+) -> List[Path]:
+    return [write_tile(hgt_dir, height_map_class, base, form) for base in bases]
+
+
+def write_placeholder_tiles(hgt_dir: Path, count: int) -> List[Path]:
+    """Write count empty, correctly named tiles
+
+    Building the file index only looks at file names, so this allows indexing
+    to be measured against many tiles without writing gigabytes of data.
+    """
+    hgt_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for n in range(count):
+        base = RasterBaseCoordinates(latitude=n // 360 - 60, longitude=n % 360 - 180)
+        path = hgt_dir / f"{base.file_name}.hgt.zip"
+        path.touch()
+        paths.append(path)
+    return paths
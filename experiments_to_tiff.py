@@ -1,7 +1,9 @@
-import gdal
 import numpy
 import pickle
 
+from srtm.export import write_raster
+from srtm.utilities import GeoTransform
+
 
 with open("can_be_seen_counts.pickle", "rb") as f:
     data = pickle.load(f)
@@ -10,18 +12,15 @@ rows = 1201
 cols = 1201
 base_lat = 40.064531
 base_long = -7.462507
+cellsize = 1 / 1200
 
-with open("can_be_seen_counts.asc", "w") as f:
-    f.write(f"ncols         {cols}\n")
-    f.write(f"nrows         {rows}\n")
-    f.write(f"xllcorner     {base_long}\n")
-    f.write(f"yllcorner     {base_lat}\n")
-    f.write(f"cellsize      {1/1200}\n")
-    f.write(f"NODATA_value  {-1}")
-    for n, v in enumerate(data.values()):
-        if n % 1201 == 0:
-            f.write("\n")
-        else:
-            f.write(" ")
-        f.write(str(v))
-
+counts = numpy.fromiter(data.values(), dtype=numpy.int32, count=rows * cols)
+# The base is the south-west corner, whereas geotransforms give pixel centres
+geotransform = GeoTransform(
+    north_latitude=base_lat + (rows - 0.5) * cellsize,
+    west_longitude=base_long + cellsize / 2,
+    pixel_width=cellsize,
+)
+counts = counts.reshape(rows, cols)
+write_raster("can_be_seen_counts.tif", counts, geotransform, nodata=-1)
+write_raster("can_be_seen_counts.asc", counts, geotransform, nodata=-1)
@@ -1,4 +1,5 @@
 from srtm.height_map_collection import (
+    LayeredHeightMapCollection,
     Srtm1HeightMapCollection,
     Srtm3HeightMapCollection,
 )
@@ -0,0 +1,181 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Dict, List, Set
+
+from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.height_map_collection import HeightMapCollection
+from srtm.height_maps import HeightMap
+from srtm.utilities import ElevationProfilePoint, points_on_line, require_numpy
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+class AsyncHeightMapCollection:
+    """ An asyncio facade over a HeightMapCollection
+
+    Height maps are loaded in an executor (the event loop's default executor
+    if none is given), so reading or unzipping a file never blocks the event
+    loop. Concurrent requests which need the same height map share a single
+    load. Once the height maps are loaded, queries are answered on the event
+    loop, as they only read data which is already in memory.
+
+    Set max_loaded_tiles on the collection comfortably above the number of
+    height maps needed by concurrent requests. Otherwise a height map may be
+    evicted between being loaded and being queried, in which case it is
+    reloaded on the event loop.
+    """
+
+    def __init__(self, collection: HeightMapCollection, executor: Executor = None):
+        self.collection = collection
+        self.executor = executor
+        self._pending_loads: Dict[RasterBaseCoordinates, asyncio.Future] = {}
+
+    async def aget_altitude(
+        self,
+        latitude: float,
+        longitude: float,
+        interpolation: str = "nearest",
+        void_value=None,
+    ):
+        """Async version of HeightMapCollection.get_altitude()"""
+        await self._load_for_points([latitude], [longitude], interpolation)
+        return self.collection.get_altitude(
+            latitude, longitude, interpolation=interpolation, void_value=void_value
+        )
+
+    async def aget_altitudes(
+        self,
+        latitudes,
+        longitudes,
+        fill_value=None,
+        interpolation: str = "nearest",
+        void_value=None,
+    ):
+        """Async version of HeightMapCollection.get_altitudes(). Requires numpy"""
+        require_numpy()
+        if not hasattr(latitudes, "__len__"):
+            latitudes = list(latitudes)
+        if not hasattr(longitudes, "__len__"):
+            longitudes = list(longitudes)
+        await self._load_for_points(latitudes, longitudes, interpolation)
+        return self.collection.get_altitudes(
+            latitudes,
+            longitudes,
+            fill_value=fill_value,
+            interpolation=interpolation,
+            void_value=void_value,
+        )
+
+    async def aget_elevation_profile(
+        self,
+        start_latitude: float,
+        start_longitude: float,
+        end_latitude: float,
+        end_longitude: float,
+        apply_earth_curvature=True,
+        interpolation: str = "nearest",
+        voids: str = "nan",
+    ) -> List[ElevationProfilePoint]:
+        """Async version of HeightMapCollection.get_elevation_profile()"""
+        values_per_degree = self.collection.height_map_class.values_per_row
+        points = points_on_line(
+            x1=round(start_latitude * values_per_degree),
+            y1=round(start_longitude * values_per_degree),
+            x2=round(end_latitude * values_per_degree),
+            y2=round(end_longitude * values_per_degree),
+        )
+        await self._load_for_points(
+            [x / values_per_degree for x, _ in points],
+            [y / values_per_degree for _, y in points],
+            interpolation,
+        )
+        return self.collection.get_elevation_profile(
+            start_latitude,
+            start_longitude,
+            end_latitude,
+            end_longitude,
+            apply_earth_curvature=apply_earth_curvature,
+            interpolation=interpolation,
+            voids=voids,
+        )
+
+    async def _load_for_points(self, latitudes, longitudes, interpolation: str):
+        """Load all height maps which are needed to query the given points
+
+        Missing height maps are skipped, the query itself will then fail (or
+        fill) as it normally would.
+        """
+        height_maps = []
+        for base in self._base_coordinates_for_points(
+            latitudes, longitudes, interpolation
+        ):
+            height_map = self.collection._find_height_map(base)
+            if height_map is not None:
+                height_maps.append(height_map)
+        await asyncio.gather(*(self._load(height_map) for height_map in height_maps))
+
+    def _base_coordinates_for_points(
+        self, latitudes, longitudes, interpolation: str
+    ) -> Set[RasterBaseCoordinates]:
+        """Get the base coordinates of every height map the given points need
+
+        Interpolated points may also need pixels up to two pixels away, which
+        can lie in a neighbouring height map.
+        """
+        if interpolation == "nearest":
+            margins = [0]
+        else:
+            pixel_size = 1 / (self.collection.height_map_class.values_per_row - 1)
+            margins = [-2 * pixel_size, 0, 2 * pixel_size]
+
+        if numpy is None:
+            return {
+                RasterBaseCoordinates.from_float(
+                    latitude + latitude_margin, longitude + longitude_margin
+                )
+                for latitude, longitude in zip(latitudes, longitudes)
+                for latitude_margin in margins
+                for longitude_margin in margins
+            }
+
+        # Every combination of point, latitude margin & longitude margin
+        margins = numpy.array(margins)
+        latitudes, longitudes = numpy.broadcast_arrays(
+            numpy.asarray(latitudes, dtype=float).reshape(-1, 1, 1)
+            + margins.reshape(1, -1, 1),
+            numpy.asarray(longitudes, dtype=float).reshape(-1, 1, 1)
+            + margins.reshape(1, 1, -1),
+        )
+        base_latitudes, base_longitudes = RasterBaseCoordinates.from_float_arrays(
+            latitudes, longitudes
+        )
+        pairs = numpy.unique(
+            numpy.stack((base_latitudes.ravel(), base_longitudes.ravel()), axis=1),
+            axis=0,
+        )
+        return {
+            RasterBaseCoordinates(int(latitude), int(longitude))
+            for latitude, longitude in pairs
+        }
+
+    async def _load(self, height_map: HeightMap):
+        """Load the height map in the executor, sharing any load already underway"""
+        tile_cache = self.collection.tile_cache
+        if height_map in tile_cache:
+            return
+
+        key = height_map.base_coordinates
+        future = self._pending_loads.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, height_map.ensure_loaded)
+            self._pending_loads[key] = future
+            future.add_done_callback(lambda _: self._pending_loads.pop(key, None))
+
+        # Shielded so that one cancelled request does not cancel the load for
+        # all other requests waiting on it
+        await asyncio.shield(future)
+        tile_cache.load(height_map)
@@ -1,6 +1,8 @@
 from pathlib import Path
 from typing import NamedTuple
 
+from srtm.utilities import require_numpy
+
 
 class RasterBaseCoordinates(NamedTuple):
     """Base coordinates for a SRTM HGT raster file
@@ -23,6 +25,25 @@ class RasterBaseCoordinates(NamedTuple):
 
         return cls(latitude=int(latitude), longitude=int(longitude))
 
+    @staticmethod
+    def from_float_arrays(latitudes, longitudes):
+        """Get base latitudes & longitudes for arrays of coordinates
+
+        Vectorised version of from_float(), returning a tuple of two numpy
+        integer arrays. Requires numpy.
+        """
+        numpy = require_numpy()
+        latitudes = numpy.asarray(latitudes, dtype=float)
+        longitudes = numpy.asarray(longitudes, dtype=float)
+        # Same logic as from_float(), as int() truncates towards zero
+        base_latitudes = numpy.trunc(
+            numpy.where(latitudes < 0, latitudes - 1, latitudes)
+        )
+        base_longitudes = numpy.trunc(
+            numpy.where(longitudes < 0, longitudes - 1, longitudes)
+        )
+        return base_latitudes.astype(int), base_longitudes.astype(int)
+
     @classmethod
     def from_file_name(cls, hgt_name: str):
         """Create an instance from a HGT name, eg "N38W006" """
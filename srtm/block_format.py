@@ -0,0 +1,186 @@
+"""A block-compressed container for SRTM tiles
+
+HGT files must be read (and for .hgt.zip files, fully decompressed) before a
+single pixel can be looked up. This format instead splits the raster into
+square blocks of block_size x block_size pixels, each compressed separately,
+so that a lookup only needs to decompress the one block containing it.
+
+The layout is, with all integers big-endian:
+
+    header   magic (8 bytes, b"HGTBLOCK"), version (uint16),
+             compression (uint16), values_per_row (uint32), block_size (uint32),
+             void_fill (uint16, from version 2)
+    index    for each block in row-major order, the offset (uint64) and
+             length (uint32) of its compressed data
+    blocks   compressed data of each block
+
+Each decompressed block holds big-endian int16 values in row-major order.
+Blocks along the southern and eastern edges are smaller than block_size
+where the raster does not divide exactly. void_fill records how voids were
+filled, as 0 for not at all, otherwise the position of the method within
+srtm.voids.VOID_FILL_METHODS plus one.
+"""
+import os
+import struct
+import tempfile
+import zlib
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+
+from srtm.voids import VOID_FILL_METHODS
+
+BLOCK_FILE_SUFFIX = ".hgtb"
+MAGIC = b"HGTBLOCK"
+VERSION = 2
+COMPRESSION_DEFLATE = 1
+DEFAULT_BLOCK_SIZE = 256
+
+HEADER = struct.Struct(">8sHHIIH")
+# Version 1 headers have no void_fill
+HEADER_V1 = struct.Struct(">8sHHII")
+INDEX_ENTRY = struct.Struct(">QI")
+
+
+class BlockIndex(NamedTuple):
+    """The header & index of a block-compressed tile"""
+
+    values_per_row: int
+    block_size: int
+    offsets: Tuple[int, ...]
+    lengths: Tuple[int, ...]
+    void_fill: Optional[str] = None
+
+    @property
+    def blocks_per_row(self) -> int:
+        return -(-self.values_per_row // self.block_size)
+
+    def block_shape(self, block_row: int, block_column: int) -> Tuple[int, int]:
+        """Get the number of rows & columns of pixels within the given block"""
+        return (
+            min(self.block_size, self.values_per_row - block_row * self.block_size),
+            min(
+                self.block_size, self.values_per_row - block_column * self.block_size
+            ),
+        )
+
+
+def read_block_index(data: bytes) -> BlockIndex:
+    """Read the header & index from the start of a block-compressed tile
+
+    data may be the whole file, or any buffer starting at its beginning which
+    covers the index. Raises a ValueError if the data is not a valid tile.
+    """
+    header, values_per_row, block_size, void_fill = _read_header(data)
+    blocks = (-(-values_per_row // block_size)) ** 2
+    index_end = header.size + blocks * INDEX_ENTRY.size
+    if len(data) < index_end:
+        raise ValueError("Block-compressed tile index is truncated")
+    entries = list(INDEX_ENTRY.iter_unpack(data[header.size : index_end]))
+    offsets = tuple(offset for offset, _ in entries)
+    lengths = tuple(length for _, length in entries)
+    if any(offset < index_end for offset in offsets) or any(
+        offset + length > len(data) for offset, length in entries
+    ):
+        raise ValueError("Block-compressed tile blocks are truncated")
+
+    return BlockIndex(values_per_row, block_size, offsets, lengths, void_fill)
+
+
+def read_void_fill(path: Path) -> Optional[str]:
+    """Get the void fill method a block-compressed tile was written with
+
+    Only the header is read. Raises a ValueError if the file is not a valid
+    tile.
+    """
+    with path.open("rb") as f:
+        return _read_header(f.read(HEADER.size))[3]
+
+
+def _read_header(data: bytes) -> Tuple[struct.Struct, int, int, Optional[str]]:
+    """Read the header struct, values_per_row, block_size & void_fill"""
+    if len(data) < HEADER_V1.size:
+        raise ValueError("Too short to be a block-compressed tile")
+    magic, version = struct.unpack_from(">8sH", data)
+    if magic != MAGIC:
+        raise ValueError("Not a block-compressed tile")
+    if version not in (1, VERSION):
+        raise ValueError(f"Unsupported block-compressed tile version {version}")
+    header = HEADER if version == VERSION else HEADER_V1
+    if len(data) < header.size:
+        raise ValueError("Too short to be a block-compressed tile")
+
+    _, _, compression, values_per_row, block_size, *rest = header.unpack_from(data)
+    if compression != COMPRESSION_DEFLATE:
+        raise ValueError(f"Unsupported block compression {compression}")
+    if not values_per_row or not block_size:
+        raise ValueError("Block-compressed tile has no data")
+    void_fill_code = rest[0] if rest else 0
+    if void_fill_code > len(VOID_FILL_METHODS):
+        raise ValueError(f"Unsupported void fill {void_fill_code}")
+    void_fill = VOID_FILL_METHODS[void_fill_code - 1] if void_fill_code else None
+    return header, values_per_row, block_size, void_fill
+
+
+def decompress_block(data: bytes, index: BlockIndex, block: int) -> bytes:
+    """Decompress the given block (numbered in row-major order)"""
+    offset = index.offsets[block]
+    return zlib.decompress(data[offset : offset + index.lengths[block]])
+
+
+def compress_raster(
+    raster: bytes,
+    values_per_row: int,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    level: int = 6,
+    void_fill: str = None,
+) -> bytes:
+    """Convert a raw HGT raster into a block-compressed tile
+
+    raster is the content of a HGT file, i.e. big-endian int16 values in
+    row-major order. level is the zlib compression level. void_fill is the
+    method the raster's voids were filled with, if any, to be recorded in the
+    header.
+    """
+    assert len(raster) == values_per_row ** 2 * 2, (
+        f"Expected {values_per_row ** 2 * 2:,} bytes for {values_per_row} values "
+        f"per row, found {len(raster):,}"
+    )
+    blocks_per_row = -(-values_per_row // block_size)
+    row_bytes = values_per_row * 2
+    compressed_blocks = []
+    for block_row in range(blocks_per_row):
+        top = block_row * block_size
+        bottom = min(top + block_size, values_per_row)
+        for block_column in range(blocks_per_row):
+            left = block_column * block_size
+            right = min(left + block_size, values_per_row)
+            block = b"".join(
+                raster[row_start + left * 2 : row_start + right * 2]
+                for row_start in range(top * row_bytes, bottom * row_bytes, row_bytes)
+            )
+            compressed_blocks.append(zlib.compress(block, level))
+
+    void_fill_code = 0 if void_fill is None else VOID_FILL_METHODS.index(void_fill) + 1
+    header = HEADER.pack(
+        MAGIC, VERSION, COMPRESSION_DEFLATE, values_per_row, block_size, void_fill_code
+    )
+    offset = HEADER.size + len(compressed_blocks) * INDEX_ENTRY.size
+    index = []
+    for compressed_block in compressed_blocks:
+        index.append(INDEX_ENTRY.pack(offset, len(compressed_block)))
+        offset += len(compressed_block)
+    return b"".join([header] + index + compressed_blocks)
+
+
+def write_block_file(path: Path, data: bytes):
+    """Atomically write a block-compressed tile to path"""
+    fd, temporary_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.stem}-", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
@@ -0,0 +1,166 @@
+"""Convert HGT files into block-compressed tiles, see srtm.block_format
+
+Run with:
+
+    python -m srtm.convert INPUT [INPUT ...] --output-dir DIR
+
+Inputs may be .hgt or .hgt.zip files, or directories to search for them.
+Voids may be filled as tiles are converted with --fill-voids nearest|idw,
+see srtm.voids.
+"""
+import argparse
+from functools import partial
+from math import isqrt
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Iterable, List
+from zipfile import ZipFile
+
+from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.block_format import (
+    BLOCK_FILE_SUFFIX,
+    DEFAULT_BLOCK_SIZE,
+    compress_raster,
+    read_void_fill,
+    write_block_file,
+)
+from srtm.utilities import require_numpy
+from srtm.voids import VOID_FILL_METHODS, fill_voids, validate_void_fill_method
+
+
+def read_hgt_raster(hgt_path: Path) -> bytes:
+    """Read the raw raster from a .hgt or .hgt.zip file"""
+    if ".zip" in hgt_path.suffixes:
+        with ZipFile(hgt_path) as zip_file:
+            zipped_files = [name for name in zip_file.namelist() if ".hgt" in name]
+            assert len(zipped_files) == 1, (
+                f"ZIP at {hgt_path} contains the wrong number of hgt files "
+                f"({len(zipped_files)}!=1). Contains {zipped_files}"
+            )
+            return zip_file.read(zipped_files[0])
+    else:
+        return hgt_path.read_bytes()
+
+
+def convert_hgt_file(
+    hgt_path: Path,
+    output_dir: Path,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    level: int = 6,
+    overwrite=False,
+    void_fill: str = None,
+) -> Path:
+    """Convert one HGT file, returning the path of the block-compressed tile
+
+    The number of values per row is determined from the size of the file, so
+    both SRTM1 and SRTM3 files are supported. Voids are filled with the
+    given void_fill method if set, see fill_voids(), which requires numpy.
+    Existing tiles are left alone unless overwrite is set, or their voids
+    were filled differently (as recorded in their headers).
+    """
+    if void_fill is not None:
+        validate_void_fill_method(void_fill)
+    base = RasterBaseCoordinates.from_file_path(hgt_path)
+    block_path = output_dir / f"{base.file_name}{BLOCK_FILE_SUFFIX}"
+    if block_path.exists() and not overwrite:
+        try:
+            if read_void_fill(block_path) == void_fill:
+                return block_path
+        except ValueError:
+            # Not a usable tile, so convert afresh
+            pass
+
+    raster = read_hgt_raster(hgt_path)
+    values_per_row = isqrt(len(raster) // 2)
+    assert values_per_row ** 2 * 2 == len(raster), (
+        f"Unexpected number of bytes found in {hgt_path}, {len(raster):,} is not "
+        f"a square raster of 16-bit values"
+    )
+    if void_fill is not None:
+        numpy = require_numpy()
+        raster_array = numpy.frombuffer(raster, dtype=">i2").reshape(
+            values_per_row, values_per_row
+        )
+        raster = fill_voids(raster_array, void_fill).astype(">i2").tobytes()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    write_block_file(
+        block_path,
+        compress_raster(raster, values_per_row, block_size, level, void_fill),
+    )
+    return block_path
+
+
+def find_hgt_files(inputs: Iterable[Path]) -> List[Path]:
+    """Expand any directories within inputs into the HGT files they contain"""
+    hgt_paths = []
+    for path in inputs:
+        if path.is_dir():
+            hgt_paths.extend(
+                sorted(
+                    hgt_path
+                    for hgt_path in path.glob("**/*.hgt*")
+                    if hgt_path.name.endswith((".hgt", ".hgt.zip"))
+                )
+            )
+        else:
+            hgt_paths.append(path)
+    return hgt_paths
+
+
+def convert_hgt_files(
+    hgt_paths: Iterable[Path],
+    output_dir: Path,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    level: int = 6,
+    overwrite=False,
+    processes: int = None,
+    void_fill: str = None,
+) -> List[Path]:
+    """Convert many HGT files across a pool of processes, see convert_hgt_file()
+
+    processes defaults to the number of CPUs, and setting it to 1 disables
+    the pool entirely.
+    """
+    convert = partial(
+        convert_hgt_file,
+        output_dir=output_dir,
+        block_size=block_size,
+        level=level,
+        overwrite=overwrite,
+        void_fill=void_fill,
+    )
+    if processes == 1:
+        return [convert(hgt_path) for hgt_path in hgt_paths]
+
+    with Pool(processes) as pool:
+        return pool.map(convert, hgt_paths)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", type=Path, nargs="+", help="Files or directories")
+    parser.add_argument("--output-dir", type=Path, required=True)
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument("--level", type=int, default=6, help="zlib level, 0-9")
+    parser.add_argument("--overwrite", action="store_true")
+    parser.add_argument("--processes", type=int, help="Defaults to the CPU count")
+    parser.add_argument(
+        "--fill-voids", choices=VOID_FILL_METHODS, help="Requires numpy"
+    )
+    args = parser.parse_args(args)
+
+    hgt_paths = find_hgt_files(args.inputs)
+    block_paths = convert_hgt_files(
+        hgt_paths,
+        args.output_dir,
+        block_size=args.block_size,
+        level=args.level,
+        overwrite=args.overwrite,
+        processes=args.processes,
+        void_fill=args.fill_voids,
+    )
+    print(f"Converted {len(block_paths)} HGT files into {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+"""Write rasters to GeoTIFF, HGT, ENVI & ESRI ASCII grid files
+
+Rasters are written in strips of whole rows (north to south), each of which
+is converted & written in bulk. Only one strip need be in memory at a time,
+so rasters larger than memory can be streamed, see
+HeightMapCollection.export_region(). Use write_raster() for rasters already
+in memory, such as viewsheds or terrain derivatives.
+
+No GDAL is needed. Files are georeferenced as WGS84 latitude/longitude, with
+the geotransform's pixel centres as the centres of the file's pixels.
+"""
+import struct
+from pathlib import Path
+from typing import Iterable, Tuple
+
+from srtm.utilities import NODATA, GeoTransform, require_numpy
+
+EXPORT_FORMATS = ("tiff", "hgt", "envi", "asc")
+# Formats by file suffix, see export_format_for_path()
+EXPORT_FORMAT_SUFFIXES = {
+    ".tif": "tiff",
+    ".tiff": "tiff",
+    ".hgt": "hgt",
+    ".img": "envi",
+    ".bil": "envi",
+    ".asc": "asc",
+}
+# Pixels per strip read & written by HeightMapCollection.export_region()
+EXPORT_STRIP_PIXELS = 1024 * 1024
+# TIFFs of at least this many bytes are written as BigTIFFs
+_BIGTIFF_BYTES = 2 ** 32
+
+# TIFF SampleFormats by numpy dtype kind
+_TIFF_SAMPLE_FORMATS = {"u": 1, "i": 2, "f": 3}
+# ENVI data types by numpy dtype name, which are those any format may write
+_ENVI_DATA_TYPES = {
+    "uint8": 1,
+    "int16": 2,
+    "int32": 3,
+    "float32": 4,
+    "float64": 5,
+    "uint16": 12,
+    "uint32": 13,
+}
+
+
+def validate_export_format(format: str):
+    if format not in EXPORT_FORMATS:
+        raise ValueError(
+            f"Unknown export format '{format}', must be one of "
+            f"{', '.join(EXPORT_FORMATS)}"
+        )
+
+
+def export_format_for_path(path: Path) -> str:
+    """Get the export format for the given path's suffix"""
+    suffix = Path(path).suffix.lower()
+    if suffix not in EXPORT_FORMAT_SUFFIXES:
+        raise ValueError(
+            f"Cannot tell the export format of '{path}', either use one of the "
+            f"suffixes {', '.join(EXPORT_FORMAT_SUFFIXES)} or give a format"
+        )
+    return EXPORT_FORMAT_SUFFIXES[suffix]
+
+
+def write_raster(
+    path: Path,
+    values,
+    geotransform: GeoTransform,
+    format: str = None,
+    nodata=None,
+) -> Path:
+    """Write a 2D array of values to a file, see write_raster_strips()"""
+    values = require_numpy().asarray(values)
+    return write_raster_strips(
+        path, [values], values.shape, values.dtype, geotransform, format, nodata
+    )
+
+
+def write_raster_strips(
+    path: Path,
+    strips: Iterable,
+    shape: Tuple[int, int],
+    dtype,
+    geotransform: GeoTransform,
+    format: str = None,
+    nodata=None,
+) -> Path:
+    """Write a raster of the given shape & dtype from strips of whole rows
+
+    Strips are 2D arrays, in order from north to south, together covering the
+    raster's shape. The format ("tiff", "hgt", "envi" or "asc") is taken from
+    the path's suffix unless given, see EXPORT_FORMAT_SUFFIXES:
+
+    - tiff is an uncompressed GeoTIFF, which is a BigTIFF if over 4GB
+    - hgt is raw big-endian int16, as SRTM tiles are. Floats are rounded
+    - envi is raw little-endian values, with an ENVI .hdr file alongside
+    - asc is an ESRI ASCII grid, which is text so far larger than the others
+
+    Booleans are written as uint8. nodata is the value marking pixels without
+    data, which is NODATA (-32768) for int16 rasters and NaN for float rasters
+    unless given. NaN values are written as nodata where it is a number (and
+    as NODATA in HGT files). ASCII grids use -9999 rather than NaN. Returns
+    the path. Requires numpy.
+    """
+    numpy = require_numpy()
+    path = Path(path)
+    if format is None:
+        format = export_format_for_path(path)
+    validate_export_format(format)
+
+    dtype = numpy.dtype(dtype)
+    if dtype == bool:
+        dtype = numpy.dtype(numpy.uint8)
+    if format == "hgt" and dtype.kind not in "iuf":
+        raise ValueError(f"HGT files hold int16 values only, not {dtype}")
+    if format == "hgt":
+        dtype = numpy.dtype(numpy.int16)
+    if dtype.name not in _ENVI_DATA_TYPES:
+        raise ValueError(f"Cannot export rasters of {dtype}")
+
+    if nodata is None and dtype == numpy.int16:
+        nodata = NODATA
+    elif nodata is None and dtype.kind == "f":
+        nodata = numpy.nan
+    if format == "asc" and nodata is not None and numpy.isnan(nodata):
+        nodata = -9999
+    if format == "hgt":
+        nodata = NODATA
+
+    writer_class = {
+        "tiff": _TiffWriter,
+        "hgt": _RawWriter,
+        "envi": _EnviWriter,
+        "asc": _AsciiGridWriter,
+    }[format]
+    writer = writer_class(path, shape, dtype, geotransform, nodata)
+    with path.open("wb") as f:
+        writer.write_header(f)
+        rows = 0
+        for strip in strips:
+            strip = numpy.asarray(strip)
+            assert strip.ndim == 2 and strip.shape[1] == shape[1], (
+                f"Strips must be whole rows of {shape[1]} columns, "
+                f"not of shape {strip.shape}"
+            )
+            rows += strip.shape[0]
+            assert rows <= shape[0], f"More than {shape[0]} rows were given"
+            writer.write_rows(f, _prepare_strip(strip, writer.dtype, nodata))
+        assert rows == shape[0], f"Only {rows} of {shape[0]} rows were given"
+    writer.write_sidecar()
+    return path
+
+
+def _prepare_strip(strip, dtype, nodata):
+    """Convert a strip to the output dtype & byte order, writing NaN as nodata
+
+    Returns a C-contiguous array, converted at most once along with any
+    rounding or nodata replacement.
+    """
+    numpy = require_numpy()
+    replace_nan = nodata is not None and not numpy.isnan(nodata)
+    if strip.dtype.kind == "f" and dtype.kind != "f":
+        # Rounded into a copy, within which NaN can be replaced
+        strip = numpy.rint(strip)
+        if replace_nan:
+            strip[numpy.isnan(strip)] = nodata
+    elif strip.dtype.kind == "f" and replace_nan:
+        strip = numpy.where(numpy.isnan(strip), nodata, strip)
+    return numpy.ascontiguousarray(strip, dtype=dtype)
+
+
+class _RasterWriter:
+    """Writes a raster's header, and then its rows"""
+
+    byte_order = "<"
+
+    def __init__(
+        self,
+        path: Path,
+        shape: Tuple[int, int],
+        dtype,
+        geotransform: GeoTransform,
+        nodata=None,
+    ):
+        self.path = path
+        self.rows, self.columns = shape
+        self.dtype = dtype.newbyteorder(self.byte_order)
+        self.geotransform = geotransform
+        self.nodata = nodata
+
+    def write_header(self, f):
+        pass
+
+    def write_rows(self, f, rows):
+        # Already of self.dtype & contiguous, see _prepare_strip()
+        f.write(memoryview(rows))
+
+    def write_sidecar(self):
+        pass
+
+
+class _RawWriter(_RasterWriter):
+    """HGT files are raw big-endian int16 values, with no header"""
+
+    byte_order = ">"
+
+
+class _EnviWriter(_RasterWriter):
+    def write_sidecar(self):
+        geotransform = self.geotransform
+        half_pixel = geotransform.pixel_width / 2
+        lines = [
+            "ENVI",
+            f"samples = {self.columns}",
+            f"lines = {self.rows}",
+            "bands = 1",
+            "header offset = 0",
+            "file type = ENVI Standard",
+            f"data type = {_ENVI_DATA_TYPES[self.dtype.name]}",
+            "interleave = bsq",
+            "byte order = 0",
+            # The reference pixel (1, 1) is the north-west corner of the raster
+            "map info = {Geographic Lat/Lon, 1, 1, "
+            f"{geotransform.west_longitude - half_pixel!r}, "
+            f"{geotransform.north_latitude + half_pixel!r}, "
+            f"{geotransform.pixel_width!r}, {geotransform.pixel_width!r}, "
+            "WGS-84, units=Degrees}",
+        ]
+        if self.nodata is not None:
+            lines.append(f"data ignore value = {_format_number(self.nodata)}")
+        self.path.with_suffix(".hdr").write_text("\n".join(lines) + "\n")
+
+
+class _AsciiGridWriter(_RasterWriter):
+    def write_header(self, f):
+        geotransform = self.geotransform
+        half_pixel = geotransform.pixel_width / 2
+        south_latitude = geotransform.latitude(self.rows - 1) - half_pixel
+        lines = [
+            f"ncols {self.columns}",
+            f"nrows {self.rows}",
+            f"xllcorner {geotransform.west_longitude - half_pixel!r}",
+            f"yllcorner {south_latitude!r}",
+            f"cellsize {geotransform.pixel_width!r}",
+        ]
+        if self.nodata is not None:
+            lines.append(f"NODATA_value {_format_number(self.nodata)}")
+        f.write(("\n".join(lines) + "\n").encode("ascii"))
+
+    def write_rows(self, f, rows):
+        numpy = require_numpy()
+        if self.dtype.kind == "f":
+            # Enough digits to read back the same value
+            fmt = "%.9g" if self.dtype.itemsize == 4 else "%.17g"
+        else:
+            fmt = "%d"
+        numpy.savetxt(f, rows, fmt=fmt, delimiter=" ")
+
+
+class _TiffWriter(_RasterWriter):
+    """Writes an uncompressed GeoTIFF with one strip per row
+
+    As every strip is the same size, the whole layout is known up front. The
+    header & tags are written first, followed by the rows as they arrive, so
+    no seeking is needed.
+    """
+
+    # Field types
+    ASCII = 2
+    SHORT = 3
+    LONG = 4
+    DOUBLE = 12
+    LONG8 = 16
+    _FIELD_DTYPES = {
+        ASCII: "u1",
+        SHORT: "<u2",
+        LONG: "<u4",
+        DOUBLE: "<f8",
+        LONG8: "<u8",
+    }
+
+    def write_header(self, f):
+        numpy = require_numpy()
+        row_bytes = self.columns * self.dtype.itemsize
+        # Tags take well under 16 bytes per row
+        bigtiff = self.rows * (row_bytes + 16) + 4096 >= _BIGTIFF_BYTES
+        if bigtiff:
+            header = b"II" + struct.pack("<HHHQ", 43, 8, 0, 16)
+            offset_type, offset_format, count_format = self.LONG8, "<Q", "<Q"
+        else:
+            header = b"II" + struct.pack("<HI", 42, 8)
+            offset_type, offset_format, count_format = self.LONG, "<I", "<H"
+        inline_size = struct.calcsize(offset_format)
+
+        # Find where the rows start, from the sizes of the tags' values
+        tags = self._tags(offset_type, [0] * self.rows)
+        # Each entry is a tag, field type, count & value (or offset)
+        entry_size = 4 + inline_size * 2
+        ifd_size = struct.calcsize(count_format) + len(tags) * entry_size + inline_size
+        values_offset = _padded(len(header) + ifd_size)
+        data_offset = values_offset + sum(
+            _padded(len(encoded))
+            for _, _, encoded in tags
+            if len(encoded) > inline_size
+        )
+        rows = numpy.arange(self.rows, dtype=numpy.uint64)
+        strip_offsets = data_offset + rows * row_bytes
+
+        ifd = [struct.pack(count_format, len(tags))]
+        values = []
+        for tag, field_type, encoded in self._tags(offset_type, strip_offsets):
+            count = len(encoded) // numpy.dtype(self._FIELD_DTYPES[field_type]).itemsize
+            if len(encoded) <= inline_size:
+                value = encoded.ljust(inline_size, b"\0")
+            else:
+                offset = values_offset + sum(map(len, values))
+                value = struct.pack(offset_format, offset)
+                values.append(encoded.ljust(_padded(len(encoded)), b"\0"))
+            ifd.append(
+                struct.pack("<HH", tag, field_type)
+                + struct.pack(offset_format, count)
+                + value
+            )
+        # No further IFDs
+        ifd.append(b"\0" * inline_size)
+
+        f.write(header)
+        f.write(b"".join(ifd).ljust(values_offset - len(header), b"\0"))
+        f.write(b"".join(values))
+
+    def _tags(self, offset_type: int, strip_offsets):
+        numpy = require_numpy()
+        geotransform = self.geotransform
+        half_pixel = geotransform.pixel_width / 2
+        row_bytes = self.columns * self.dtype.itemsize
+
+        def encode(field_type, values):
+            dtype = self._FIELD_DTYPES[field_type]
+            return numpy.asarray(values).astype(dtype).tobytes()
+
+        tags = [
+            (256, self.LONG, encode(self.LONG, [self.columns])),
+            (257, self.LONG, encode(self.LONG, [self.rows])),
+            (258, self.SHORT, encode(self.SHORT, [self.dtype.itemsize * 8])),
+            # No compression, and 0 is black
+            (259, self.SHORT, encode(self.SHORT, [1])),
+            (262, self.SHORT, encode(self.SHORT, [1])),
+            (273, offset_type, encode(offset_type, strip_offsets)),
+            (277, self.SHORT, encode(self.SHORT, [1])),
+            (278, self.LONG, encode(self.LONG, [1])),
+            (279, offset_type, encode(offset_type, [row_bytes] * self.rows)),
+            (284, self.SHORT, encode(self.SHORT, [1])),
+            (
+                339,
+                self.SHORT,
+                encode(self.SHORT, [_TIFF_SAMPLE_FORMATS[self.dtype.kind]]),
+            ),
+            # ModelPixelScale, and ModelTiepoint of the north-west corner
+            (
+                33550,
+                self.DOUBLE,
+                encode(self.DOUBLE, [geotransform.pixel_width] * 2 + [0]),
+            ),
+            (
+                33922,
+                self.DOUBLE,
+                encode(
+                    self.DOUBLE,
+                    [
+                        0,
+                        0,
+                        0,
+                        geotransform.west_longitude - half_pixel,
+                        geotransform.north_latitude + half_pixel,
+                        0,
+                    ],
+                ),
+            ),
+            # GeoKeyDirectory: version 1.1.0 with 3 keys, a geographic model,
+            # pixels as areas, and WGS84
+            (
+                34735,
+                self.SHORT,
+                encode(
+                    self.SHORT,
+                    [1, 1, 0, 3, 1024, 0, 1, 2, 1025, 0, 1, 1, 2048, 0, 1, 4326],
+                ),
+            ),
+        ]
+        if self.nodata is not None:
+            # Read by GDAL
+            nodata = _format_number(self.nodata).encode("ascii") + b"\0"
+            tags.append((42113, self.ASCII, nodata))
+        return tags
+
+
+def _padded(size: int) -> int:
+    """Round a size up to a whole number of 8 byte words"""
+    return -(-size // 8) * 8
+
+
+def _format_number(value) -> str:
+    numpy = require_numpy()
+    if numpy.isnan(value):
+        return "nan"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
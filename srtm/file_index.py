@@ -0,0 +1,158 @@
+import json
+import os
+import tempfile
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.block_format import BLOCK_FILE_SUFFIX
+
+MANIFEST_VERSION = 1
+HGT_FILE_PATTERN = "*.hgt*"
+
+
+def scan_hgt_dir(hgt_dir: Path, manifest_path: Path) -> List[Path]:
+    """Find all HGT files within hgt_dir, using a manifest file to avoid rescanning
+
+    The manifest records the name, size and modification time of every file
+    within each directory, along with the modification time of the directory
+    itself. Directories are only rescanned if they, or any of their files,
+    have been modified since the manifest was written, so unchanged
+    directories cost a stat() per file rather than a listing. Files modified
+    in place do not change their directory's modification time, hence the
+    check of each file. The manifest is rewritten whenever anything has
+    changed.
+    """
+    manifest = _read_manifest(hgt_dir, manifest_path)
+    old_directories = manifest.get("directories", {})
+    directories = {}
+
+    pending = [""]
+    while pending:
+        relative_dir = pending.pop()
+        try:
+            mtime_ns = (hgt_dir / relative_dir).stat().st_mtime_ns
+        except FileNotFoundError:
+            continue
+
+        entry = old_directories.get(relative_dir)
+        if (
+            entry is None
+            or entry["mtime_ns"] != mtime_ns
+            or not _files_unchanged(hgt_dir / relative_dir, entry["files"])
+        ):
+            entry = _scan_directory(hgt_dir, relative_dir, mtime_ns)
+        directories[relative_dir] = entry
+        pending.extend(entry["directories"])
+
+    if directories != old_directories:
+        _write_manifest(
+            manifest_path,
+            {
+                "version": MANIFEST_VERSION,
+                "hgt_dir": str(hgt_dir),
+                "directories": directories,
+            },
+        )
+
+    return [
+        hgt_dir / relative_dir / file["name"]
+        for relative_dir, entry in sorted(directories.items())
+        for file in entry["files"]
+    ]
+
+
+def index_hgt_files(hgt_paths: Iterable[Path]) -> Dict[str, List[Path]]:
+    """Group HGT files by the tile name their file names start with
+
+    Names are as per RasterBaseCoordinates.from_path(), so for example
+    "N40W008.hgt.zip" and "N40W008.SRTMGL1.hgt.zip" are both for "N40W008".
+    """
+    hgt_files = {}
+    for hgt_path in hgt_paths:
+        hgt_name = hgt_path.name.split(".")[0].upper()
+        hgt_files.setdefault(hgt_name, []).append(hgt_path)
+    return hgt_files
+
+
+def find_hgt_file(
+    hgt_files: Dict[str, List[Path]], base: RasterBaseCoordinates
+) -> Optional[Path]:
+    """Find the HGT file for the given base coordinates, see index_hgt_files()
+
+    Block-compressed files are preferred, and otherwise the first by path.
+    Returns None if there is no file.
+    """
+    hgt_paths = sorted(hgt_files.get(base.file_name, []))
+    for hgt_path in hgt_paths:
+        if hgt_path.name.endswith(BLOCK_FILE_SUFFIX):
+            return hgt_path
+    return hgt_paths[0] if hgt_paths else None
+
+
+def _files_unchanged(directory: Path, files: List[Dict]) -> bool:
+    """Check the sizes & modification times of a directory's manifest files"""
+    for file in files:
+        try:
+            stat = (directory / file["name"]).stat()
+        except FileNotFoundError:
+            return False
+        if stat.st_size != file["size"] or stat.st_mtime_ns != file["mtime_ns"]:
+            return False
+    return True
+
+
+def _scan_directory(hgt_dir: Path, relative_dir: str, mtime_ns: int) -> Dict:
+    files = []
+    sub_directories = []
+    with os.scandir(hgt_dir / relative_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                sub_directories.append(os.path.join(relative_dir, entry.name))
+            elif fnmatch(entry.name, HGT_FILE_PATTERN):
+                stat = entry.stat()
+                files.append(
+                    {
+                        "name": entry.name,
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                    }
+                )
+
+    return {
+        "mtime_ns": mtime_ns,
+        "files": sorted(files, key=lambda file: file["name"]),
+        "directories": sorted(sub_directories),
+    }
+
+
+def _read_manifest(hgt_dir: Path, manifest_path: Path) -> Dict:
+    """Read the manifest, returning an empty one if it is missing or not usable"""
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+    if (
+        not isinstance(manifest, dict)
+        or manifest.get("version") != MANIFEST_VERSION
+        or manifest.get("hgt_dir") != str(hgt_dir)
+    ):
+        return {}
+    return manifest
+
+
+def _write_manifest(manifest_path: Path, manifest: Dict):
+    # Write atomically so that concurrent readers never see a partial manifest
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporary_path = tempfile.mkstemp(
+        dir=manifest_path.parent, prefix=f".{manifest_path.name}-", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temporary_path, manifest_path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
@@ -1,34 +1,157 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from math import ceil, cos, degrees, isnan, nan, radians
 from pathlib import Path
-from typing import Dict, Type, List, Generator, Tuple
+from typing import Dict, Type, List, Generator, Tuple, Optional, Set, Iterator
 
 from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.block_format import BLOCK_FILE_SUFFIX
 from srtm.exceptions import NoHeightMapDataException
+from srtm.export import EXPORT_STRIP_PIXELS, write_raster_strips
+from srtm.file_index import find_hgt_file, index_hgt_files, scan_hgt_dir
+from srtm.instrumentation import (
+    INSTRUMENTED_ATTRIBUTES,
+    Instrumentation,
+    instrument_collection,
+)
 from srtm.utilities import (
+    NODATA,
     points_on_line,
+    points_on_line_array,
+    require_numpy,
     SRTM3_DIR,
     SRTM1_DIR,
     apply_curvature,
+    apply_curvature_array,
+    midpoint_curvature_drops,
     haversine,
+    haversine_array,
+    ElevationProfile,
     ElevationProfilePoint,
+    EARTH_RADIUS,
+    GeoTransform,
+    RegionBlock,
+    StraightLineEquation,
+    BlockExtrema,
+    interpolate_pixels,
+    interpolate_voids,
+    interpolate_voids_array,
+    validate_interpolation,
+    validate_void_policy,
+    voids_to_nan,
+)
+from srtm.height_maps import (
+    HeightMap,
+    Srtm3HeightMap,
+    Srtm1HeightMap,
+    Srtm3BlockHeightMap,
+    Srtm1BlockHeightMap,
+)
+from srtm.overviews import (
+    overview_factors,
+    overview_height_map_class,
+    overview_path,
+    validate_overview,
+    write_overviews,
 )
-from srtm.height_maps import HeightMap, Srtm3HeightMap, Srtm1HeightMap
+from srtm.terrain import Terrain, compute_terrain, validate_derivative
+from srtm.tile_cache import TileCache
+from srtm.tile_index import TileIndex
+from srtm.tile_pool import TilePool
+from srtm.viewshed import Viewshed, compute_viewshed
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
 
 
 class HeightMapCollection:
     """ Provides access to data across all SRTM files
 
-    This will lazy load data as needed
+    This will lazy load data as needed. Set use_mmap to memory-map uncompressed
+    HGT files rather than reading them into memory. Set cache_dir to extract
+    zipped HGT files once, rather than decompressing them on every load.
+
+    Loaded data is kept in memory until either max_loaded_tiles or
+    max_loaded_bytes is exceeded, at which point the least recently used
+    height maps are unloaded. See tile_cache.stats() for hit/miss/eviction
+    counts.
+
+    Set index_manifest to a file path to cache the file index between runs,
+    see build_file_index(). Alternatively, set lazy_index to skip building
+    the index at startup, in which case files are listed on first use and
+    each tile is indexed as it is needed.
+
+    Collections may be queried from multiple threads.
+
+    Block-compressed tiles (see srtm.convert) are used in preference to HGT
+    files for the same coordinates, and are loaded with block_height_map_class.
+
+    Lower resolution overviews can be built with build_overviews(), and then
+    queried via get_overview() or get_overview_for_resolution().
+
+    Set instrumentation to measure tile loads & lookups, see instrument().
+
+    Set tile_pool to share decompressed tiles between processes via shared
+    memory, rather than each process loading its own copy. See
+    srtm.tile_pool.start_tile_pool().
+
+    Terrain derivatives (slope, aspect, hillshade & curvature) of whole
+    height maps are cached for the max_cached_terrain most recently used, see
+    get_tile_terrain().
     """
 
-    height_maps: Dict[RasterBaseCoordinates, HeightMap]
+    height_maps: TileIndex
     height_map_class: Type[HeightMap] = None
+    block_height_map_class: Type[HeightMap] = None
     hgt_dir: Path = None
+    use_mmap: bool = False
+    cache_dir: Path = None
+    index_manifest: Path = None
+    lazy_index: bool = False
+    instrumentation: Instrumentation = None
+    tile_pool: TilePool = None
+    max_cached_terrain: int = 4
 
-    def __init__(self, auto_build_index=True, hgt_dir: Path=None):
-        self.height_maps = {}
+    def __init__(
+        self,
+        auto_build_index=True,
+        hgt_dir: Path = None,
+        use_mmap: bool = None,
+        cache_dir: Path = None,
+        max_loaded_tiles: int = None,
+        max_loaded_bytes: int = None,
+        index_manifest: Path = None,
+        lazy_index: bool = None,
+        instrumentation: Instrumentation = None,
+        tile_pool: TilePool = None,
+    ):
+        self.height_maps = TileIndex()
+        self._index_lock = threading.Lock()
+        self._missing_height_maps: Set[RasterBaseCoordinates] = set()
+        self._lazy_hgt_files: Dict[str, List[Path]] = None
+        self._overviews: Dict[Tuple[int, str], OverviewHeightMapCollection] = {}
+        self._terrain_cache: Dict[Tuple, Terrain] = OrderedDict()
+        self.tile_cache = TileCache(
+            max_tiles=max_loaded_tiles, max_bytes=max_loaded_bytes
+        )
 
         if hgt_dir is not None:
             self.hgt_dir = hgt_dir
+        if use_mmap is not None:
+            self.use_mmap = use_mmap
+        if cache_dir is not None:
+            self.cache_dir = cache_dir
+        if index_manifest is not None:
+            self.index_manifest = index_manifest
+        if lazy_index is not None:
+            self.lazy_index = lazy_index
+        if tile_pool is not None:
+            self.tile_pool = tile_pool
+        if instrumentation is not None:
+            self.instrument(instrumentation)
 
         assert (
             self.height_map_class
@@ -38,58 +161,466 @@ class HeightMapCollection:
             self.hgt_dir
         ), "No HGT directory set. Do you need to set the SRTM1_DIR or SRTM3_DIR environment variables?"
 
-        if auto_build_index:
+        if auto_build_index and not self.lazy_index:
             self.build_file_index()
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_index_lock"]
+        # Terrain is quicker to recalculate than to pickle
+        state["_terrain_cache"] = OrderedDict()
+        # Instrumentation is per process, see instrument()
+        for name in INSTRUMENTED_ATTRIBUTES + ("instrumentation",):
+            state.pop(name, None)
+        return state
+
+    def instrument(self, instrumentation: Optional[Instrumentation]):
+        """Report tile loads, evictions & accesses, lookups and missing tiles
+
+        Events are passed to the given Instrumentation, see
+        srtm.instrumentation. Replaces any previous instrumentation, pass None
+        to remove it. Collections are not instrumented by default, in which
+        case no measurements are made at all.
+
+        Instrumentation applies to overviews too, but is not pickled (e.g.
+        with collections sent to other processes).
+        """
+        instrument_collection(self, instrumentation)
+        for overview in list(self._overviews.values()):
+            overview.instrument(instrumentation)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._index_lock = threading.Lock()
+
     def build_file_index(self):
         """Load an index of all available files
 
         This reads file names, but does not load the contained data.
-        This is lazy-loaded on demand
+        This is lazy-loaded on demand.
+
+        If index_manifest is set then the directory listing is cached in that
+        file, and only directories which have changed are rescanned. See
+        scan_hgt_dir()
         """
-        self.height_maps = {}
-        for hgt_path in self.hgt_dir.glob("**/*.hgt*"):
-            hgt_name = hgt_path.name.split(".")[0]
-            self.height_maps[
-                RasterBaseCoordinates.from_file_name(hgt_name)
-            ] = self.height_map_class(path=hgt_path)
+        hgt_files = self._list_hgt_files()
+        height_maps = TileIndex()
+        for hgt_name in hgt_files:
+            base = RasterBaseCoordinates.from_file_name(hgt_name)
+            height_maps[base] = self._make_height_map(find_hgt_file(hgt_files, base))
+
+        with self._index_lock:
+            self.tile_cache.clear()
+            self._terrain_cache.clear()
+            self._missing_height_maps = set()
+            self._lazy_hgt_files = None
+            self.height_maps = height_maps
+
+    def _list_hgt_files(self) -> Dict[str, List[Path]]:
+        """List all HGT files within hgt_dir, see index_hgt_files()"""
+        if self.index_manifest:
+            hgt_paths = scan_hgt_dir(self.hgt_dir, self.index_manifest)
+        else:
+            hgt_paths = self.hgt_dir.glob("**/*.hgt*")
+        return index_hgt_files(hgt_paths)
+
+    def _make_height_map(self, hgt_path: Path) -> HeightMap:
+        if self._is_block_file(hgt_path):
+            height_map_class = self.block_height_map_class
+        else:
+            height_map_class = self.height_map_class
+        return height_map_class(
+            path=hgt_path,
+            use_mmap=self.use_mmap,
+            cache_dir=self.cache_dir,
+            instrumentation=self.instrumentation,
+            tile_pool=self.tile_pool,
+        )
+
+    @staticmethod
+    def _is_block_file(hgt_path: Path) -> bool:
+        return hgt_path.name.endswith(BLOCK_FILE_SUFFIX)
 
     def get_height_map_for_latitude_and_longitude(
         self, latitude: float, longitude: float
     ) -> HeightMap:
         """Get the HeightMap for the given latitude and longitude"""
-        base = RasterBaseCoordinates.from_float(latitude, longitude)
-        try:
-            return self.height_maps[base]
-        except KeyError:
-            raise NoHeightMapDataException(
-                f"Height map for {base} not found. Either your the SRTM directory "
-                f"'{self.hgt_dir}' is missing files, or you have set auto_build_index=False "
-                f"and therefore need to manually call build_file_index(). It is probably "
-                f"the former."
-            )
-
-    def get_altitude(self, latitude: float, longitude: float) -> int:
-        """Get the height of the given latitude and longitude"""
+        height_map = self.height_maps.get_tile_for_latitude_and_longitude(
+            latitude, longitude
+        )
+        if height_map is None:
+            base = RasterBaseCoordinates.from_float(latitude, longitude)
+            height_map = self._find_height_map(base)
+            if height_map is None:
+                raise self._no_data_exception(base)
+        return height_map
+
+    def _find_height_map(self, base: RasterBaseCoordinates) -> Optional[HeightMap]:
+        """Get the HeightMap for the given base coordinates, if there is one
+
+        When using lazy_index, hgt_dir is listed on the first lookup (using
+        index_manifest if set) to find files as build_file_index() would, but
+        height maps are only made for the tiles which are looked up.
+        """
+        height_map = self.height_maps.get(base)
+        if (
+            height_map is not None
+            or not self.lazy_index
+            or base in self._missing_height_maps
+        ):
+            return height_map
+
+        with self._index_lock:
+            # Another thread may have found it while we waited for the lock
+            height_map = self.height_maps.get(base)
+            if height_map is not None or base in self._missing_height_maps:
+                return height_map
+
+            if self._lazy_hgt_files is None:
+                self._lazy_hgt_files = self._list_hgt_files()
+            hgt_path = find_hgt_file(self._lazy_hgt_files, base)
+            if hgt_path is None:
+                self._missing_height_maps.add(base)
+                return None
+
+            height_map = self._make_height_map(hgt_path)
+            self.height_maps[base] = height_map
+            return height_map
+
+    def _no_data_exception(
+        self, base: RasterBaseCoordinates
+    ) -> NoHeightMapDataException:
+        return NoHeightMapDataException(
+            f"Height map for {base} not found. Either your the SRTM directory "
+            f"'{self.hgt_dir}' is missing files, or you have set auto_build_index=False "
+            f"and therefore need to manually call build_file_index(). It is probably "
+            f"the former."
+        )
+
+    def _no_data(self, base: RasterBaseCoordinates):
+        """Called when there is no height map for points given a fill_value
+
+        Does nothing unless instrumented, see instrument().
+        """
+
+    def get_altitude(
+        self,
+        latitude: float,
+        longitude: float,
+        interpolation: str = "nearest",
+        void_value=None,
+    ):
+        """Get the height of the given latitude and longitude
+
+        Interpolation may be "nearest", "bilinear" or "bicubic". Nearest gives
+        an int, the others give a float and require numpy. Voids are given as
+        void_value if set. Otherwise nearest gives NODATA (-32768) for voids,
+        and the others give NaN. See get_altitudes()
+        """
+        if interpolation != "nearest":
+            altitudes = self.get_altitudes(
+                [latitude],
+                [longitude],
+                interpolation=interpolation,
+                void_value=void_value,
+            )
+            return float(altitudes[0])
+
         height_map = self.get_height_map_for_latitude_and_longitude(latitude, longitude)
-        return height_map.get_altitude_for_latitude_and_longitude(latitude, longitude)
+        with self.tile_cache.pinned(height_map):
+            altitude = height_map.get_altitude_for_latitude_and_longitude(
+                latitude, longitude
+            )
+        if altitude == NODATA and void_value is not None:
+            return void_value
+        return altitude
+
+    def get_altitudes(
+        self,
+        latitudes,
+        longitudes,
+        fill_value=None,
+        interpolation: str = "nearest",
+        void_value=None,
+    ):
+        """Get the heights of many latitudes and longitudes as a numpy array
+
+        Latitudes and longitudes may be arrays or iterables of the same shape.
+        Points are grouped by height map, and each group is converted to pixels
+        in one vectorised pass.
+
+        Points for which there is no height map are set to fill_value. If
+        fill_value is None then a NoHeightMapDataException is raised before any
+        data is loaded. The result is an int16 array, unless the fill value
+        requires a wider type (e.g. NaN gives a float64 array).
+
+        Interpolation may be "nearest", "bilinear" or "bicubic". Bilinear and
+        bicubic give a float64 array, and use pixels from neighbouring height
+        maps where needed. If a neighbouring height map is not available then
+        the edge pixels of the point's own height map are used instead.
+
+        Voids (pixels without data) are set to void_value. If void_value is
+        None then nearest altitudes of voids are NODATA (-32768), and bilinear
+        or bicubic altitudes are NaN wherever a void contributes to them. As
+        with fill_value, a void_value of NaN gives a float64 array. Use
+        numpy.ma.masked_equal(altitudes, NODATA) for a masked array instead.
+
+        Requires numpy.
+        """
+        numpy = require_numpy()
+        validate_interpolation(interpolation)
+        if not hasattr(latitudes, "__len__"):
+            latitudes = list(latitudes)
+        if not hasattr(longitudes, "__len__"):
+            longitudes = list(longitudes)
+        latitudes = numpy.asarray(latitudes, dtype=float)
+        longitudes = numpy.asarray(longitudes, dtype=float)
+        if latitudes.shape != longitudes.shape:
+            raise ValueError(
+                f"Latitudes and longitudes must be the same shape, got "
+                f"{latitudes.shape} and {longitudes.shape}"
+            )
+        shape = latitudes.shape
+        latitudes = latitudes.ravel()
+        longitudes = longitudes.ravel()
+
+        if interpolation == "nearest":
+            dtype = self._altitudes_dtype(fill_value, void_value)
+        else:
+            dtype = numpy.float64
+        altitudes = numpy.empty(latitudes.shape, dtype=dtype)
+
+        for base, indices in self._group_by_base_coordinates(
+            latitudes, longitudes, raise_missing=fill_value is None
+        ):
+            height_map = self._find_height_map(base)
+            if height_map is None:
+                self._no_data(base)
+                altitudes[indices] = fill_value
+                continue
+
+            with self.tile_cache.pinned(height_map):
+                values = self._get_tile_altitudes(
+                    height_map,
+                    latitudes[indices],
+                    longitudes[indices],
+                    interpolation,
+                )
+            if interpolation == "nearest" and void_value is not None:
+                values = numpy.where(values == NODATA, void_value, values)
+            elif void_value is not None:
+                values[numpy.isnan(values)] = void_value
+            altitudes[indices] = values
+
+        return altitudes.reshape(shape)
+
+    def _get_tile_altitudes(
+        self, height_map: HeightMap, latitudes, longitudes, interpolation: str
+    ):
+        """Get the altitudes of points within one (loaded) height map"""
+        if interpolation == "nearest":
+            get_altitudes = height_map.get_altitudes_for_latitudes_and_longitudes
+            return get_altitudes(latitudes, longitudes)
+
+        to_pixels = height_map._latitudes_and_longitudes_to_fractional_pixels
+        columns, rows = to_pixels(latitudes, longitudes)
+        return interpolate_pixels(
+            lambda rows, columns: self._get_pixels(height_map, rows, columns),
+            rows,
+            columns,
+            interpolation,
+        )
+
+    @staticmethod
+    def _altitudes_dtype(*values):
+        """Get the smallest dtype which can store altitudes and the given values
+
+        Values of None are ignored.
+        """
+        numpy = require_numpy()
+        if all(
+            value is None
+            or numpy.can_cast(numpy.min_scalar_type(value), numpy.int16)
+            for value in values
+        ):
+            return numpy.int16
+        else:
+            return numpy.float64
+
+    def _get_pixels(self, height_map: HeightMap, rows, columns):
+        """Get the values at 0-indexed pixels of the given height map
+
+        Pixels up to one height map beyond the edges are read from the
+        neighbouring height maps, allowing for the one pixel overlap between
+        them. If there is no neighbouring height map, or it has a different
+        resolution (see LayeredHeightMapCollection), the nearest edge pixel of
+        the given height map is used instead.
+        """
+        numpy = require_numpy()
+        last = height_map.values_per_row - 1
+        values = height_map._get_clamped_pixels(rows, columns)
+
+        # North is up (lower rows), east is right (higher columns)
+        latitude_shifts = (rows < 0).astype(int) - (rows > last)
+        longitude_shifts = (columns > last).astype(int) - (columns < 0)
+        outside = (latitude_shifts != 0) | (longitude_shifts != 0)
+        if not outside.any():
+            return values
+
+        base = height_map.base_coordinates
+        shifts = set(zip(latitude_shifts[outside], longitude_shifts[outside]))
+        for latitude_shift, longitude_shift in shifts:
+            neighbour = self._find_height_map(
+                RasterBaseCoordinates(
+                    int(base.latitude + latitude_shift),
+                    int(base.longitude + longitude_shift),
+                )
+            )
+            if neighbour is None or neighbour.values_per_row != last + 1:
+                continue
+            mask = (latitude_shifts == latitude_shift) & (
+                longitude_shifts == longitude_shift
+            )
+            with self.tile_cache.pinned(neighbour):
+                values[mask] = neighbour._read_pixels(
+                    rows[mask] + latitude_shift * last,
+                    columns[mask] - longitude_shift * last,
+                )
+        return values
 
-    def load_area(self, corner1: RasterBaseCoordinates, corner2: RasterBaseCoordinates):
-        """Pre-load a specific area of height maps"""
+    def _group_by_base_coordinates(self, latitudes, longitudes, raise_missing=True):
+        """Group flat arrays of lat/lngs by the base coordinates of their height map
+
+        Returns a list of (base_coordinates, indices) tuples. Raises a
+        NoHeightMapDataException for the first base coordinates without a height
+        map if raise_missing is set.
+        """
+        numpy = require_numpy()
+        if not len(latitudes):
+            return []
+
+        base_latitudes, base_longitudes = RasterBaseCoordinates.from_float_arrays(
+            latitudes, longitudes
+        )
+        # Base longitudes are always within -181 to 180, so this key is unique
+        keys = base_latitudes * 1000 + base_longitudes
+        _, first_indices, inverse, counts = numpy.unique(
+            keys, return_index=True, return_inverse=True, return_counts=True
+        )
+        grouped_indices = numpy.split(
+            numpy.argsort(inverse.ravel(), kind="stable"), numpy.cumsum(counts)[:-1]
+        )
+
+        groups = []
+        for first_index, indices in zip(first_indices, grouped_indices):
+            base = RasterBaseCoordinates(
+                latitude=int(base_latitudes[first_index]),
+                longitude=int(base_longitudes[first_index]),
+            )
+            if raise_missing and self._find_height_map(base) is None:
+                raise self._no_data_exception(base)
+            groups.append((base, indices))
+
+        return groups
+
+    def load_area(
+        self,
+        corner1: RasterBaseCoordinates,
+        corner2: RasterBaseCoordinates,
+        max_workers: int = None,
+    ):
+        """Pre-load a specific area of height maps
+
+        Height maps are loaded in parallel using a pool of max_workers threads
+        (by default, as many as ThreadPoolExecutor chooses). Set max_workers
+        to 1 to load them one at a time.
+        """
         min_latitude = min(corner1.latitude, corner2.latitude)
         max_latitude = max(corner1.latitude, corner2.latitude)
         min_longitude = min(corner1.longitude, corner2.longitude)
         max_longitude = max(corner1.longitude, corner2.longitude)
 
-        for height_map in self.height_maps.values():
-            ok_latitude = (
-                min_latitude <= height_map.base_coordinates.latitude <= max_latitude
-            )
-            ok_longitude = (
-                min_longitude <= height_map.base_coordinates.longitude <= max_longitude
+        height_maps = []
+        for latitude in range(min_latitude, max_latitude + 1):
+            for longitude in range(min_longitude, max_longitude + 1):
+                height_map = self._find_height_map(
+                    RasterBaseCoordinates(latitude, longitude)
+                )
+                if height_map is not None:
+                    height_maps.append(height_map)
+
+        if max_workers == 1:
+            for height_map in height_maps:
+                self.tile_cache.load(height_map)
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Consume the results so that any errors are raised
+            list(executor.map(self.tile_cache.load, height_maps))
+
+    def build_overviews(self, factors: List[int] = None, overwrite=False) -> List[Path]:
+        """Build mean, min & max overviews next to every indexed tile
+
+        factors defaults to every factor available for this collection's tiles,
+        see srtm.overviews. Existing overviews are left alone unless overwrite
+        is set. Tiles which were not already loaded are unloaded again once
+        their overviews are written. Collections from get_overview() are then
+        reindexed, dropping any overviews they had loaded. Returns the paths of
+        all overviews. Requires numpy.
+        """
+        paths = []
+        for height_map in list(self.height_maps.values()):
+            was_loaded = height_map in self.tile_cache
+            paths.extend(write_overviews(height_map, factors, overwrite=overwrite))
+            if not was_loaded:
+                height_map.unload()
+
+        with self._index_lock:
+            overviews = list(self._overviews.values())
+        for overview in overviews:
+            # Overviews may have been missing, or replaced, when last looked up
+            overview.build_file_index()
+        return paths
+
+    def get_overview(
+        self, factor: int, aggregation: str = "mean"
+    ) -> "OverviewHeightMapCollection":
+        """Get a collection of the overviews at the given factor & aggregation
+
+        The result supports the same queries as this collection, at 1/factor
+        of the resolution. Aggregation is "mean", "min" or "max". Overviews
+        must have been built first, see build_overviews().
+        """
+        key = (factor, aggregation)
+        with self._index_lock:
+            overview = self._overviews.get(key)
+        if overview is None:
+            overview = OverviewHeightMapCollection(
+                self, factor, aggregation, instrumentation=self.instrumentation
             )
-            if ok_latitude and ok_longitude:
-                height_map.ensure_loaded()
+            with self._index_lock:
+                overview = self._overviews.setdefault(key, overview)
+        return overview
+
+    def get_overview_for_resolution(
+        self, resolution: float, aggregation: str = "mean"
+    ) -> "HeightMapCollection":
+        """Get the coarsest overview whose pixels are no larger than resolution
+
+        Resolution is in meters, with pixels measured north to south (pixels
+        are narrower east to west away from the equator). If no overview is
+        fine enough then this collection is returned. See get_overview().
+        """
+        values_per_row = self.height_map_class.values_per_row
+        pixel_size = EARTH_RADIUS * radians(1 / (values_per_row - 1))
+        factors = [
+            factor
+            for factor in overview_factors(values_per_row)
+            if factor * pixel_size <= resolution
+        ]
+        if not factors:
+            return self
+        return self.get_overview(max(factors), aggregation)
 
     def get_elevation_profile(
         self,
@@ -98,8 +629,23 @@ class HeightMapCollection:
         end_latitude: float,
         end_longitude: float,
         apply_earth_curvature=True,
+        interpolation: str = "nearest",
+        voids: str = "nan",
     ) -> List[ElevationProfilePoint]:
-        """Get the elevation profile between the two points given"""
+        """Get the elevation profile between the two points given
+
+        See get_altitudes() for interpolation options. When numpy is available
+        the line and elevations are calculated as array operations, but the
+        distances & curvature are calculated per-point so that the results are
+        identical either way. Use get_elevation_profile_arrays() for a fully
+        vectorised (and faster) version.
+
+        Voids (points without data) are handled as per voids, which may be
+        "nan" to give them NaN elevations (and so NaN clearances), "skip" to
+        leave them out of the profile, or "interpolate" to interpolate them
+        linearly by distance from the valid points either side.
+        """
+        validate_void_policy(voids)
         values_per_degree = self.height_map_class.values_per_row
 
         def to_int(lat_lng: float) -> int:
@@ -108,18 +654,41 @@ class HeightMapCollection:
         def to_float(lat_lng_int: int) -> float:
             return lat_lng_int / values_per_degree
 
-        points = points_on_line(
-            x1=to_int(start_latitude),
-            y1=to_int(start_longitude),
-            x2=to_int(end_latitude),
-            y2=to_int(end_longitude),
-        )
-        converted_points = [(to_float(x), to_float(y)) for x, y in points]
+        if numpy is None:
+            points = points_on_line(
+                x1=to_int(start_latitude),
+                y1=to_int(start_longitude),
+                x2=to_int(end_latitude),
+                y2=to_int(end_longitude),
+            )
+            converted_points = [(to_float(x), to_float(y)) for x, y in points]
 
-        elevations = []
-        for latitude, longitude in converted_points:
-            elevations.append(
-                (latitude, longitude, self.get_altitude(latitude, longitude))
+            elevations = []
+            for latitude, longitude in converted_points:
+                elevations.append(
+                    (
+                        latitude,
+                        longitude,
+                        self.get_altitude(
+                            latitude, longitude, interpolation=interpolation
+                        ),
+                    )
+                )
+        else:
+            # Generate the line and look up all elevations in one go
+            xs, ys = points_on_line_array(
+                x1=to_int(start_latitude),
+                y1=to_int(start_longitude),
+                x2=to_int(end_latitude),
+                y2=to_int(end_longitude),
+            )
+            latitudes = xs / values_per_degree
+            longitudes = ys / values_per_degree
+            altitudes = self.get_altitudes(
+                latitudes, longitudes, interpolation=interpolation
+            )
+            elevations = zip(
+                latitudes.tolist(), longitudes.tolist(), altitudes.tolist()
             )
 
         elevation_points = []
@@ -128,16 +697,713 @@ class HeightMapCollection:
                 ElevationProfilePoint(
                     latitude,
                     longitude,
-                    elevation,
+                    nan if elevation == NODATA else elevation,
                     haversine(start_latitude, start_longitude, latitude, longitude),
                 )
             )
 
+        if voids == "interpolate" and elevation_points:
+            # Distances from the start point may not increase for the first
+            # couple of points, as it is not exactly on the line
+            first = elevation_points[0]
+            filled = interpolate_voids(
+                [
+                    haversine(
+                        first.latitude, first.longitude, point.latitude, point.longitude
+                    )
+                    for point in elevation_points
+                ],
+                [point.elevation for point in elevation_points],
+            )
+            elevation_points = [
+                point._replace(elevation=elevation)
+                for point, elevation in zip(elevation_points, filled)
+            ]
+
         if apply_earth_curvature:
             elevation_points = apply_curvature(elevation_points)
 
+        if voids == "skip":
+            # After the curvature, so that it is measured from the same midpoint
+            elevation_points = [
+                point for point in elevation_points if not isnan(point.elevation)
+            ]
+
         return elevation_points
 
+    def get_elevation_profile_arrays(
+        self,
+        start_latitude: float,
+        start_longitude: float,
+        end_latitude: float,
+        end_longitude: float,
+        apply_earth_curvature=True,
+        interpolation: str = "nearest",
+        voids: str = "nan",
+    ) -> ElevationProfile:
+        """Get the elevation profile between the two points given as numpy arrays
+
+        The points are the same as for get_elevation_profile(), but the line,
+        elevations, distances and curvature are all calculated as array
+        operations. Elevations are returned as floats. Use to_points() on the
+        result to get a list of ElevationProfilePoint. See get_altitudes() for
+        interpolation options, and get_elevation_profile() for void policies.
+        Requires numpy.
+        """
+        numpy = require_numpy()
+        validate_void_policy(voids)
+        values_per_degree = self.height_map_class.values_per_row
+
+        xs, ys = points_on_line_array(
+            x1=round(start_latitude * values_per_degree),
+            y1=round(start_longitude * values_per_degree),
+            x2=round(end_latitude * values_per_degree),
+            y2=round(end_longitude * values_per_degree),
+        )
+        latitudes = xs / values_per_degree
+        longitudes = ys / values_per_degree
+
+        elevations = self.get_altitudes(
+            latitudes, longitudes, interpolation=interpolation, void_value=numpy.nan
+        )
+        distances = haversine_array(
+            start_latitude, start_longitude, latitudes, longitudes
+        )
+
+        if voids == "interpolate":
+            # As per get_elevation_profile(), measured from the first point
+            elevations = interpolate_voids_array(
+                haversine_array(latitudes[0], longitudes[0], latitudes, longitudes),
+                elevations,
+            )
+
+        if apply_earth_curvature:
+            elevations = apply_curvature_array(latitudes, longitudes, elevations)
+
+        profile = ElevationProfile(latitudes, longitudes, elevations, distances)
+        if voids == "skip":
+            # After the curvature, so that it is measured from the same midpoint
+            valid = ~numpy.isnan(elevations)
+            profile = ElevationProfile(*(column[valid] for column in profile))
+        return profile
+
+    def has_line_of_sight(
+        self,
+        start_latitude: float,
+        start_longitude: float,
+        end_latitude: float,
+        end_longitude: float,
+        start_elevation_offset: float = 0,
+        end_elevation_offset: float = 0,
+        min_clearance: float = 0,
+        apply_earth_curvature=True,
+    ) -> bool:
+        """Check whether the line of sight between two points clears the terrain
+
+        Gives the same result as checking that every clearance from
+        get_clearances_array(), for the profile from
+        get_elevation_profile_arrays(), is at least min_clearance. This is
+        usually much faster though, as the line is first tested against the
+        lowest & highest pixels of each block it crosses (see
+        HeightMap.block_extrema). Pixels are only read individually for blocks
+        which might obstruct the line, but do not certainly obstruct it.
+        As their clearance is unknown, any void (point without data) along the
+        line obstructs it. Requires numpy.
+        """
+        numpy = require_numpy()
+        values_per_degree = self.height_map_class.values_per_row
+
+        xs, ys = points_on_line_array(
+            x1=round(start_latitude * values_per_degree),
+            y1=round(start_longitude * values_per_degree),
+            x2=round(end_latitude * values_per_degree),
+            y2=round(end_longitude * values_per_degree),
+        )
+        if len(xs) < 2:
+            return True
+        latitudes = xs / values_per_degree
+        longitudes = ys / values_per_degree
+        groups = self._group_by_base_coordinates(latitudes, longitudes)
+
+        distances = haversine_array(
+            start_latitude, start_longitude, latitudes, longitudes
+        )
+        if apply_earth_curvature:
+            drops = midpoint_curvature_drops(latitudes, longitudes)
+        else:
+            drops = numpy.zeros(len(latitudes))
+
+        tiles = []
+        elevations = numpy.full(len(latitudes), numpy.nan)
+        for base, indices in groups:
+            height_map = self._find_height_map(base)
+            pixel_xs, pixel_ys = height_map._latitudes_and_longitudes_to_coordinates(
+                latitudes[indices], longitudes[indices]
+            )
+            rows = pixel_ys - 1
+            columns = pixel_xs - 1
+            tiles.append((height_map, indices, rows, columns))
+            ends = (indices == 0) | (indices == len(latitudes) - 1)
+            if ends.any():
+                with self.tile_cache.pinned(height_map):
+                    elevations[indices[ends]] = voids_to_nan(
+                        height_map._read_pixels(rows[ends], columns[ends])
+                    )
+
+        adjusted_elevations = elevations - drops
+        line_of_sight_elevations = StraightLineEquation.from_points(
+            x1=distances[0],
+            y1=adjusted_elevations[0] + start_elevation_offset,
+            x2=distances[-1],
+            y2=adjusted_elevations[-1] + end_elevation_offset,
+        ).y(distances)
+
+        def obstructed(elevations, indices):
+            # Calculated exactly as per get_clearances_array(), where NaN
+            # clearances (from voids) count as obstructions
+            adjusted_elevations = elevations.astype(float) - drops[indices]
+            clearances = line_of_sight_elevations[indices] - adjusted_elevations
+            return ~(clearances >= min_clearance)
+
+        # Check every block first, as any certain obstruction avoids reading pixels
+        uncertain = []
+        for height_map, indices, rows, columns in tiles:
+            block_extrema = self._get_block_extrema(height_map)
+            block_rows = rows // block_extrema.block_size
+            block_columns = columns // block_extrema.block_size
+            if obstructed(
+                block_extrema.minimums[block_rows, block_columns], indices
+            ).any():
+                return False
+            possible = obstructed(
+                block_extrema.maximums[block_rows, block_columns], indices
+            )
+            if possible.any():
+                uncertain.append(
+                    (height_map, indices[possible], rows[possible], columns[possible])
+                )
+
+        for height_map, indices, rows, columns in uncertain:
+            with self.tile_cache.pinned(height_map):
+                elevations = voids_to_nan(height_map._read_pixels(rows, columns))
+            if obstructed(elevations, indices).any():
+                return False
+        return True
+
+    def _get_block_extrema(self, height_map: HeightMap) -> BlockExtrema:
+        """Get a height map's block extrema, loading it via the tile cache if needed"""
+        if height_map._block_extrema is not None:
+            return height_map._block_extrema
+        with self.tile_cache.pinned(height_map):
+            return height_map.block_extrema
+
+    def get_region(
+        self,
+        min_latitude: float,
+        min_longitude: float,
+        max_latitude: float,
+        max_longitude: float,
+        fill_value=None,
+    ) -> RegionBlock:
+        """Get the elevations of all pixels within the given bounds as one block
+
+        See iter_region_blocks(), which can read regions too large to fit in
+        memory
+        """
+        return next(
+            self.iter_region_blocks(
+                min_latitude,
+                min_longitude,
+                max_latitude,
+                max_longitude,
+                block_size=None,
+                fill_value=fill_value,
+            )
+        )
+
+    def iter_region_blocks(
+        self,
+        min_latitude: float,
+        min_longitude: float,
+        max_latitude: float,
+        max_longitude: float,
+        block_size: int = 1024,
+        fill_value=None,
+    ) -> Iterator[RegionBlock]:
+        """Stream the elevations of all pixels within the given bounds in blocks
+
+        Bounds are snapped to the nearest pixels. Yields RegionBlocks of up to
+        block_size x block_size pixels in row-major order (north to south, then
+        west to east), each with a geotransform. Blocks are stitched together
+        from as many height maps as they span, and only one block is held in
+        memory at a time. Set max_loaded_tiles to at least the number of height
+        maps spanning the region's width to avoid reloading height maps.
+
+        Pixels for which there is no height map are set to fill_value. If
+        fill_value is None then a NoHeightMapDataException is raised before any
+        data is loaded. Voids are NaN if the fill value makes the elevations
+        floats (e.g. NaN), and NODATA (-32768) otherwise. Requires numpy.
+        """
+        first_row, first_column, rows, columns = self._region_window(
+            min_latitude, min_longitude, max_latitude, max_longitude, fill_value
+        )
+        block_rows = block_size or rows
+        block_columns = block_size or columns
+        for row_offset in range(0, rows, block_rows):
+            for column_offset in range(0, columns, block_columns):
+                row = first_row + row_offset
+                column = first_column + column_offset
+                yield RegionBlock(
+                    elevations=self._read_window(
+                        row,
+                        column,
+                        rows=min(block_rows, rows - row_offset),
+                        columns=min(block_columns, columns - column_offset),
+                        fill_value=fill_value,
+                    ),
+                    geotransform=self._global_geotransform(row, column),
+                    row_offset=row_offset,
+                    column_offset=column_offset,
+                )
+
+    def export_region(
+        self,
+        path: Path,
+        min_latitude: float,
+        min_longitude: float,
+        max_latitude: float,
+        max_longitude: float,
+        format: str = None,
+        fill_value=None,
+        nodata=None,
+    ) -> Path:
+        """Write the elevations of all pixels within the given bounds to a file
+
+        The format is "tiff" (GeoTIFF), "hgt", "envi" or "asc" (ESRI ASCII
+        grid), and is taken from the path's suffix unless given. See
+        srtm.export.write_raster_strips(). Exporting exactly one tile's bounds
+        to "hgt" gives a copy of the tile.
+
+        The region is read & written in strips of whole rows, so regions far
+        larger than memory may be exported. Bounds and fill_value are as per
+        iter_region_blocks(). Requires numpy.
+        """
+        first_row, first_column, rows, columns = self._region_window(
+            min_latitude, min_longitude, max_latitude, max_longitude, fill_value
+        )
+        strip_rows = max(1, EXPORT_STRIP_PIXELS // columns)
+        strips = (
+            self._read_window(
+                first_row + row_offset,
+                first_column,
+                rows=min(strip_rows, rows - row_offset),
+                columns=columns,
+                fill_value=fill_value,
+            )
+            for row_offset in range(0, rows, strip_rows)
+        )
+        return write_raster_strips(
+            path,
+            strips,
+            shape=(rows, columns),
+            dtype=self._altitudes_dtype(fill_value),
+            geotransform=self._global_geotransform(first_row, first_column),
+            format=format,
+            nodata=nodata,
+        )
+
+    def _region_window(
+        self,
+        min_latitude: float,
+        min_longitude: float,
+        max_latitude: float,
+        max_longitude: float,
+        fill_value,
+    ) -> Tuple[int, int, int, int]:
+        """Get the first global row & column, and the size, of a region's pixels
+
+        Unless fill_value is set, first checks there is a height map for every
+        pixel, see _check_window_has_data().
+        """
+        assert min_latitude < max_latitude
+        assert min_longitude < max_longitude
+
+        first_row, first_column = self._to_global_pixels(max_latitude, min_longitude)
+        last_row, last_column = self._to_global_pixels(min_latitude, max_longitude)
+        rows = last_row - first_row + 1
+        columns = last_column - first_column + 1
+        if fill_value is None:
+            self._check_window_has_data(first_row, first_column, rows, columns)
+        return first_row, first_column, rows, columns
+
+    def _to_global_pixels(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        """Get the row & column of the nearest pixel in a grid covering the globe
+
+        Row 0 is at latitude 90, column 0 is at longitude -180.
+        """
+        pixels_per_degree = self.height_map_class.values_per_row - 1
+        return (
+            round((90 - latitude) * pixels_per_degree),
+            round((longitude + 180) * pixels_per_degree),
+        )
+
+    def _global_geotransform(self, row: int, column: int) -> GeoTransform:
+        """Get a geotransform for a raster starting at the given global pixel"""
+        pixels_per_degree = self.height_map_class.values_per_row - 1
+        return GeoTransform(
+            north_latitude=90 - row / pixels_per_degree,
+            west_longitude=column / pixels_per_degree - 180,
+            pixel_width=1 / pixels_per_degree,
+        )
+
+    def _window_base_coordinates(
+        self, first_row: int, first_column: int, rows: int, columns: int
+    ) -> Iterator[RasterBaseCoordinates]:
+        """Get the base coordinates of height maps covering a window of global pixels"""
+        pixels_per_degree = self.height_map_class.values_per_row - 1
+        for tile_row in range(
+            first_row // pixels_per_degree,
+            (first_row + rows - 1) // pixels_per_degree + 1,
+        ):
+            for tile_column in range(
+                first_column // pixels_per_degree,
+                (first_column + columns - 1) // pixels_per_degree + 1,
+            ):
+                yield RasterBaseCoordinates(
+                    latitude=89 - tile_row, longitude=tile_column - 180
+                )
+
+    def _check_window_has_data(
+        self, first_row: int, first_column: int, rows: int, columns: int
+    ):
+        """Raise a NoHeightMapDataException unless a height map has every pixel
+
+        Neighbouring height maps share their edge pixels, so pixels on a whole
+        degree are satisfied by any of the height maps sharing them. No data
+        is loaded.
+        """
+        pixels_per_degree = self.height_map_class.values_per_row - 1
+        for base in self._window_base_coordinates(
+            first_row, first_column, rows, columns
+        ):
+            if self._find_height_map(base) is not None:
+                continue
+
+            # The intersection of the window and the missing height map
+            tile_row = (89 - base.latitude) * pixels_per_degree
+            tile_column = (base.longitude + 180) * pixels_per_degree
+            top = max(first_row, tile_row)
+            bottom = min(first_row + rows - 1, tile_row + pixels_per_degree)
+            left = max(first_column, tile_column)
+            right = min(first_column + columns - 1, tile_column + pixels_per_degree)
+            # Only the first & last rows & columns may be shared with other
+            # height maps, so check those and any one pixel in between
+            for row in {top, min(top + 1, bottom), bottom}:
+                for column in {left, min(left + 1, right), right}:
+                    if not any(
+                        self._find_height_map(other) is not None
+                        for other in self._pixel_base_coordinates(row, column)
+                    ):
+                        raise self._no_data_exception(base)
+
+    def _pixel_base_coordinates(
+        self, row: int, column: int
+    ) -> Iterator[RasterBaseCoordinates]:
+        """Get the base coordinates of every height map containing a global pixel"""
+        pixels_per_degree = self.height_map_class.values_per_row - 1
+        tile_row, row_offset = divmod(row, pixels_per_degree)
+        tile_column, column_offset = divmod(column, pixels_per_degree)
+        # Pixels on a whole degree are also the last of the height map before
+        tile_rows = [tile_row] + ([tile_row - 1] if row_offset == 0 else [])
+        tile_columns = [tile_column] + ([tile_column - 1] if column_offset == 0 else [])
+        for tile_row in tile_rows:
+            for tile_column in tile_columns:
+                yield RasterBaseCoordinates(
+                    latitude=89 - tile_row, longitude=tile_column - 180
+                )
+
+    def _read_window(
+        self, first_row: int, first_column: int, rows: int, columns: int, fill_value
+    ):
+        """Read a window of global pixels, stitching together height maps
+
+        Pixels for which there is no height map are set to fill_value (or zero
+        if fill_value is None). Voids are set to NaN if fill_value requires a
+        float window.
+        """
+        numpy = require_numpy()
+        pixels_per_degree = self.height_map_class.values_per_row - 1
+        window = numpy.full(
+            (rows, columns),
+            0 if fill_value is None else fill_value,
+            dtype=self._altitudes_dtype(fill_value),
+        )
+
+        for base in self._window_base_coordinates(
+            first_row, first_column, rows, columns
+        ):
+            height_map = self._find_height_map(base)
+            if height_map is None:
+                continue
+
+            # The global pixel of this height map's first (north-west) pixel
+            tile_row = (89 - base.latitude) * pixels_per_degree
+            tile_column = (base.longitude + 180) * pixels_per_degree
+            # The intersection of the window and the height map. Height maps
+            # overlap by one pixel, which is harmlessly written twice
+            top = max(first_row, tile_row)
+            bottom = min(first_row + rows, tile_row + pixels_per_degree + 1)
+            left = max(first_column, tile_column)
+            right = min(first_column + columns, tile_column + pixels_per_degree + 1)
+
+            with self.tile_cache.pinned(height_map):
+                window[
+                    top - first_row : bottom - first_row,
+                    left - first_column : right - first_column,
+                ] = self._read_tile_rectangle(
+                    height_map,
+                    top - tile_row,
+                    bottom - tile_row,
+                    left - tile_column,
+                    right - tile_column,
+                )
+
+        if window.dtype.kind == "f":
+            window[window == NODATA] = numpy.nan
+        return window
+
+    def _read_tile_rectangle(
+        self, height_map: HeightMap, top: int, bottom: int, left: int, right: int
+    ):
+        """Read a rectangle of a height map's pixels on this collection's grid
+
+        Height maps of a different resolution (see LayeredHeightMapCollection)
+        are resampled to the grid, using the nearest of their own pixels.
+        """
+        pixels_per_degree = self.height_map_class.values_per_row - 1
+        if height_map.values_per_row - 1 == pixels_per_degree:
+            return height_map._read_rectangle(top, bottom, left, right)
+
+        numpy = require_numpy()
+        scale = (height_map.values_per_row - 1) / pixels_per_degree
+        rows = numpy.rint(numpy.arange(top, bottom) * scale).astype(numpy.intp)
+        columns = numpy.rint(numpy.arange(left, right) * scale).astype(numpy.intp)
+        rectangle = height_map._read_rectangle(
+            rows[0], rows[-1] + 1, columns[0], columns[-1] + 1
+        )
+        return rectangle[numpy.ix_(rows - rows[0], columns - columns[0])]
+
+    def get_terrain(
+        self,
+        min_latitude: float,
+        min_longitude: float,
+        max_latitude: float,
+        max_longitude: float,
+        derivative: str,
+        azimuth: float = 315,
+        altitude: float = 45,
+        allow_missing=False,
+    ) -> Terrain:
+        """Calculate a terrain derivative for all pixels within the given bounds
+
+        Derivative is "slope", "aspect", "hillshade" or "curvature", see
+        compute_terrain(). Azimuth & altitude give the direction of the light
+        for hillshade. Bounds are snapped to the nearest pixels, as per
+        get_region(). Pixels along the edges of height maps use their
+        neighbours in neighbouring height maps. If there is no neighbouring
+        height map the edge pixels are repeated instead.
+
+        The region is copied from the derivatives of the whole height maps it
+        is within, which are cached, see get_tile_terrain().
+
+        If there is no height map for part of the region then a
+        NoHeightMapDataException is raised before any data is loaded, unless
+        allow_missing is set, in which case those pixels are NaN. Requires
+        numpy.
+        """
+        numpy = require_numpy()
+        validate_derivative(derivative)
+        first_row, first_column, rows, columns = self._region_window(
+            min_latitude,
+            min_longitude,
+            max_latitude,
+            max_longitude,
+            fill_value=numpy.nan if allow_missing else None,
+        )
+
+        values = numpy.full((rows, columns), numpy.nan, dtype=numpy.float32)
+        pixels_per_degree = self.height_map_class.values_per_row - 1
+        # Including the height maps which only share the first row or column
+        for base in self._window_base_coordinates(
+            first_row - 1, first_column - 1, rows + 1, columns + 1
+        ):
+            if self._find_height_map(base) is None:
+                continue
+            tile_row = (89 - base.latitude) * pixels_per_degree
+            tile_column = (base.longitude + 180) * pixels_per_degree
+            top = max(first_row, tile_row)
+            bottom = min(first_row + rows, tile_row + pixels_per_degree + 1)
+            left = max(first_column, tile_column)
+            right = min(first_column + columns, tile_column + pixels_per_degree + 1)
+            if top >= bottom or left >= right:
+                continue
+            terrain = self.get_tile_terrain(base, derivative, azimuth, altitude)
+            values[
+                top - first_row : bottom - first_row,
+                left - first_column : right - first_column,
+            ] = terrain.values[
+                top - tile_row : bottom - tile_row,
+                left - tile_column : right - tile_column,
+            ]
+        return Terrain(values, self._global_geotransform(first_row, first_column))
+
+    def get_tile_terrain(
+        self,
+        base: RasterBaseCoordinates,
+        derivative: str,
+        azimuth: float = 315,
+        altitude: float = 45,
+    ) -> Terrain:
+        """Calculate a terrain derivative for every pixel of one height map
+
+        As per get_terrain(), for the height map with the given base
+        coordinates. Results are cached, and shared between callers so must
+        not be modified. Requires numpy.
+        """
+        base = RasterBaseCoordinates(*base)
+        validate_derivative(derivative)
+        light = (azimuth, altitude) if derivative == "hillshade" else None
+        key = (base, derivative, light)
+        with self._index_lock:
+            terrain = self._terrain_cache.get(key)
+            if terrain is not None:
+                self._terrain_cache.move_to_end(key)
+                return terrain
+
+        if self._find_height_map(base) is None:
+            raise self._no_data_exception(base)
+        pixels_per_degree = self.height_map_class.values_per_row - 1
+        terrain = self._read_terrain(
+            (89 - base.latitude) * pixels_per_degree,
+            (base.longitude + 180) * pixels_per_degree,
+            pixels_per_degree + 1,
+            pixels_per_degree + 1,
+            derivative,
+            azimuth,
+            altitude,
+        )
+        terrain.values.flags.writeable = False
+
+        with self._index_lock:
+            self._terrain_cache[key] = terrain
+            while len(self._terrain_cache) > self.max_cached_terrain:
+                self._terrain_cache.popitem(last=False)
+        return terrain
+
+    def _read_terrain(
+        self,
+        first_row: int,
+        first_column: int,
+        rows: int,
+        columns: int,
+        derivative: str,
+        azimuth: float,
+        altitude: float,
+    ) -> Terrain:
+        """Calculate a terrain derivative for a window of global pixels"""
+        numpy = require_numpy()
+        # Include a border of one pixel, for the neighbours of the edge pixels
+        elevations = self._read_window(
+            first_row - 1,
+            first_column - 1,
+            rows + 2,
+            columns + 2,
+            fill_value=numpy.inf,
+        )
+        if numpy.isinf(elevations).any():
+            # Repeat the pixels next to missing height maps, first from the rows
+            # then the columns beside them, so that pixels shared between height
+            # maps get the same neighbours whichever window they are read in
+            for axis in (0, 1):
+                inner = elevations[1:-1] if axis == 0 else elevations[:, 1:-1]
+                padding = ((1, 1), (0, 0)) if axis == 0 else ((0, 0), (1, 1))
+                edges = numpy.pad(inner, padding, mode="edge")
+                elevations = numpy.where(numpy.isinf(elevations), edges, elevations)
+            elevations[numpy.isinf(elevations)] = numpy.nan
+
+        values = compute_terrain(
+            elevations,
+            self._global_geotransform(first_row - 1, first_column - 1),
+            derivative,
+            azimuth,
+            altitude,
+        )
+        return Terrain(values, self._global_geotransform(first_row, first_column))
+
+    def get_viewshed(
+        self,
+        latitude: float,
+        longitude: float,
+        radius: float,
+        observer_height: float = 0,
+        target_height: float = 0,
+        apply_earth_curvature=True,
+    ) -> Viewshed:
+        """Calculate which pixels within radius meters are visible from a point
+
+        The observer is placed observer_height meters above the ground at the
+        pixel nearest to the given latitude & longitude. A pixel is visible if
+        a target target_height meters above it can be seen by the observer.
+        Pixels without height map data, and voids, are never visible and do not
+        obstruct the view. See compute_viewshed() for details. Requires numpy.
+        """
+        numpy = require_numpy()
+        pixel_width = 1 / (self.height_map_class.values_per_row - 1)
+
+        # Find the size of a window large enough to contain the radius
+        radius_in_degrees = degrees(radius / EARTH_RADIUS)
+        furthest_latitude = min(abs(latitude) + radius_in_degrees, 89.0)
+        row_radius = ceil(radius_in_degrees / pixel_width)
+        column_radius = ceil(row_radius / cos(radians(furthest_latitude)))
+
+        # Centre the window on the pixel nearest the observer
+        observer_row, observer_column = self._to_global_pixels(latitude, longitude)
+        first_row = observer_row - row_radius
+        first_column = observer_column - column_radius
+        elevations = self._read_window(
+            first_row,
+            first_column,
+            rows=row_radius * 2 + 1,
+            columns=column_radius * 2 + 1,
+            fill_value=numpy.nan,
+        )
+
+        geotransform = self._global_geotransform(first_row, first_column)
+        latitudes = geotransform.latitude(numpy.arange(row_radius * 2 + 1))
+        longitudes = geotransform.longitude(numpy.arange(column_radius * 2 + 1))
+        latitudes, longitudes = numpy.meshgrid(latitudes, longitudes, indexing="ij")
+        distances = haversine_array(
+            latitudes[row_radius, column_radius],
+            longitudes[row_radius, column_radius],
+            latitudes,
+            longitudes,
+        )
+
+        visible, angles = compute_viewshed(
+            elevations,
+            observer_row=row_radius,
+            observer_column=column_radius,
+            distances=distances,
+            observer_height=observer_height,
+            target_height=target_height,
+            apply_earth_curvature=apply_earth_curvature,
+        )
+        outside_radius = distances > radius
+        visible[outside_radius] = False
+        angles[outside_radius] = numpy.nan
+
+        return Viewshed(visible, angles, geotransform)
+
     def get_points(self, min_latitude, min_longitude, max_latitude, max_longitude) -> Generator[Tuple[float, float], None, None]:
         assert min_latitude < max_latitude
         assert min_longitude < max_longitude
@@ -161,11 +1427,243 @@ class HeightMapCollection:
             yield latitude, longitude
             latitude += step
 
+class OverviewHeightMapCollection(HeightMapCollection):
+    """ Provides access to the overviews of another collection's tiles
+
+    See HeightMapCollection.get_overview(). Overview files are found next to
+    the tiles of the given collection as they are needed.
+    """
+
+    def __init__(
+        self,
+        collection: HeightMapCollection,
+        factor: int,
+        aggregation: str = "mean",
+        max_loaded_tiles: int = None,
+        max_loaded_bytes: int = None,
+        instrumentation: Instrumentation = None,
+    ):
+        validate_overview(
+            collection.height_map_class.values_per_row, factor, aggregation
+        )
+        self.collection = collection
+        self.factor = factor
+        self.aggregation = aggregation
+        self.height_map_class = overview_height_map_class(
+            collection.height_map_class, factor
+        )
+        super().__init__(
+            auto_build_index=False,
+            hgt_dir=collection.hgt_dir,
+            use_mmap=collection.use_mmap,
+            max_loaded_tiles=max_loaded_tiles,
+            max_loaded_bytes=max_loaded_bytes,
+            instrumentation=instrumentation,
+            tile_pool=collection.tile_pool,
+        )
+
+    def build_file_index(self):
+        """Index the overviews of all tiles within the collection's index"""
+        height_maps = TileIndex()
+        for base in list(self.collection.height_maps):
+            height_map = self._make_overview_height_map(base)
+            if height_map is not None:
+                height_maps[base] = height_map
+
+        with self._index_lock:
+            self.tile_cache.clear()
+            self._terrain_cache.clear()
+            self._missing_height_maps = set()
+            self.height_maps = height_maps
+
+    def _find_height_map(self, base: RasterBaseCoordinates) -> Optional[HeightMap]:
+        height_map = self.height_maps.get(base)
+        if height_map is not None or base in self._missing_height_maps:
+            return height_map
+
+        with self._index_lock:
+            height_map = self.height_maps.get(base)
+            if height_map is not None or base in self._missing_height_maps:
+                return height_map
+
+            height_map = self._make_overview_height_map(base)
+            if height_map is None:
+                self._missing_height_maps.add(base)
+            else:
+                self.height_maps[base] = height_map
+            return height_map
+
+    def _make_overview_height_map(
+        self, base: RasterBaseCoordinates
+    ) -> Optional[HeightMap]:
+        tile = self.collection._find_height_map(base)
+        if tile is None:
+            return None
+        path = overview_path(tile.path, base, self.factor, self.aggregation)
+        if not path.exists():
+            return None
+        height_map_class = self.height_map_class
+        if tile.values_per_row != self.collection.height_map_class.values_per_row:
+            # A coarser tile within a LayeredHeightMapCollection
+            height_map_class = overview_height_map_class(type(tile), self.factor)
+        return height_map_class(
+            path=path,
+            base_coordinates=base,
+            use_mmap=self.use_mmap,
+            instrumentation=self.instrumentation,
+            tile_pool=self.tile_pool,
+        )
+
+    def _no_data_exception(
+        self, base: RasterBaseCoordinates
+    ) -> NoHeightMapDataException:
+        return NoHeightMapDataException(
+            f"{self.factor}x {self.aggregation} overview for {base} not found. "
+            f"Either the tile is missing from '{self.hgt_dir}', or its overviews "
+            f"have not been built with build_overviews()"
+        )
+
+    def build_overviews(self, factors: List[int] = None, overwrite=False) -> List[Path]:
+        return self.collection.build_overviews(factors, overwrite=overwrite)
+
+    def get_overview(
+        self, factor: int, aggregation: str = "mean"
+    ) -> "OverviewHeightMapCollection":
+        return self.collection.get_overview(factor, aggregation)
+
+    def get_overview_for_resolution(
+        self, resolution: float, aggregation: str = "mean"
+    ) -> HeightMapCollection:
+        return self.collection.get_overview_for_resolution(resolution, aggregation)
+
+
+class LayeredHeightMapCollection(HeightMapCollection):
+    """ Provides access to the tiles of several collections, best first
+
+    Collections are given in order of preference, e.g. SRTM1 then SRTM3. Each
+    tile is taken from the first collection which has it, as decided once per
+    tile when the index is built. Lookups then work exactly as they do for a
+    single collection, so batches of points spanning tiles from different
+    collections are still grouped by tile and looked up as arrays.
+
+    Profiles, regions & viewsheds are sampled at the resolution of the finest
+    collection, using the nearest pixels of any coarser tiles. Interpolation
+    does not cross between tiles of different resolutions, and uses the edge
+    pixels of a point's own tile instead.
+
+    The index is merged from the collections' own indexes, so call
+    build_file_index() on a collection (then on this) to pick up new files.
+    Collections using lazy_index are searched as tiles are first needed.
+    Tiles are loaded via this collection's own tile cache (and tile_pool, if
+    set), separately from the given collections.
+    """
+
+    def __init__(
+        self,
+        collections: List[HeightMapCollection],
+        auto_build_index=True,
+        max_loaded_tiles: int = None,
+        max_loaded_bytes: int = None,
+        instrumentation: Instrumentation = None,
+        tile_pool: TilePool = None,
+    ):
+        assert collections, "At least one collection is needed"
+        self.collections = list(collections)
+        finest = max(
+            self.collections,
+            key=lambda collection: collection.height_map_class.values_per_row,
+        )
+        self.height_map_class = finest.height_map_class
+        self.block_height_map_class = finest.block_height_map_class
+        super().__init__(
+            auto_build_index=auto_build_index,
+            hgt_dir=self.collections[0].hgt_dir,
+            max_loaded_tiles=max_loaded_tiles,
+            max_loaded_bytes=max_loaded_bytes,
+            lazy_index=any(collection.lazy_index for collection in self.collections),
+            instrumentation=instrumentation,
+            tile_pool=tile_pool,
+        )
+        if auto_build_index and self.lazy_index:
+            # Still merge the indexes of any collections which are not lazy
+            self.build_file_index()
+
+    def build_file_index(self):
+        """Index each tile of the first collection to have it
+
+        Merges the collections' current indexes, without rebuilding them. Any
+        collection using lazy_index may have any tile, so from the first such
+        collection onwards tiles are left to be found on first use.
+        """
+        merged = []
+        for collection in self.collections:
+            if collection.lazy_index:
+                break
+            merged.append(collection)
+
+        height_maps = TileIndex()
+        for collection in reversed(merged):
+            for tile in collection.height_maps.values():
+                height_maps[tile.base_coordinates] = self._copy_height_map(
+                    collection, tile
+                )
+
+        with self._index_lock:
+            self.tile_cache.clear()
+            self._terrain_cache.clear()
+            self._missing_height_maps = set()
+            self.height_maps = height_maps
+
+    def _copy_height_map(
+        self, collection: HeightMapCollection, tile: HeightMap
+    ) -> HeightMap:
+        """Copy a collection's height map, so that this tile cache can load it"""
+        height_map = collection._make_height_map(tile.path)
+        height_map.instrumentation = self.instrumentation
+        height_map.tile_pool = self.tile_pool
+        return height_map
+
+    def _find_height_map(self, base: RasterBaseCoordinates) -> Optional[HeightMap]:
+        height_map = self.height_maps.get(base)
+        if (
+            height_map is not None
+            or not self.lazy_index
+            or base in self._missing_height_maps
+        ):
+            return height_map
+
+        with self._index_lock:
+            height_map = self.height_maps.get(base)
+            if height_map is not None or base in self._missing_height_maps:
+                return height_map
+
+            for collection in self.collections:
+                tile = collection._find_height_map(base)
+                if tile is not None:
+                    height_map = self._copy_height_map(collection, tile)
+                    self.height_maps[base] = height_map
+                    return height_map
+            self._missing_height_maps.add(base)
+            return None
+
+    def _no_data_exception(
+        self, base: RasterBaseCoordinates
+    ) -> NoHeightMapDataException:
+        directories = ", ".join(
+            f"'{collection.hgt_dir}'" for collection in self.collections
+        )
+        return NoHeightMapDataException(
+            f"Height map for {base} not found in any of {directories}"
+        )
+
+
 class Srtm3HeightMapCollection(HeightMapCollection):
     height_map_class = Srtm3HeightMap
+    block_height_map_class = Srtm3BlockHeightMap
     hgt_dir = SRTM3_DIR
 
 
 class Srtm1HeightMapCollection(HeightMapCollection):
     height_map_class = Srtm1HeightMap
+    block_height_map_class = Srtm1BlockHeightMap
     hgt_dir = SRTM1_DIR
@@ -1,71 +1,349 @@
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Tuple, Callable
+from typing import Tuple, Callable, Union
 from zipfile import ZipFile
 
-from srtm.utilities import get_srtm3_file_path, get_srtm1_file_path
+from srtm.utilities import (
+    NODATA,
+    BlockExtrema,
+    calculate_block_extrema,
+    get_srtm3_file_path,
+    get_srtm1_file_path,
+    require_numpy,
+    interpolate_pixels,
+    validate_interpolation,
+)
 from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.block_format import BlockIndex, decompress_block, read_block_index
+from srtm.instrumentation import Instrumentation
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
 
 
 class HeightMap:
     """Provides access to a single SRTM HGT file
 
-    Data will be lazy-loaded on first access
+    Data will be lazy-loaded on first access. Loading is thread-safe, if
+    several threads need the data at once it is only loaded once.
+
+    Instances use __slots__, as a collection may hold one for every tile in
+    the world. Subclasses should declare __slots__ too.
     """
 
-    raster: bytes = None
+    __slots__ = (
+        "_path",
+        "base_coordinates",
+        "use_mmap",
+        "cache_dir",
+        "raster",
+        "_raster_array",
+        "_block_extrema",
+        "_load_lock",
+        "instrumentation",
+        "tile_pool",
+    )
+
+    raster: bytes
     base_coordinates: RasterBaseCoordinates
+    use_mmap: bool
+    cache_dir: Path
+    instrumentation: Instrumentation
+    tile_pool: "TilePool"
     file_path_fn: Callable = None
     expected_values = 1442401
     values_per_row = 1201
+    # We subtract one as each row overlaps the neighbouring raster by 1 pixel
+    pixel_width = 1 / (values_per_row - 1)
+    extrema_block_size = 32
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.pixel_width = 1 / (cls.values_per_row - 1)
 
-    def __init__(self, path: Path, base_coordinates: RasterBaseCoordinates = None):
+    def __init__(
+        self,
+        path: Path,
+        base_coordinates: RasterBaseCoordinates = None,
+        use_mmap: bool = None,
+        cache_dir: Path = None,
+        instrumentation: Instrumentation = None,
+        tile_pool: "TilePool" = None,
+    ):
         self.path = path
+        self.use_mmap = bool(use_mmap)
+        self.cache_dir = cache_dir
+        self.instrumentation = instrumentation
+        self.tile_pool = tile_pool
+        self.raster = None
+        self._raster_array = None
+        self._block_extrema: BlockExtrema = None
+        self._load_lock = threading.Lock()
         self.base_coordinates = (
             base_coordinates or RasterBaseCoordinates.from_file_path(path)
         )
 
-        # We subtract one as each row overlaps the neighbouring raster by 1 pixel
-        self.pixel_width = 1 / (self.values_per_row - 1)
+    @property
+    def path(self) -> Path:
+        return None if self._path is None else Path(self._path)
+
+    @path.setter
+    def path(self, path: Path):
+        # Stored as a string, which takes a fraction of the memory of a Path
+        self._path = None if path is None else os.fspath(path)
+
+    def __getstate__(self):
+        # Loaded data is not pickled (mmaps cannot be), it will be reloaded
+        # on demand once unpickled
+        state = {
+            name: getattr(self, name)
+            for cls in type(self).__mro__
+            for name in getattr(cls, "__slots__", ())
+            if hasattr(self, name)
+        }
+        state.update(getattr(self, "__dict__", {}))
+        state.pop("raster", None)
+        state.pop("_raster_array", None)
+        state.pop("_load_lock", None)
+        # Instrumentation is per process
+        state.pop("instrumentation", None)
+        return state
+
+    def __setstate__(self, state):
+        self.raster = None
+        self._raster_array = None
+        self._block_extrema = None
+        self.instrumentation = None
+        self.tile_pool = None
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._load_lock = threading.Lock()
 
     @classmethod
-    def from_base_coordinates(cls, base_coordinates: RasterBaseCoordinates):
+    def from_base_coordinates(
+        cls,
+        base_coordinates: RasterBaseCoordinates,
+        use_mmap: bool = None,
+        cache_dir: Path = None,
+    ):
         return cls(
             path=cls.file_path_fn(base_coordinates.file_name),
             base_coordinates=base_coordinates,
+            use_mmap=use_mmap,
+            cache_dir=cache_dir,
         )
 
-    def ensure_loaded(self, force=False):
-        """Ensure the file has been loaded from disk"""
-        if not force and self.raster is not None:
-            return
-
-        if ".zip" in self.path.suffixes:
-            zipped_files = ZipFile(self.path).namelist()
-            zipped_files = [name for name in zipped_files if ".hgt" in name]
-            assert len(zipped_files) == 1, (
-                f"ZIP at {self.path} contains the wrong number of hgt files "
-                f"({len(zipped_files)}!=1). Contains {zipped_files}"
-            )
-            self.raster = ZipFile(self.path).read(zipped_files[0])
+    def ensure_loaded(self, force=False) -> bytes:
+        """Ensure the file has been loaded from disk, returning the raster
+
+        Uncompressed files will be memory-mapped rather than read if use_mmap
+        is set. The data is then held in the OS page cache, which is shared
+        between all processes reading the same file.
+
+        If cache_dir is set, zipped files are extracted into it on first use
+        and subsequently loaded as uncompressed files. See extract_to_cache()
+
+        If tile_pool is set, the decompressed raster is instead attached from
+        shared memory, loaded by the pool's coordinator process if no other
+        process has already. See srtm.tile_pool
+
+        Threads which call this while another thread is loading the data wait
+        for that load rather than starting their own. The data is only made
+        available once it has passed validate().
+
+        Loads are reported to instrumentation, if set. See srtm.instrumentation
+        """
+        raster = self.raster
+        if not force and raster is not None:
+            return raster
+
+        with self._load_lock:
+            raster = self.raster
+            if not force and raster is not None:
+                # Loaded by another thread while we waited for the lock
+                return raster
+
+            instrumentation = self.instrumentation
+            if instrumentation is not None:
+                start = time.perf_counter()
+
+            if self.tile_pool is not None:
+                raster = self.tile_pool.attach(self)
+                method = "shared"
+            elif ".zip" in self.path.suffixes and self.cache_dir is not None:
+                try:
+                    raster = self._read_raw_file(self.extract_to_cache())
+                except FileNotFoundError:
+                    # Removed by another process, which extracted a newer
+                    # version of the zip file in the meantime
+                    raster = self._read_raw_file(self.extract_to_cache())
+                method = "cached_zip"
+            elif ".zip" in self.path.suffixes:
+                with ZipFile(self.path) as zip_file:
+                    raster = zip_file.read(self._zipped_hgt_name(zip_file))
+                method = "zip"
+            else:
+                raster = self._read_raw_file(self.path)
+                method = "mmap" if self.use_mmap else "read"
+
+            self.validate(raster)
+            self._raster_array = None
+            if force:
+                # The file may have changed since the extrema were calculated
+                self._block_extrema = None
+            self.raster = raster
+
+            if instrumentation is not None:
+                instrumentation.tile_loaded(
+                    self, time.perf_counter() - start, len(raster), method
+                )
+            return raster
+
+    def _read_raw_file(self, path: Path):
+        if self.use_mmap:
+            return self._mmap_file(path)
         else:
-            self.raster = self.path.read_bytes()
+            return path.read_bytes()
 
-        self.validate()
+    def _zipped_hgt_name(self, zip_file: ZipFile) -> str:
+        zipped_files = [name for name in zip_file.namelist() if ".hgt" in name]
+        assert len(zipped_files) == 1, (
+            f"ZIP at {self.path} contains the wrong number of hgt files "
+            f"({len(zipped_files)}!=1). Contains {zipped_files}"
+        )
+        return zipped_files[0]
 
-    def validate(self):
-        """Perform sanity checks"""
+    def extract_to_cache(self) -> Path:
+        """Extract this zipped file into cache_dir, returning the extracted path
+
+        Extracted files are named after the zip file's path, size and
+        modification time, so a changed zip file will be extracted afresh,
+        while different zip files of the same tile (e.g. SRTM1 & SRTM3) are
+        kept apart. Files are written to a temporary name and then atomically
+        renamed into place, so concurrent processes may safely share a cache
+        directory.
+        """
+        assert self.cache_dir is not None, "No cache_dir set"
+        hgt_name = self.base_coordinates.file_name
+        archive = hashlib.sha1(os.fsencode(self.path.resolve())).hexdigest()[:16]
+        stat = self.path.stat()
+        cached_name = f"{hgt_name}-{archive}-{stat.st_size}-{stat.st_mtime_ns}.raw"
+        cached_path = self.cache_dir / cached_name
+        if cached_path.exists():
+            return cached_path
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, temporary_path = tempfile.mkstemp(
+            dir=self.cache_dir, prefix=f".{hgt_name}-", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f, ZipFile(self.path) as zip_file:
+                with zip_file.open(self._zipped_hgt_name(zip_file)) as zipped_file:
+                    shutil.copyfileobj(zipped_file, f, length=1024 * 1024)
+            os.replace(temporary_path, cached_path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+        # Clean up any extractions of previous versions of the same zip file
+        for stale_path in self.cache_dir.glob(f"{hgt_name}-{archive}-*.raw"):
+            if stale_path != cached_path:
+                try:
+                    stale_path.unlink()
+                except OSError:
+                    pass
+
+        return cached_path
+
+    def unload(self):
+        """Release the loaded data. It will be reloaded on next access"""
+        with self._load_lock:
+            loaded = self.raster is not None
+            self.raster = None
+            self._raster_array = None
+            if loaded and self.tile_pool is not None:
+                self.tile_pool.detach(self)
+
+    @staticmethod
+    def _mmap_file(path: Path):
+        """Memory-map the given file read-only"""
+        with path.open("rb") as f:
+            if not path.stat().st_size:
+                # Empty files cannot be mapped, let validate() complain instead
+                return b""
+            # The mapping remains valid once the file has been closed
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def raster_array(self):
+        """The raster as a numpy array of shape (values_per_row, values_per_row)
+
+        This is a big-endian int16 view onto the raw raster data, so no data
+        is copied. Rows run north to south, columns run west to east. Requires
+        numpy. Will trigger loading of data.
+        """
+        raster_array = self._raster_array
+        if raster_array is None:
+            raster = self.ensure_loaded()
+            raster_array = (
+                require_numpy()
+                .frombuffer(raster, dtype=">i2")
+                .reshape(self.values_per_row, self.values_per_row)
+            )
+            if self.raster is raster:
+                # Unless another thread has unloaded the data in the meantime
+                self._raster_array = raster_array
+        return raster_array
+
+    @property
+    def block_extrema(self) -> BlockExtrema:
+        """The lowest & highest pixels within each block of extrema_block_size pixels
+
+        Calculated on first use, which will trigger loading of data. As they
+        are small, the extrema are kept when the data is unloaded. Requires
+        numpy.
+        """
+        block_extrema = self._block_extrema
+        if block_extrema is None:
+            block_extrema = calculate_block_extrema(
+                self._read_rectangle, self.values_per_row, self.extrema_block_size
+            )
+            self._block_extrema = block_extrema
+        return block_extrema
+
+    @property
+    def has_voids(self) -> bool:
+        """Whether any pixel is a void (NODATA), as found from block_extrema"""
+        return bool((self.block_extrema.minimums == NODATA).any())
+
+    def validate(self, raster: bytes = None):
+        """Perform sanity checks on the given raster, or on the loaded raster"""
+        if raster is None:
+            raster = self.raster
         expected_bytes = self.expected_values * 2
-        assert len(self.raster) == expected_bytes, (
+        assert len(raster) == expected_bytes, (
             f"Unexpected number of bytes found in {self.path}. "
-            f"Expected {expected_bytes:,}, found {len(self.raster):,}"
+            f"Expected {expected_bytes:,}, found {len(raster):,}"
         )
 
     def get_altitude_for_pixel(self, x, y) -> int:
         """Get the height at the given pixel
 
-        Will trigger loading of data
+        Voids are given as NODATA (-32768). Will trigger loading of data
         """
-        self.ensure_loaded()
+        if numpy is not None:
+            return int(self.raster_array[y - 1, x - 1])
+
+        raster = self.ensure_loaded()
         # Get the 1-indexed pixel number
         pixel_number = x + (y - 1) * self.values_per_row
         # Convert it ro be 0-indexed
@@ -73,16 +351,91 @@ class HeightMap:
 
         byte_number = pixel_number * 2
         return int.from_bytes(
-            self.raster[byte_number : byte_number + 2], byteorder="big", signed=True
+            raster[byte_number : byte_number + 2], byteorder="big", signed=True
         )
 
+    def get_altitudes_for_pixels(self, xs, ys):
+        """Get the heights at the given pixels as a numpy int16 array
+
+        Pixels are 1-indexed, as per get_altitude_for_pixel(). Requires numpy.
+        Will trigger loading of data
+        """
+        numpy = require_numpy()
+        xs = numpy.asarray(xs, dtype=numpy.intp)
+        ys = numpy.asarray(ys, dtype=numpy.intp)
+        for name, values in (("x", xs), ("y", ys)):
+            if values.size and (
+                values.min() < 1 or values.max() > self.values_per_row
+            ):
+                raise ValueError(
+                    f"Pixel {name} values must be between 1 and {self.values_per_row}"
+                )
+
+        return self._read_pixels(ys - 1, xs - 1).astype(numpy.int16)
+
     def get_altitude_for_latitude_and_longitude(
-        self, latitude: float, longitude: float
-    ) -> int:
-        """Get the height at the given lat/lng"""
+        self, latitude: float, longitude: float, interpolation: str = "nearest"
+    ) -> Union[int, float]:
+        """Get the height at the given lat/lng
+
+        Interpolation may be "nearest", "bilinear" or "bicubic". Nearest gives
+        an int (NODATA for voids), the others give a float (NaN near voids) and
+        require numpy.
+        """
+        if interpolation != "nearest":
+            altitudes = self.get_altitudes_for_latitudes_and_longitudes(
+                [latitude], [longitude], interpolation=interpolation
+            )
+            return float(altitudes[0])
+
         x, y = self._latitude_and_longitude_to_coordinates(latitude, longitude)
         return self.get_altitude_for_pixel(x, y)
 
+    def get_altitudes_for_latitudes_and_longitudes(
+        self, latitudes, longitudes, interpolation: str = "nearest"
+    ):
+        """Get the heights at the given lat/lngs as a numpy array
+
+        Interpolation may be "nearest", which gives an int16 array with voids
+        as NODATA, or "bilinear" or "bicubic", which give a float64 array with
+        NaN wherever a void contributes to the value. Pixels beyond the
+        edge of this height map are taken to equal the edge pixels, see
+        HeightMapCollection.get_altitudes() to interpolate across height maps.
+        Requires numpy.
+        """
+        validate_interpolation(interpolation)
+        if interpolation == "nearest":
+            xs, ys = self._latitudes_and_longitudes_to_coordinates(
+                latitudes, longitudes
+            )
+            return self.get_altitudes_for_pixels(xs, ys)
+
+        columns, rows = self._latitudes_and_longitudes_to_fractional_pixels(
+            latitudes, longitudes
+        )
+        return interpolate_pixels(
+            self._get_clamped_pixels, rows, columns, interpolation
+        )
+
+    def _get_clamped_pixels(self, rows, columns):
+        """Get values at 0-indexed pixels, clamping positions to within the raster"""
+        numpy = require_numpy()
+        last = self.values_per_row - 1
+        return self._read_pixels(
+            numpy.clip(rows, 0, last), numpy.clip(columns, 0, last)
+        )
+
+    def _read_pixels(self, rows, columns):
+        """Get values at arrays of 0-indexed pixels, which must be within the raster"""
+        return self.raster_array[rows, columns]
+
+    def _read_rectangle(self, top: int, bottom: int, left: int, right: int):
+        """Get a 2D array of the 0-indexed pixels within the given bounds
+
+        Bottom & right are exclusive. Will trigger loading of data
+        """
+        return self.raster_array[top:bottom, left:right]
+
     def _latitude_and_longitude_to_coordinates(
         self, latitude: float, longitude: float
     ) -> Tuple[int, int]:
@@ -109,6 +462,47 @@ class HeightMap:
 
         return x, y
 
+    def _latitudes_and_longitudes_to_coordinates(self, latitudes, longitudes):
+        """Vectorised version of _latitude_and_longitude_to_coordinates()
+
+        Returns a tuple of x & y numpy arrays
+        """
+        numpy = require_numpy()
+        columns, rows = self._latitudes_and_longitudes_to_fractional_pixels(
+            latitudes, longitudes
+        )
+        # numpy.rint() rounds halves to even, the same as round(). Add one
+        # because pixels are 1-indexed
+        xs = numpy.rint(columns).astype(numpy.intp) + 1
+        ys = numpy.rint(rows).astype(numpy.intp) + 1
+        return xs, ys
+
+    def _latitudes_and_longitudes_to_fractional_pixels(self, latitudes, longitudes):
+        """Convert lat/lngs into fractional 0-indexed pixel positions
+
+        Returns a tuple of column & row numpy arrays
+        """
+        numpy = require_numpy()
+        origin_latitude = self.base_coordinates.latitude + 1
+        origin_longitude = self.base_coordinates.longitude
+        latitude_offsets = origin_latitude - numpy.asarray(latitudes, dtype=float)
+        longitude_offsets = numpy.asarray(longitudes, dtype=float) - origin_longitude
+
+        outside = (latitude_offsets > 1) | (latitude_offsets < 0)
+        if outside.any():
+            raise ValueError(
+                f"{outside.sum()} latitude(s) are not within this heightmap of "
+                f"base coordinates {self.base_coordinates}"
+            )
+        outside = (longitude_offsets > 1) | (longitude_offsets < 0)
+        if outside.any():
+            raise ValueError(
+                f"{outside.sum()} longitude(s) are not within this heightmap of "
+                f"base coordinates {self.base_coordinates}"
+            )
+
+        return longitude_offsets / self.pixel_width, latitude_offsets / self.pixel_width
+
 
 class Srtm1HeightMap(HeightMap):
     """Provides access to a single SRTM HGT file
@@ -116,8 +510,7 @@ class Srtm1HeightMap(HeightMap):
     Data will be lazy-loaded on first access
     """
 
-    raster: bytes = None
-    base_coordinates: RasterBaseCoordinates
+    __slots__ = ()
 
     expected_values = 12967201
     values_per_row = 3601
@@ -130,8 +523,236 @@ class Srtm3HeightMap(HeightMap):
     Data will be lazy-loaded on first access
     """
 
-    raster: bytes = None
-    base_coordinates: RasterBaseCoordinates
+    __slots__ = ()
+
     expected_values = 1442401
     values_per_row = 1201
     file_path_fn = get_srtm3_file_path
+
+
+class BlockHeightMap(HeightMap):
+    """Provides access to a single block-compressed tile, see srtm.block_format
+
+    Loading only reads (or memory-maps) the compressed file. Each block of
+    pixels is then decompressed on first use, and the most recently used
+    max_cached_blocks blocks are kept. Looking up a single point therefore
+    decompresses one small block rather than the whole tile.
+
+    Reading raster_array decompresses the whole tile, and holds it in memory
+    until the tile is unloaded.
+
+    With a tile_pool, the pool's coordinator decompresses the whole tile into
+    shared memory instead, which is then read exactly as an HGT raster.
+    """
+
+    __slots__ = ("_blocks", "_blocks_lock", "_block_index")
+
+    max_cached_blocks = 64
+    file_path_fn: Callable = None
+
+    def __init__(
+        self,
+        path: Path,
+        base_coordinates: RasterBaseCoordinates = None,
+        use_mmap: bool = None,
+        cache_dir: Path = None,
+        instrumentation: Instrumentation = None,
+        tile_pool: "TilePool" = None,
+    ):
+        super().__init__(
+            path,
+            base_coordinates=base_coordinates,
+            use_mmap=use_mmap,
+            cache_dir=cache_dir,
+            instrumentation=instrumentation,
+            tile_pool=tile_pool,
+        )
+        self._reset_blocks()
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        for name in ("_blocks", "_blocks_lock", "_block_index"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._reset_blocks()
+
+    def _reset_blocks(self):
+        self._blocks_lock = threading.Lock()
+        self._blocks = OrderedDict()
+        # The raster the index was read from, and the index itself
+        self._block_index: Tuple[bytes, BlockIndex] = (None, None)
+
+    def ensure_loaded(self, force=False) -> bytes:
+        raster = super().ensure_loaded(force=force)
+        if force:
+            with self._blocks_lock:
+                self._blocks.clear()
+        return raster
+
+    def unload(self):
+        super().unload()
+        with self._blocks_lock:
+            self._blocks.clear()
+            self._block_index = (None, None)
+
+    def validate(self, raster: bytes = None):
+        """Perform sanity checks on the given raster, or on the loaded raster"""
+        if self.tile_pool is not None:
+            return super().validate(raster)
+        if raster is None:
+            raster = self.raster
+        try:
+            index = read_block_index(raster)
+        except ValueError as e:
+            raise AssertionError(f"Invalid block-compressed tile {self.path}: {e}")
+        assert index.values_per_row == self.values_per_row, (
+            f"Unexpected number of values per row in {self.path}. "
+            f"Expected {self.values_per_row:,}, found {index.values_per_row:,}"
+        )
+
+    def _get_block_index(self, raster: bytes) -> BlockIndex:
+        indexed_raster, index = self._block_index
+        if indexed_raster is not raster:
+            index = read_block_index(raster)
+            self._block_index = (raster, index)
+        return index
+
+    def _get_block(self, block: int) -> Tuple[BlockIndex, bytes]:
+        """Get the decompressed data of the given block, numbered in row-major order"""
+        raster = self.ensure_loaded()
+        index = self._get_block_index(raster)
+        with self._blocks_lock:
+            data = self._blocks.get(block)
+            if data is not None:
+                self._blocks.move_to_end(block)
+                return index, data
+
+        data = decompress_block(raster, index, block)
+        with self._blocks_lock:
+            self._blocks[block] = data
+            while len(self._blocks) > self.max_cached_blocks:
+                self._blocks.popitem(last=False)
+        return index, data
+
+    def _get_block_array(self, block: int):
+        """Get the given block as a 2D numpy array"""
+        index, data = self._get_block(block)
+        block_row, block_column = divmod(block, index.blocks_per_row)
+        return (
+            require_numpy()
+            .frombuffer(data, dtype=">i2")
+            .reshape(index.block_shape(block_row, block_column))
+        )
+
+    @property
+    def raster_array(self):
+        """The raster as a numpy array of shape (values_per_row, values_per_row)
+
+        Unlike for HGT files, this decompresses the whole tile. Requires numpy.
+        Will trigger loading of data.
+        """
+        if self.tile_pool is not None:
+            return HeightMap.raster_array.fget(self)
+        raster_array = self._raster_array
+        if raster_array is None:
+            raster = self.ensure_loaded()
+            raster_array = self._read_rectangle(
+                0, self.values_per_row, 0, self.values_per_row
+            )
+            if self.raster is raster:
+                # Unless another thread has unloaded the data in the meantime
+                self._raster_array = raster_array
+        return raster_array
+
+    def get_altitude_for_pixel(self, x, y) -> int:
+        """Get the height at the given pixel
+
+        Only the block containing the pixel is decompressed. Will trigger
+        loading of data
+        """
+        if self.tile_pool is not None:
+            return super().get_altitude_for_pixel(x, y)
+        index = self._get_block_index(self.ensure_loaded())
+        block_row, row = divmod(y - 1, index.block_size)
+        block_column, column = divmod(x - 1, index.block_size)
+        _, data = self._get_block(block_row * index.blocks_per_row + block_column)
+        _, block_columns = index.block_shape(block_row, block_column)
+        byte_number = (row * block_columns + column) * 2
+        return int.from_bytes(
+            data[byte_number : byte_number + 2], byteorder="big", signed=True
+        )
+
+    def _read_pixels(self, rows, columns):
+        """Get values at arrays of 0-indexed pixels, decompressing only their blocks"""
+        if self.tile_pool is not None:
+            return super()._read_pixels(rows, columns)
+        numpy = require_numpy()
+        rows = numpy.asarray(rows, dtype=numpy.intp)
+        columns = numpy.asarray(columns, dtype=numpy.intp)
+        index = self._get_block_index(self.ensure_loaded())
+        block_rows, block_pixel_rows = numpy.divmod(rows, index.block_size)
+        block_columns, block_pixel_columns = numpy.divmod(columns, index.block_size)
+        blocks = block_rows * index.blocks_per_row + block_columns
+
+        values = numpy.empty(rows.shape, dtype=numpy.int16)
+        for block in numpy.unique(blocks).tolist():
+            mask = blocks == block
+            values[mask] = self._get_block_array(block)[
+                block_pixel_rows[mask], block_pixel_columns[mask]
+            ]
+        return values
+
+    def _read_rectangle(self, top: int, bottom: int, left: int, right: int):
+        """Get a 2D array of the 0-indexed pixels within the given bounds
+
+        Only the blocks overlapping the bounds are decompressed. Bottom & right
+        are exclusive. Will trigger loading of data
+        """
+        if self.tile_pool is not None:
+            return super()._read_rectangle(top, bottom, left, right)
+        numpy = require_numpy()
+        if self._raster_array is not None:
+            return self._raster_array[top:bottom, left:right]
+
+        index = self._get_block_index(self.ensure_loaded())
+        block_size = index.block_size
+        rectangle = numpy.empty((bottom - top, right - left), dtype=">i2")
+        for block_row in range(top // block_size, -(-bottom // block_size)):
+            for block_column in range(left // block_size, -(-right // block_size)):
+                block_top = block_row * block_size
+                block_left = block_column * block_size
+                block_array = self._get_block_array(
+                    block_row * index.blocks_per_row + block_column
+                )
+                # The intersection of the rectangle and the block
+                intersection_top = max(top, block_top)
+                intersection_bottom = min(bottom, block_top + block_array.shape[0])
+                intersection_left = max(left, block_left)
+                intersection_right = min(right, block_left + block_array.shape[1])
+                rectangle[
+                    intersection_top - top : intersection_bottom - top,
+                    intersection_left - left : intersection_right - left,
+                ] = block_array[
+                    intersection_top - block_top : intersection_bottom - block_top,
+                    intersection_left - block_left : intersection_right - block_left,
+                ]
+        return rectangle
+
+
+class Srtm1BlockHeightMap(BlockHeightMap, Srtm1HeightMap):
+    """Provides access to a single block-compressed SRTM1 tile"""
+
+    __slots__ = ()
+
+    file_path_fn: Callable = None
+
+
+class Srtm3BlockHeightMap(BlockHeightMap, Srtm3HeightMap):
+    """Provides access to a single block-compressed SRTM3 tile"""
+
+    __slots__ = ()
+
+    file_path_fn: Callable = None
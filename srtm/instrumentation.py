@@ -0,0 +1,277 @@
+"""Hooks for measuring what collections & height maps are doing
+
+Pass an Instrumentation to HeightMapCollection(instrumentation=...) or
+HeightMapCollection.instrument(). Use Metrics to count events in memory and
+export them to Prometheus, or StatsdInstrumentation to send each event to
+StatsD. Subclass Instrumentation to send events anywhere else.
+
+Nothing is measured unless a collection is instrumented. Lookup methods are
+wrapped when instrumentation is enabled, rather than checking for it on
+every call, so uninstrumented collections do no extra work at all.
+"""
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from typing import Callable, Dict
+
+# Instrumented lookup methods, and how to count the points each one returns
+LOOKUP_METHODS: Dict[str, Callable] = {
+    "get_altitude": lambda result: 1,
+    "get_altitudes": lambda altitudes: altitudes.size,
+    "get_elevation_profile": len,
+    "get_elevation_profile_arrays": lambda profile: len(profile.latitudes),
+    "has_line_of_sight": lambda result: 1,
+    "get_viewshed": lambda viewshed: viewshed.visible.size,
+}
+# Methods replaced on instrumented objects, which must not be pickled
+INSTRUMENTED_ATTRIBUTES = tuple(LOOKUP_METHODS) + (
+    "_no_data_exception",
+    "_no_data",
+    "load",
+)
+
+
+class Instrumentation:
+    """Receives events from instrumented collections & height maps
+
+    Every method does nothing, override those of interest. Methods may be
+    called from multiple threads at once.
+    """
+
+    def tile_loaded(self, height_map, seconds: float, size: int, method: str):
+        """A height map's data was loaded from disk
+
+        size is the number of bytes loaded. method is "read" or "mmap" for
+        uncompressed files, "zip" for zipped files, "cached_zip" for
+        zipped files loaded from a cache_dir, and "shared" for height maps
+        attached from a tile pool (see srtm.tile_pool).
+        """
+
+    def tile_evicted(self, height_map):
+        """A height map was unloaded to stay within the tile cache's budget"""
+
+    def tile_accessed(self, height_map):
+        """A height map's data was used by a lookup, whether loaded or not"""
+
+    def lookup(self, method: str, points: int, seconds: float):
+        """A collection lookup method was called, returning the given points
+
+        Only calls from outside the collection are reported, e.g.
+        get_elevation_profile() is not also reported as get_altitudes().
+        """
+
+    def no_data(self, base_coordinates):
+        """There was no height map for the given base coordinates
+
+        Whether a NoHeightMapDataException was raised, or the points were set
+        to a fill_value instead.
+        """
+
+
+class Metrics(Instrumentation):
+    """Counts events & totals timings in memory
+
+    Use snapshot() to read the figures, or to_prometheus() for Prometheus'
+    text format, e.g. to serve from a /metrics endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.tile_loads = Counter()
+            self.tile_load_seconds = Counter()
+            self.tile_load_bytes = Counter()
+            self.tile_evictions = 0
+            self.tile_accesses = Counter()
+            self.lookups = Counter()
+            self.lookup_points = Counter()
+            self.lookup_seconds = Counter()
+            self.no_data_tiles = Counter()
+
+    def tile_loaded(self, height_map, seconds: float, size: int, method: str):
+        with self._lock:
+            self.tile_loads[method] += 1
+            self.tile_load_seconds[method] += seconds
+            self.tile_load_bytes[method] += size
+
+    def tile_evicted(self, height_map):
+        with self._lock:
+            self.tile_evictions += 1
+
+    def tile_accessed(self, height_map):
+        with self._lock:
+            self.tile_accesses[height_map.base_coordinates.file_name] += 1
+
+    def lookup(self, method: str, points: int, seconds: float):
+        with self._lock:
+            self.lookups[method] += 1
+            self.lookup_points[method] += points
+            self.lookup_seconds[method] += seconds
+
+    def no_data(self, base_coordinates):
+        with self._lock:
+            self.no_data_tiles[base_coordinates.file_name] += 1
+
+    def hot_tiles(self, n: int = 10):
+        """Get the n most accessed tiles, as (tile name, accesses) tuples"""
+        with self._lock:
+            return self.tile_accesses.most_common(n)
+
+    def snapshot(self) -> Dict:
+        """Get a copy of all figures, keyed by metric then by label"""
+        with self._lock:
+            return {
+                "tile_loads": dict(self.tile_loads),
+                "tile_load_seconds": dict(self.tile_load_seconds),
+                "tile_load_bytes": dict(self.tile_load_bytes),
+                "tile_evictions": self.tile_evictions,
+                "tile_accesses": dict(self.tile_accesses),
+                "lookups": dict(self.lookups),
+                "lookup_points": dict(self.lookup_points),
+                "lookup_seconds": dict(self.lookup_seconds),
+                "no_data": dict(self.no_data_tiles),
+            }
+
+    def to_prometheus(self, prefix: str = "srtm", per_tile=True) -> str:
+        """Format all figures in Prometheus' text exposition format
+
+        Every figure is a counter. Set per_tile to False to leave out the
+        figures labelled by tile, which may have thousands of labels.
+        """
+        snapshot = self.snapshot()
+        metrics = [
+            ("tile_loads_total", "method", snapshot["tile_loads"]),
+            ("tile_load_seconds_total", "method", snapshot["tile_load_seconds"]),
+            ("tile_load_bytes_total", "method", snapshot["tile_load_bytes"]),
+            ("tile_evictions_total", None, snapshot["tile_evictions"]),
+            ("lookups_total", "method", snapshot["lookups"]),
+            ("lookup_points_total", "method", snapshot["lookup_points"]),
+            ("lookup_seconds_total", "method", snapshot["lookup_seconds"]),
+            ("no_data_total", None, sum(snapshot["no_data"].values())),
+        ]
+        if per_tile:
+            metrics += [
+                ("tile_accesses_total", "tile", snapshot["tile_accesses"]),
+                ("tile_no_data_total", "tile", snapshot["no_data"]),
+            ]
+
+        lines = []
+        for name, label, values in metrics:
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            if label is None:
+                lines.append(f"{prefix}_{name} {values}")
+                continue
+            for label_value, value in sorted(values.items()):
+                lines.append(f'{prefix}_{name}{{{label}="{label_value}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+class StatsdInstrumentation(Instrumentation):
+    """Sends each event to StatsD as it happens
+
+    send is called with each metric in StatsD's line format, e.g. to send it
+    over UDP:
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        StatsdInstrumentation(lambda line: sock.sendto(line.encode(), address))
+
+    Timings are sent in milliseconds. Tile accesses are not sent, as there is
+    one per lookup, see Metrics.hot_tiles() instead.
+    """
+
+    def __init__(self, send: Callable[[str], None], prefix: str = "srtm"):
+        self.send = send
+        self.prefix = prefix
+
+    def tile_loaded(self, height_map, seconds: float, size: int, method: str):
+        self.send(f"{self.prefix}.tile_load.{method}:{seconds * 1000:.3f}|ms")
+        self.send(f"{self.prefix}.tile_load_bytes.{method}:{size}|c")
+
+    def tile_evicted(self, height_map):
+        self.send(f"{self.prefix}.tile_evictions:1|c")
+
+    def lookup(self, method: str, points: int, seconds: float):
+        self.send(f"{self.prefix}.lookup.{method}:{seconds * 1000:.3f}|ms")
+        self.send(f"{self.prefix}.lookup_points.{method}:{points}|c")
+
+    def no_data(self, base_coordinates):
+        self.send(f"{self.prefix}.no_data:1|c")
+
+
+def instrument_collection(collection, instrumentation: Instrumentation = None):
+    """Report the events of a collection, its tile cache & height maps
+
+    Replaces any previous instrumentation. Pass None to remove it. See
+    HeightMapCollection.instrument()
+    """
+    tile_cache = collection.tile_cache
+    for name in INSTRUMENTED_ATTRIBUTES:
+        collection.__dict__.pop(name, None)
+        tile_cache.__dict__.pop(name, None)
+    collection.instrumentation = instrumentation
+    tile_cache.instrumentation = instrumentation
+    for height_map in collection.height_maps.values():
+        height_map.instrumentation = instrumentation
+    if instrumentation is None:
+        return
+
+    # Lookups made by other lookups are not reported
+    active = threading.local()
+    for name in LOOKUP_METHODS:
+        setattr(
+            collection,
+            name,
+            _timed_lookup(getattr(collection, name), instrumentation, active),
+        )
+
+    no_data_exception = collection._no_data_exception
+
+    @wraps(no_data_exception)
+    def counted_no_data_exception(base):
+        instrumentation.no_data(base)
+        return no_data_exception(base)
+
+    collection._no_data_exception = counted_no_data_exception
+
+    no_data = collection._no_data
+
+    @wraps(no_data)
+    def counted_no_data(base):
+        instrumentation.no_data(base)
+        return no_data(base)
+
+    collection._no_data = counted_no_data
+
+    load = tile_cache.load
+
+    @wraps(load)
+    def counted_load(height_map, *args, **kwargs):
+        instrumentation.tile_accessed(height_map)
+        return load(height_map, *args, **kwargs)
+
+    tile_cache.load = counted_load
+
+
+def _timed_lookup(method: Callable, instrumentation: Instrumentation, active):
+    count_points = LOOKUP_METHODS[method.__name__]
+
+    @wraps(method)
+    def timed_lookup(*args, **kwargs):
+        if getattr(active, "lookup", False):
+            return method(*args, **kwargs)
+
+        active.lookup = True
+        try:
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            seconds = time.perf_counter() - start
+        finally:
+            active.lookup = False
+        instrumentation.lookup(method.__name__, count_points(result), seconds)
+        return result
+
+    return timed_lookup
@@ -0,0 +1,197 @@
+"""Precomputed, lower resolution overviews of tiles
+
+An overview at factor f has one pixel for every f pixels of the tile it was
+built from, in each direction. Overview pixels lie on the tile's own pixel
+grid, so an overview of a tile with n values per row has (n - 1) / f + 1
+values per row, and neighbouring overviews still overlap by one pixel.
+
+Each overview pixel aggregates the f + 1 x f + 1 box of tile pixels centred
+on it, clipped to the tile. The boxes of neighbouring pixels share their
+edges, so every tile pixel is covered. This makes min & max overviews safe
+bounds for any point between their pixels.
+
+Overviews are stored next to their tiles as raw big-endian int16 rasters
+(the same layout as HGT files) named, e.g. N40W008.4x.max.ovr, with one file
+per factor & aggregation.
+"""
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple, Type
+
+from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.height_maps import HeightMap
+from srtm.utilities import NODATA, require_numpy
+
+OVERVIEW_FILE_SUFFIX = ".ovr"
+AGGREGATIONS = ("mean", "min", "max")
+
+_overview_height_map_classes: Dict[Tuple[Type[HeightMap], int], Type[HeightMap]] = {}
+
+
+def overview_factors(values_per_row: int) -> List[int]:
+    """Get the overview factors available for tiles of the given size
+
+    These are the powers of two which evenly divide the tile's pixels, and
+    which leave overviews of at least two pixels.
+    """
+    factors = []
+    factor = 2
+    while (values_per_row - 1) % factor == 0 and (values_per_row - 1) // factor > 1:
+        factors.append(factor)
+        factor *= 2
+    return factors
+
+
+def validate_overview(values_per_row: int, factor: int, aggregation: str):
+    if factor not in overview_factors(values_per_row):
+        raise ValueError(
+            f"Overview factor {factor} is not available for tiles with "
+            f"{values_per_row} values per row, must be one of "
+            f"{', '.join(map(str, overview_factors(values_per_row)))}"
+        )
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(
+            f"Unknown aggregation '{aggregation}', must be one of "
+            f"{', '.join(AGGREGATIONS)}"
+        )
+
+
+def overview_path(
+    tile_path: Path, base: RasterBaseCoordinates, factor: int, aggregation: str
+) -> Path:
+    """Get the path of an overview of the tile at tile_path"""
+    return (
+        tile_path.parent
+        / f"{base.file_name}.{factor}x.{aggregation}{OVERVIEW_FILE_SUFFIX}"
+    )
+
+
+def overview_height_map_class(
+    height_map_class: Type[HeightMap], factor: int
+) -> Type[HeightMap]:
+    """Get a HeightMap class for overviews of height_map_class's tiles
+
+    Classes are created on first use, and registered within this module so
+    that their instances can be pickled.
+    """
+    key = (height_map_class, factor)
+    if key not in _overview_height_map_classes:
+        values_per_row = (height_map_class.values_per_row - 1) // factor + 1
+        name = f"{height_map_class.__name__}Overview{factor}x"
+        overview_class = type(
+            name,
+            (HeightMap,),
+            {
+                "__doc__": f"Provides access to a {factor}x overview file",
+                "__module__": __name__,
+                "__slots__": (),
+                "values_per_row": values_per_row,
+                "expected_values": values_per_row ** 2,
+            },
+        )
+        globals()[name] = overview_class
+        _overview_height_map_classes[key] = overview_class
+    return _overview_height_map_classes[key]
+
+
+def aggregate_raster(raster_array, factor: int) -> Dict[str, "numpy.ndarray"]:
+    """Calculate the mean, min & max overviews of a 2D raster at the given factor
+
+    Returns a dict of int16 arrays keyed by aggregation. Means are rounded to
+    the nearest integer. Voids (NODATA) are left out of every aggregation, and
+    overview pixels are only voids if their whole box is. Requires numpy.
+    """
+    numpy = require_numpy()
+    raster_array = numpy.asarray(raster_array)
+    rows, columns = raster_array.shape
+    assert (rows - 1) % factor == 0 and (columns - 1) % factor == 0, (
+        f"A raster of {rows}x{columns} pixels cannot be aggregated by a factor "
+        f"of {factor}"
+    )
+
+    # Voids are the lowest possible value so are ignored by maximums as they
+    # are, but must be the highest possible value to be ignored by minimums
+    valid = raster_array != NODATA
+    sums = numpy.where(valid, raster_array, 0).astype(numpy.int64)
+    counts = valid.astype(numpy.int64)
+    minimums = numpy.where(valid, raster_array, numpy.iinfo(numpy.int16).max)
+    maximums = raster_array
+    # Boxes are separable, so reduce along the rows then along the columns
+    for axis in (0, 1):
+        sums = _box_reduce(sums, factor, axis, numpy.add)
+        counts = _box_reduce(counts, factor, axis, numpy.add)
+        minimums = _box_reduce(minimums, factor, axis, numpy.minimum)
+        maximums = _box_reduce(maximums, factor, axis, numpy.maximum)
+
+    voids = counts == 0
+    means = numpy.rint(sums / numpy.maximum(counts, 1))
+    return {
+        "mean": numpy.where(voids, NODATA, means).astype(numpy.int16),
+        "min": numpy.where(voids, NODATA, minimums).astype(numpy.int16),
+        "max": maximums.astype(numpy.int16),
+    }
+
+
+def _box_reduce(values, factor: int, axis: int, ufunc):
+    """Reduce boxes of factor + 1 values centred on every factor'th value"""
+    numpy = require_numpy()
+    length = values.shape[axis]
+    centres = numpy.arange(0, length, factor)
+    shape = [1, 1]
+    shape[axis] = -1
+
+    result = None
+    for offset in range(-(factor // 2), factor // 2 + 1):
+        indices = centres + offset
+        taken = numpy.take(values, numpy.clip(indices, 0, length - 1), axis=axis)
+        if ufunc is numpy.add:
+            # Clipped indices repeat the edge values, which only matters for sums
+            outside = (indices < 0) | (indices >= length)
+            taken = numpy.where(outside.reshape(shape), 0, taken)
+        result = taken if result is None else ufunc(result, taken)
+    return result
+
+
+def write_overviews(
+    height_map: HeightMap, factors: List[int] = None, overwrite=False
+) -> List[Path]:
+    """Build & write all overviews of the given height map, returning their paths
+
+    factors defaults to every available factor. Existing overviews are left
+    alone unless overwrite is set. Will trigger loading of data. Requires
+    numpy.
+    """
+    base = height_map.base_coordinates
+    if factors is None:
+        factors = overview_factors(height_map.values_per_row)
+
+    paths = []
+    for factor in factors:
+        validate_overview(height_map.values_per_row, factor, AGGREGATIONS[0])
+        factor_paths = {
+            aggregation: overview_path(height_map.path, base, factor, aggregation)
+            for aggregation in AGGREGATIONS
+        }
+        paths.extend(factor_paths.values())
+        if not overwrite and all(path.exists() for path in factor_paths.values()):
+            continue
+
+        overviews = aggregate_raster(height_map.raster_array, factor)
+        for aggregation, path in factor_paths.items():
+            _write_file(path, overviews[aggregation].astype(">i2").tobytes())
+    return paths
+
+
+def _write_file(path: Path, data: bytes):
+    # Write atomically so that concurrent readers never see a partial overview
+    fd, temporary_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.stem}-", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
@@ -0,0 +1,106 @@
+from multiprocessing import Pool
+from typing import Iterable, Iterator, List, NamedTuple
+
+from srtm.height_map_collection import HeightMapCollection
+from srtm.utilities import get_clearances
+
+
+class Link(NamedTuple):
+    """A pair of end points between which to calculate clearances
+
+    Elevation offsets are the heights of the antennas (or similar) above
+    ground level, in meters.
+    """
+
+    start_latitude: float
+    start_longitude: float
+    end_latitude: float
+    end_longitude: float
+    start_elevation_offset: float = 0
+    end_elevation_offset: float = 0
+
+
+# State for each worker process, see _init_worker()
+_worker_collection: HeightMapCollection = None
+_worker_apply_earth_curvature = True
+
+
+def iter_clearances(
+    collection: HeightMapCollection,
+    links: Iterable[Link],
+    processes: int = None,
+    chunk_size: int = 64,
+    apply_earth_curvature=True,
+) -> Iterator[List[float]]:
+    """Calculate clearances for many links across a pool of processes
+
+    Yields the get_clearances() result for each link, in the same order as
+    the links were given. Results are streamed as they become available, and
+    links may be any iterable of Link (or equivalent tuples).
+
+    Links are sent to workers in batches of chunk_size. processes defaults to
+    the number of CPUs, and setting it to 1 disables the pool entirely.
+
+    Each worker memory-maps uncompressed HGT files, so tile data is shared
+    via the OS page cache rather than loaded into every worker. To share
+    zipped HGT files, set a cache_dir on the collection.
+    """
+    links = (Link(*link) for link in links)
+    if processes == 1:
+        for link in links:
+            yield _link_clearances(collection, link, apply_earth_curvature)
+        return
+
+    with Pool(
+        processes,
+        initializer=_init_worker,
+        initargs=(collection, apply_earth_curvature),
+    ) as pool:
+        yield from pool.imap(_worker_link_clearances, links, chunksize=chunk_size)
+
+
+def get_clearances_batch(
+    collection: HeightMapCollection,
+    links: Iterable[Link],
+    processes: int = None,
+    chunk_size: int = 64,
+    apply_earth_curvature=True,
+) -> List[List[float]]:
+    """Calculate clearances for many links, see iter_clearances()"""
+    return list(
+        iter_clearances(
+            collection,
+            links,
+            processes=processes,
+            chunk_size=chunk_size,
+            apply_earth_curvature=apply_earth_curvature,
+        )
+    )
+
+
+def _init_worker(collection: HeightMapCollection, apply_earth_curvature: bool):
+    global _worker_collection, _worker_apply_earth_curvature
+    collection.use_mmap = True
+    for height_map in collection.height_maps.values():
+        height_map.use_mmap = True
+    _worker_collection = collection
+    _worker_apply_earth_curvature = apply_earth_curvature
+
+
+def _worker_link_clearances(link: Link) -> List[float]:
+    return _link_clearances(_worker_collection, link, _worker_apply_earth_curvature)
+
+
+def _link_clearances(
+    collection: HeightMapCollection, link: Link, apply_earth_curvature: bool
+) -> List[float]:
+    profile = collection.get_elevation_profile(
+        link.start_latitude,
+        link.start_longitude,
+        link.end_latitude,
+        link.end_longitude,
+        apply_earth_curvature=apply_earth_curvature,
+    )
+    return get_clearances(
+        profile, link.start_elevation_offset, link.end_elevation_offset
+    )
@@ -0,0 +1,129 @@
+from math import radians
+from typing import NamedTuple
+
+from srtm.utilities import EARTH_RADIUS, GeoTransform, require_numpy, voids_to_nan
+
+TERRAIN_DERIVATIVES = ("slope", "aspect", "hillshade", "curvature")
+# Rows calculated at once by compute_terrain()
+STRIP_ROWS = 256
+
+
+class Terrain(NamedTuple):
+    """A terrain derivative for each pixel of a raster
+
+    values is a float32 array, which is NaN for pixels without data (or next
+    to pixels without data). See compute_terrain() for each derivative.
+    """
+
+    values: "numpy.ndarray"
+    geotransform: GeoTransform
+
+
+def validate_derivative(derivative: str):
+    if derivative not in TERRAIN_DERIVATIVES:
+        raise ValueError(
+            f"Unknown terrain derivative '{derivative}', must be one of "
+            f"{', '.join(TERRAIN_DERIVATIVES)}"
+        )
+
+
+def compute_terrain(
+    elevations,
+    geotransform: GeoTransform,
+    derivative: str,
+    azimuth: float = 315,
+    altitude: float = 45,
+):
+    """Calculate a terrain derivative for every pixel of a raster
+
+    Elevations is a 2D array with a border of one pixel around the pixels of
+    interest, and geotransform applies to the whole array (including the
+    border). Returns a float32 array two pixels smaller in each direction.
+    Voids (NODATA or NaN elevations) give NaN for every pixel they neighbour.
+
+    Each pixel's 3x3 neighbourhood is used as a vectorised stencil, with
+    distances between pixels in meters (pixels narrow away from the equator):
+
+    - slope is in degrees from horizontal, using Horn's method
+    - aspect is the compass direction the slope faces (downhill), in degrees
+      clockwise from north, and NaN for flat pixels
+    - hillshade is the illumination from a light at the given azimuth
+      (degrees clockwise from north) and altitude (degrees above the
+      horizon), from 0 (in shadow) to 1 (facing the light)
+    - curvature is the (Zevenbergen & Thorne) total curvature in 1/m, which is
+      positive where the surface is convex (e.g. ridges & peaks) and negative
+      where it is concave (e.g. valleys)
+
+    Requires numpy.
+    """
+    numpy = require_numpy()
+    validate_derivative(derivative)
+    elevations = numpy.asarray(elevations)
+    rows, columns = elevations.shape
+    assert rows > 2 and columns > 2, "Elevations must include a one pixel border"
+
+    # Calculated in strips of rows to bound the memory used by temporary arrays
+    values = numpy.empty((rows - 2, columns - 2), dtype=numpy.float32)
+    pixel_height = EARTH_RADIUS * radians(geotransform.pixel_width)
+    for first_row in range(0, rows - 2, STRIP_ROWS):
+        last_row = min(first_row + STRIP_ROWS, rows - 2)
+        latitudes = geotransform.latitude(numpy.arange(first_row, last_row) + 1)
+        values[first_row:last_row] = _compute_strip(
+            voids_to_nan(elevations[first_row : last_row + 2]),
+            pixel_height,
+            pixel_height * numpy.cos(numpy.radians(latitudes))[:, None],
+            derivative,
+            azimuth,
+            altitude,
+        )
+    return values
+
+
+def _compute_strip(
+    elevations,
+    pixel_height: float,
+    pixel_widths,
+    derivative: str,
+    azimuth: float,
+    altitude: float,
+):
+    """Calculate a terrain derivative for a strip of rows, see compute_terrain()"""
+    numpy = require_numpy()
+    rows, columns = elevations.shape
+
+    def neighbour(row_offset: int, column_offset: int):
+        return elevations[
+            1 + row_offset : rows - 1 + row_offset,
+            1 + column_offset : columns - 1 + column_offset,
+        ]
+
+    north_west, north, north_east = (neighbour(-1, offset) for offset in (-1, 0, 1))
+    west, centre, east = (neighbour(0, offset) for offset in (-1, 0, 1))
+    south_west, south, south_east = (neighbour(1, offset) for offset in (-1, 0, 1))
+
+    if derivative == "curvature":
+        d = ((west + east) / 2 - centre) / pixel_widths ** 2
+        e = ((north + south) / 2 - centre) / pixel_height ** 2
+        return -2 * (d + e)
+
+    # Rates of change eastwards & southwards (rows run north to south)
+    dz_east = (
+        (north_east + 2 * east + south_east) - (north_west + 2 * west + south_west)
+    ) / (8 * pixel_widths)
+    dz_south = (
+        (south_west + 2 * south + south_east) - (north_west + 2 * north + north_east)
+    ) / (8 * pixel_height)
+    slopes = numpy.arctan(numpy.hypot(dz_east, dz_south))
+    if derivative == "slope":
+        return numpy.degrees(slopes)
+
+    # Downhill is against the gradient, i.e. east by -dz_east, north by dz_south
+    aspects = numpy.arctan2(-dz_east, dz_south)
+    if derivative == "aspect":
+        aspects = numpy.degrees(aspects) % 360
+        aspects[(dz_east == 0) & (dz_south == 0)] = numpy.nan
+        return aspects
+
+    zenith = radians(90 - altitude)
+    lit = numpy.sin(zenith) * numpy.sin(slopes) * numpy.cos(radians(azimuth) - aspects)
+    return numpy.clip(numpy.cos(zenith) * numpy.cos(slopes) + lit, 0, 1)
@@ -0,0 +1,164 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, NamedTuple, Tuple
+
+from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.height_maps import HeightMap
+from srtm.instrumentation import INSTRUMENTED_ATTRIBUTES, Instrumentation
+
+
+class TileCacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    loaded_tiles: int
+    loaded_bytes: int
+
+
+class TileCache:
+    """ Keeps track of loaded height maps, unloading them once over budget
+
+    Height maps are unloaded in least-recently-used order once either
+    max_tiles or max_bytes is exceeded. A budget of None is unlimited. The
+    most recently loaded height map is never unloaded, even if it alone
+    exceeds the budget.
+
+    The cache may be shared between threads. Height maps are loaded outside
+    of the cache's lock, so different height maps can load in parallel. Read
+    height maps within pinned(), so that other threads cannot unload them
+    mid-read. Pinned height maps are unloaded once unpinned if the cache is
+    still over budget.
+    """
+
+    _loaded: Dict[RasterBaseCoordinates, Tuple[HeightMap, int]]
+    instrumentation: Instrumentation = None
+
+    def __init__(self, max_tiles: int = None, max_bytes: int = None):
+        self.max_tiles = max_tiles
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._loaded = OrderedDict()
+        # The number of pins of each height map, see pinned()
+        self._pins: Dict[RasterBaseCoordinates, int] = {}
+        self.loaded_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getstate__(self):
+        # Height maps do not pickle their data, so start afresh
+        state = self.__dict__.copy()
+        state["_loaded"] = OrderedDict()
+        state["_pins"] = {}
+        state["loaded_bytes"] = 0
+        del state["_lock"]
+        # Instrumentation is per process, see srtm.instrumentation
+        for name in INSTRUMENTED_ATTRIBUTES + ("instrumentation",):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._loaded)
+
+    def __contains__(self, height_map: HeightMap):
+        return height_map.base_coordinates in self._loaded
+
+    def load(self, height_map: HeightMap, pin=False) -> HeightMap:
+        """Ensure the given height map is loaded, and mark it as recently used
+
+        Height maps may be unloaded again by other threads as soon as this
+        returns, unless pinned, see pinned().
+        """
+        key = height_map.base_coordinates
+        while True:
+            with self._lock:
+                if self._hit(key, pin):
+                    return height_map
+
+            raster = height_map.ensure_loaded()
+
+            with self._lock:
+                # Another thread may have loaded it while we did
+                if self._hit(key, pin):
+                    return height_map
+                # Or loaded and then evicted it, in which case try again
+                if height_map.raster is raster:
+                    self.misses += 1
+                    size = len(raster)
+                    self._loaded[key] = (height_map, size)
+                    self.loaded_bytes += size
+                    if pin:
+                        self._pins[key] = self._pins.get(key, 0) + 1
+                    self._evict()
+                    return height_map
+
+    @contextmanager
+    def pinned(self, height_map: HeightMap) -> Iterator[HeightMap]:
+        """Load the given height map, keeping it loaded until the block exits
+
+        Pinned height maps are never unloaded by other threads, so the cache
+        may exceed its budget by the height maps being read at once.
+        """
+        key = height_map.base_coordinates
+        self.load(height_map, pin=True)
+        try:
+            yield height_map
+        finally:
+            with self._lock:
+                self._pins[key] -= 1
+                if not self._pins[key]:
+                    del self._pins[key]
+                self._evict()
+
+    def _hit(self, key: RasterBaseCoordinates, pin: bool) -> bool:
+        if key not in self._loaded:
+            return False
+        self.hits += 1
+        self._loaded.move_to_end(key)
+        if pin:
+            self._pins[key] = self._pins.get(key, 0) + 1
+        return True
+
+    def _evict(self):
+        # The most recently used height map is kept, as are any pinned
+        for key in list(self._loaded)[:-1]:
+            if not self._over_budget():
+                break
+            if key in self._pins:
+                continue
+            height_map, size = self._loaded.pop(key)
+            self.loaded_bytes -= size
+            self.evictions += 1
+            height_map.unload()
+            if self.instrumentation is not None:
+                self.instrumentation.tile_evicted(height_map)
+
+    def _over_budget(self) -> bool:
+        if self.max_tiles is not None and len(self._loaded) > self.max_tiles:
+            return True
+        if self.max_bytes is not None and self.loaded_bytes > self.max_bytes:
+            return True
+        return False
+
+    def clear(self):
+        """Unload all height maps"""
+        with self._lock:
+            for height_map, _ in self._loaded.values():
+                height_map.unload()
+            self._loaded.clear()
+            self.loaded_bytes = 0
+
+    def stats(self) -> TileCacheStats:
+        with self._lock:
+            return TileCacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                loaded_tiles=len(self._loaded),
+                loaded_bytes=self.loaded_bytes,
+            )
@@ -0,0 +1,125 @@
+from array import array
+from typing import Iterable, Iterator, List, MutableMapping, Optional, Tuple
+
+from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.height_maps import HeightMap
+
+# Base coordinates of tiles range from latitude -90 to 89, longitude -180 to 179
+GRID_LATITUDES = 180
+GRID_LONGITUDES = 360
+
+
+class TileIndex(MutableMapping[RasterBaseCoordinates, HeightMap]):
+    """A compact index of height maps, keyed by their base coordinates
+
+    A grid of 180 x 360 one degree cells holds the position of each cell's
+    height map within a list, so finding a tile is two array lookups rather
+    than building, hashing & comparing a tuple. The grid takes 2 bytes per
+    cell (127KiB) however many tiles there are.
+
+    Otherwise this behaves as a dict, iterating in insertion order (unless
+    tiles have been deleted, as their positions are reused). Keys must
+    be the base coordinates of their height maps, and plain (latitude,
+    longitude) tuples may be used in their place.
+    """
+
+    def __init__(self, height_maps: Iterable[HeightMap] = ()):
+        # Each cell holds its height map's position in the list plus one, or
+        # zero if it has no height map
+        self._cells = array("H", bytes(2 * GRID_LATITUDES * GRID_LONGITUDES))
+        self._height_maps: List[Optional[HeightMap]] = []
+        # Positions of deleted height maps, to be reused
+        self._free_positions: List[int] = []
+        self._length = 0
+        for height_map in height_maps:
+            self[height_map.base_coordinates] = height_map
+
+    def get_tile(self, latitude: int, longitude: int) -> Optional[HeightMap]:
+        """Get the height map with the given base latitude & longitude, if any"""
+        if -90 <= latitude < 90 and -180 <= longitude < 180:
+            cell = (latitude + 90) * GRID_LONGITUDES + longitude + 180
+            position = self._cells[cell]
+            if position:
+                return self._height_maps[position - 1]
+        return None
+
+    def get_tile_for_latitude_and_longitude(
+        self, latitude: float, longitude: float
+    ) -> Optional[HeightMap]:
+        """Get the height map containing the given latitude & longitude, if any"""
+        # As per RasterBaseCoordinates.from_float(), without creating one
+        return self.get_tile(
+            int(latitude - 1 if latitude < 0 else latitude),
+            int(longitude - 1 if longitude < 0 else longitude),
+        )
+
+    def get(self, base: Tuple[int, int], default=None) -> Optional[HeightMap]:
+        height_map = self.get_tile(*base)
+        return default if height_map is None else height_map
+
+    def __getitem__(self, base: Tuple[int, int]) -> HeightMap:
+        height_map = self.get_tile(*base)
+        if height_map is None:
+            raise KeyError(base)
+        return height_map
+
+    def __contains__(self, base) -> bool:
+        try:
+            return self.get_tile(*base) is not None
+        except TypeError:
+            return False
+
+    def __setitem__(self, base: Tuple[int, int], height_map: HeightMap):
+        latitude, longitude = base
+        if not (-90 <= latitude < 90 and -180 <= longitude < 180):
+            raise KeyError(f"Base coordinates {base} are outside of the world")
+        if height_map.base_coordinates != base:
+            raise ValueError(
+                f"Height map for {height_map.base_coordinates} cannot be indexed "
+                f"under {base}"
+            )
+
+        cell = (latitude + 90) * GRID_LONGITUDES + longitude + 180
+        position = self._cells[cell]
+        if position:
+            self._height_maps[position - 1] = height_map
+            return
+
+        # Store the height map before updating the grid, so concurrent
+        # readers never see a position without a height map
+        if self._free_positions:
+            position = self._free_positions.pop()
+            self._height_maps[position - 1] = height_map
+        else:
+            self._height_maps.append(height_map)
+            position = len(self._height_maps)
+        self._cells[cell] = position
+        self._length += 1
+
+    def __delitem__(self, base: Tuple[int, int]):
+        latitude, longitude = base
+        if self.get_tile(latitude, longitude) is None:
+            raise KeyError(base)
+        cell = (latitude + 90) * GRID_LONGITUDES + longitude + 180
+        position = self._cells[cell]
+        self._cells[cell] = 0
+        self._height_maps[position - 1] = None
+        self._free_positions.append(position)
+        self._length -= 1
+
+    def __iter__(self) -> Iterator[RasterBaseCoordinates]:
+        for height_map in list(self._height_maps):
+            if height_map is not None:
+                yield height_map.base_coordinates
+
+    def __len__(self) -> int:
+        return self._length
+
+    def values(self):
+        # Faster than looking up each key in turn
+        return [
+            height_map for height_map in self._height_maps if height_map is not None
+        ]
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self)} tiles)"
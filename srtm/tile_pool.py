@@ -0,0 +1,329 @@
+"""Share decompressed tiles between processes via shared memory
+
+Each process using a HeightMapCollection normally loads its own copy of every
+tile. With a tile pool, a coordinator process loads each tile once, copies
+its decompressed pixels into shared memory, and every process attaches to
+that memory read-only. Tile memory therefore stays flat as processes (e.g.
+gunicorn workers) are added.
+
+Start the pool before forking worker processes, and pass it to the
+collection:
+
+    tile_pool = start_tile_pool()
+    collection = Srtm1HeightMapCollection(tile_pool=tile_pool)
+
+The coordinator counts the processes attached to each tile. Processes detach
+as tiles are unloaded (e.g. by their collection's tile cache), or on POSIX
+systems by exiting. Tiles no process is using are freed once there are more
+than max_unused_tiles of them.
+"""
+import copy
+import os
+import sys
+import threading
+from collections import OrderedDict
+from multiprocessing import resource_tracker
+from multiprocessing.managers import BaseManager
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, NamedTuple, Set, Tuple
+
+from srtm.height_maps import BlockHeightMap, HeightMap
+
+
+# A process ID, and the ID of a TilePool within that process
+Client = Tuple[int, int]
+
+
+class SharedTile(NamedTuple):
+    """The name & size in bytes of a tile's shared memory"""
+
+    name: str
+    size: int
+
+
+class TilePoolStats(NamedTuple):
+    shared_tiles: int
+    shared_bytes: int
+    references: int
+    loads: int
+    frees: int
+
+
+class TilePoolCoordinator:
+    """ Loads tiles into shared memory, and counts the processes using each
+
+    Runs within a TilePoolManager's server process, see start_tile_pool().
+    Each tile is loaded by the first process to acquire it, while other
+    processes acquiring the same tile wait for that load. Different tiles
+    load in parallel.
+
+    References are held by clients, which are (process ID, TilePool ID)
+    tuples. On POSIX systems, the references of processes which have exited
+    without releasing them (e.g. restarted workers) are dropped whenever tiles
+    are acquired or released.
+    """
+
+    _shared: Dict[str, Tuple[SharedMemory, int]]
+    max_unused_tiles: int = 8
+
+    def __init__(self, max_unused_tiles: int = None):
+        if max_unused_tiles is not None:
+            self.max_unused_tiles = max_unused_tiles
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._shared = {}
+        self._references: Dict[str, Set[Client]] = {}
+        # Shared tiles with no references, least recently used first
+        self._unused = OrderedDict()
+        self.loads = 0
+        self.frees = 0
+
+    def acquire(self, key: str, height_map: HeightMap, client: Client) -> SharedTile:
+        """Get the shared memory holding the given height map, loading it if needed
+
+        The given client then holds a reference to the memory until it calls
+        release(), however many times it acquires it.
+        """
+        with self._lock:
+            self._release_exited()
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                if key in self._shared:
+                    return self._reference(key, client)
+
+            shared = _share_raster(height_map)
+            with self._lock:
+                self._shared[key] = shared
+                self.loads += 1
+                return self._reference(key, client)
+
+    def _reference(self, key: str, client: Client) -> SharedTile:
+        memory, size = self._shared[key]
+        self._references.setdefault(key, set()).add(client)
+        self._unused.pop(key, None)
+        return SharedTile(memory.name, size)
+
+    def release(self, key: str, client: Client):
+        """Release the given client's reference taken by acquire()"""
+        with self._lock:
+            self._release_exited()
+            self._release(key, {client})
+
+    def _release(self, key: str, clients: Set[Client]):
+        references = self._references.get(key)
+        if references is None:
+            return
+        references -= clients
+        if references:
+            return
+
+        del self._references[key]
+        self._unused[key] = None
+        while len(self._unused) > self.max_unused_tiles:
+            unused_key, _ = self._unused.popitem(last=False)
+            self._free(unused_key)
+
+    def _release_exited(self):
+        if os.name != "posix":
+            # Signal 0 does not test for a process elsewhere
+            return
+        clients = set().union(*self._references.values())
+        exited = {client for client in clients if not _process_exists(client[0])}
+        if exited:
+            for key in list(self._references):
+                self._release(key, exited)
+
+    def _free(self, key: str):
+        memory, _ = self._shared.pop(key)
+        memory.close()
+        # Processes still attached keep their mapping, the name just goes away
+        memory.unlink()
+        self.frees += 1
+
+    def close(self):
+        """Free all shared memory, whether or not it is still referenced"""
+        with self._lock:
+            for key in list(self._shared):
+                self._free(key)
+            self._references.clear()
+            self._unused.clear()
+
+    def stats(self) -> TilePoolStats:
+        with self._lock:
+            self._release_exited()
+            return TilePoolStats(
+                shared_tiles=len(self._shared),
+                shared_bytes=sum(size for _, size in self._shared.values()),
+                references=sum(len(clients) for clients in self._references.values()),
+                loads=self.loads,
+                frees=self.frees,
+            )
+
+
+class TilePoolManager(BaseManager):
+    """Runs TilePoolCoordinators in a server process"""
+
+
+TilePoolManager.register("coordinator", TilePoolCoordinator)
+
+
+class TilePool:
+    """ Attaches height maps to tiles shared by a TilePoolCoordinator
+
+    Pass to HeightMapCollection(tile_pool=...), see start_tile_pool(). Pools
+    may be pickled or inherited by forked processes, and each process
+    attaches to (and counts as a reference to) tiles separately.
+
+    Shared rasters are always decompressed HGT rasters, including those of
+    block-compressed tiles.
+    """
+
+    _attached: Dict[str, Tuple[SharedMemory, int]]
+
+    def __init__(self, coordinator, manager: TilePoolManager = None):
+        self.coordinator = coordinator
+        self._manager = manager
+        self._reset()
+
+    def __getstate__(self):
+        # Attachments are per process, and only the starting process manages
+        # the coordinator's server
+        return {"coordinator": self.coordinator}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._manager = None
+        self._reset()
+
+    def _reset(self):
+        self._client: Client = (os.getpid(), id(self))
+        self._lock = threading.Lock()
+        self._attached = {}
+
+    def _check_process(self):
+        # A forked process inherits its parent's attachments, but they are
+        # not referenced on its behalf so must not be released by it
+        if self._client[0] != os.getpid():
+            self._reset()
+
+    def attach(self, height_map: HeightMap) -> memoryview:
+        """Get the given height map's shared raster, read-only
+
+        Loads the raster into shared memory if no other process has already.
+        Called by HeightMap.ensure_loaded() for height maps with a tile_pool.
+        """
+        self._check_process()
+        key = os.fspath(height_map.path)
+        with self._lock:
+            attached = self._attached.get(key)
+
+        if attached is None:
+            # The coordinator loads the tile as it would be loaded without a pool
+            source = copy.copy(height_map)
+            source.tile_pool = None
+            shared = self.coordinator.acquire(key, source, self._client)
+            attached = (_attach_shared_memory(shared.name), shared.size)
+            with self._lock:
+                if key in self._attached:
+                    # Another thread attached while we did, under the same
+                    # reference
+                    attached[0].close()
+                    attached = self._attached[key]
+                else:
+                    self._attached[key] = attached
+
+        memory, size = attached
+        return memory.buf[:size].toreadonly()
+
+    def detach(self, height_map: HeightMap):
+        """Release the given height map's shared raster
+
+        Called by HeightMap.unload(). The memory is unmapped once nothing in
+        this process still uses it.
+        """
+        self._check_process()
+        key = os.fspath(height_map.path)
+        with self._lock:
+            attached = self._attached.pop(key, None)
+        if attached is not None:
+            attached[0].close()
+            self.coordinator.release(key, self._client)
+
+    def stats(self) -> TilePoolStats:
+        """Get the coordinator's figures, across all processes"""
+        return self.coordinator.stats()
+
+    def shutdown(self):
+        """Free all shared memory and stop the coordinator's server
+
+        Only possible from the process which called start_tile_pool(), once
+        no other process is using the pool.
+        """
+        assert self._manager is not None, "Only the starting process may shut down"
+        self.coordinator.close()
+        self._manager.shutdown()
+        self._manager = None
+
+
+def start_tile_pool(max_unused_tiles: int = None) -> TilePool:
+    """Start a coordinator in a new server process, and get a pool using it
+
+    Start the pool before starting (or forking) the processes which will use
+    it. Up to max_unused_tiles tiles are kept in shared memory while no
+    process is attached to them, so that they can be reattached without
+    reloading.
+    """
+    manager = TilePoolManager()
+    manager.start()
+    return TilePool(manager.coordinator(max_unused_tiles), manager=manager)
+
+
+def _share_raster(height_map: HeightMap) -> Tuple[SharedMemory, int]:
+    """Copy the given height map's decompressed raster into new shared memory"""
+    raster = height_map.ensure_loaded()
+    if isinstance(height_map, BlockHeightMap):
+        # Decompressed, and viewed as bytes as memoryviews cannot be cast from
+        # big-endian values
+        raster = height_map.raster_array.view("u1")
+    with memoryview(raster) as view, view.cast("B") as data:
+        size = len(data)
+        memory = SharedMemory(create=True, size=size)
+        memory.buf[:size] = data
+    # The coordinator keeps the shared copy only
+    height_map.unload()
+    return memory, size
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to another user
+        pass
+    return True
+
+
+class _AttachedSharedMemory(SharedMemory):
+    """Shared memory which stays mapped while any arrays still use it"""
+
+    def close(self):
+        try:
+            super().close()
+        except BufferError:
+            # The mapping is instead released along with the last array
+            pass
+
+
+def _attach_shared_memory(name: str) -> SharedMemory:
+    if sys.version_info >= (3, 13):
+        return _AttachedSharedMemory(name, track=False)
+    memory = _AttachedSharedMemory(name)
+    if os.name == "posix":
+        # The coordinator owns the memory, so this process must not unlink it
+        # when exiting (https://bugs.python.org/issue38119)
+        resource_tracker.unregister(memory._name, "shared_memory")
+    return memory
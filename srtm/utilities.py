@@ -1,11 +1,18 @@
-from math import sin, cos, radians, atan2, sqrt, ceil
+from math import sin, cos, radians, atan2, sqrt, ceil, isnan
 import os
 from pathlib import Path
 from statistics import mean
-from typing import List, Tuple, NamedTuple
+from typing import Callable, List, Tuple, NamedTuple
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
 
 EARTH_RADIUS = 6373000
 METERS_PER_RADIAN = 6371008
+# The value of voids, pixels for which SRTM has no data
+NODATA = -32768
 
 
 def points_on_line(x1: int, y1: int, x2: int, y2: int) -> List[Tuple[int, int]]:
@@ -44,6 +51,45 @@ def points_on_line(x1: int, y1: int, x2: int, y2: int) -> List[Tuple[int, int]]:
     return points
 
 
+def points_on_line_array(x1: int, y1: int, x2: int, y2: int):
+    """Vectorised version of points_on_line()
+
+    Returns the same points, but as a tuple of x & y numpy arrays
+    """
+    numpy = require_numpy()
+    issteep = abs(y2 - y1) > abs(x2 - x1)
+    if issteep:
+        x1, y1 = y1, x1
+        x2, y2 = y2, x2
+    rev = False
+    if x1 > x2:
+        x1, x2 = x2, x1
+        y1, y2 = y2, y1
+        rev = True
+    deltax = x2 - x1
+    deltay = abs(y2 - y1)
+    error = int(deltax / 2)
+    ystep = 1 if y1 < y2 else -1
+
+    steps = numpy.arange(deltax + 1)
+    if deltax:
+        # points_on_line() steps y each time the running error drops below
+        # zero, so the number of steps taken before each point is the
+        # smallest number which keeps error - step * deltay + n * deltax >= 0
+        y_steps = numpy.maximum(0, -((error - steps * deltay) // deltax))
+    else:
+        y_steps = numpy.zeros_like(steps)
+
+    xs = x1 + steps
+    ys = y1 + ystep * y_steps
+    if issteep:
+        xs, ys = ys, xs
+    # Reverse the points if the coordinates were reversed
+    if rev:
+        xs, ys = xs[::-1], ys[::-1]
+    return xs, ys
+
+
 def get_srtm1_file_path(hgt_name: str):
     paths = SRTM1_DIR.glob(f"**/{hgt_name}.*")
     searched = list(map(str, paths))
@@ -65,6 +111,16 @@ def get_srtm3_file_path(hgt_name: str):
     ), f"Path for HGT name {hgt_name} could not be found. Perhaps there is no file for those coordinates? Searched: {', '.join(searched)}"
 
 
+def require_numpy():
+    """Get the numpy module, raising a helpful error if it is not installed"""
+    if numpy is None:
+        raise ImportError(
+            "numpy is required for this functionality. "
+            "Install it with: pip install python-srtm[numpy]"
+        )
+    return numpy
+
+
 SRTM1_DIR = Path(os.environ.get("SRTM1_DIR", ""))
 SRTM3_DIR = Path(os.environ.get("SRTM3_DIR", ""))
 
@@ -98,6 +154,29 @@ def haversine(lat1: float, lon1: float, lat2: float, lon2: float):
     return EARTH_RADIUS * c
 
 
+def haversine_array(lat1, lon1, lat2, lon2):
+    """Vectorised version of haversine(), accepting numpy arrays or floats
+
+    Inputs are broadcast against each other, as per normal numpy rules.
+    """
+    numpy = require_numpy()
+    lat1 = numpy.radians(lat1)
+    lon1 = numpy.radians(lon1)
+    lat2 = numpy.radians(lat2)
+    lon2 = numpy.radians(lon2)
+
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+
+    a = (
+        numpy.sin(dlat / 2) ** 2
+        + numpy.cos(lat1) * numpy.cos(lat2) * numpy.sin(dlon / 2) ** 2
+    )
+    c = 2 * numpy.arctan2(numpy.sqrt(a), numpy.sqrt(1 - a))
+
+    return EARTH_RADIUS * c
+
+
 def apply_curvature(profile_points: List["ElevationProfilePoint"]) -> List["ElevationProfilePoint"]:
     """ Apply the earths curvature to the given heights
 
@@ -148,6 +227,189 @@ def apply_curvature(profile_points: List["ElevationProfilePoint"]) -> List["Elev
     return adjusted
 
 
+def apply_curvature_array(latitudes, longitudes, elevations):
+    """Vectorised version of apply_curvature()
+
+    Takes numpy arrays of latitudes, longitudes & elevations, and returns a
+    new array of elevations adjusted for the earth's curvature.
+    See apply_curvature() for details.
+    """
+    numpy = require_numpy()
+    elevations = numpy.asarray(elevations, dtype=float)
+    if not len(elevations):
+        return elevations.copy()
+
+    return elevations - midpoint_curvature_drops(latitudes, longitudes)
+
+
+def midpoint_curvature_drops(latitudes, longitudes):
+    """Get the curvature drops of points along a line, measured from its midpoint
+
+    Takes numpy arrays of latitudes & longitudes, which must not be empty.
+    See apply_curvature() for details.
+    """
+    left_size = ceil(len(latitudes) / 2)
+    if len(latitudes) % 2 == 0:
+        # Start in between the two center points
+        start_lat = (latitudes[left_size - 1] + latitudes[left_size]) / 2
+        start_long = (longitudes[left_size - 1] + longitudes[left_size]) / 2
+    else:
+        # Start from the center point
+        start_lat = latitudes[left_size - 1]
+        start_long = longitudes[left_size - 1]
+
+    distances = haversine_array(start_lat, start_long, latitudes, longitudes)
+    return curvature_drops(distances)
+
+
+def curvature_drops(distances):
+    """Get how far the earth falls away below a straight line at each distance
+
+    Distances are in meters, and may be a numpy array or a float.
+    See apply_curvature() for details.
+    """
+    numpy = require_numpy()
+    distances_in_radians = numpy.asarray(distances) / METERS_PER_RADIAN
+    return EARTH_RADIUS / numpy.cos(distances_in_radians) - EARTH_RADIUS
+
+
+INTERPOLATIONS = ("nearest", "bilinear", "bicubic")
+
+
+def validate_interpolation(interpolation: str):
+    if interpolation not in INTERPOLATIONS:
+        raise ValueError(
+            f"Unknown interpolation '{interpolation}', must be one of "
+            f"{', '.join(INTERPOLATIONS)}"
+        )
+
+
+def interpolate_pixels(get_pixels: Callable, rows, columns, interpolation: str):
+    """Interpolate raster values at fractional pixel positions
+
+    Rows & columns are 0-indexed numpy arrays of (possibly fractional) pixel
+    positions. get_pixels(rows, columns) must return the raster values at the
+    given arrays of integer pixel positions, and may be given positions up to
+    two pixels outside of the raster. Interpolation is either "bilinear"
+    or "bicubic" (Catmull-Rom). Returns a float array, which is NaN wherever a
+    void (NODATA) pixel contributes to the result.
+    """
+    numpy = require_numpy()
+    validate_interpolation(interpolation)
+    if interpolation == "bilinear":
+        offsets = numpy.array([0, 1])
+    elif interpolation == "bicubic":
+        offsets = numpy.array([-1, 0, 1, 2])
+    else:
+        raise ValueError("Use get_altitudes_for_pixels() for nearest interpolation")
+
+    rows = numpy.asarray(rows, dtype=float)
+    columns = numpy.asarray(columns, dtype=float)
+    first_rows = numpy.floor(rows)
+    first_columns = numpy.floor(columns)
+    row_weights = _interpolation_weights(rows - first_rows, interpolation)
+    column_weights = _interpolation_weights(columns - first_columns, interpolation)
+
+    # Get all of the pixels needed in one go, with shape (points, rows, columns)
+    pixel_rows = first_rows.astype(numpy.intp)[:, None, None] + offsets[None, :, None]
+    pixel_columns = (
+        first_columns.astype(numpy.intp)[:, None, None] + offsets[None, None, :]
+    )
+    pixel_rows, pixel_columns = numpy.broadcast_arrays(pixel_rows, pixel_columns)
+    pixels = numpy.asarray(
+        get_pixels(pixel_rows.ravel(), pixel_columns.ravel()), dtype=float
+    ).reshape(pixel_rows.shape)
+
+    voids = pixels == NODATA
+    if not voids.any():
+        return numpy.einsum("pr,prc,pc->p", row_weights, pixels, column_weights)
+
+    # Voids with no weight (e.g. at exact pixel positions) make no difference
+    weights = row_weights[:, :, None] * column_weights[:, None, :]
+    unknown = (voids & (weights != 0)).any(axis=(1, 2))
+    pixels = numpy.where(voids, 0, pixels)
+    values = numpy.einsum("pr,prc,pc->p", row_weights, pixels, column_weights)
+    values[unknown] = numpy.nan
+    return values
+
+
+def voids_to_nan(values):
+    """Convert raster values to a new float array, with voids replaced by NaN"""
+    numpy = require_numpy()
+    values = numpy.array(values, dtype=float)
+    values[values == NODATA] = numpy.nan
+    return values
+
+
+VOID_POLICIES = ("nan", "skip", "interpolate")
+
+
+def validate_void_policy(voids: str):
+    if voids not in VOID_POLICIES:
+        raise ValueError(
+            f"Unknown void policy '{voids}', must be one of {', '.join(VOID_POLICIES)}"
+        )
+
+
+def interpolate_voids(distances: List[float], elevations: List[float]) -> List[float]:
+    """Fill NaN elevations along a profile by linear interpolation over distance
+
+    Distances must be increasing, e.g. measured from the profile's first point.
+    Voids before the first valid elevation, or after the last, take the value
+    of that elevation. Elevations are returned unchanged if none are valid.
+    """
+    valid = [i for i, elevation in enumerate(elevations) if not isnan(elevation)]
+    filled = list(elevations)
+    if not valid:
+        return filled
+
+    for i in range(valid[0]):
+        filled[i] = elevations[valid[0]]
+    for i in range(valid[-1] + 1, len(elevations)):
+        filled[i] = elevations[valid[-1]]
+    for start, end in zip(valid, valid[1:]):
+        span = distances[end] - distances[start]
+        for i in range(start + 1, end):
+            fraction = (distances[i] - distances[start]) / span if span else 0
+            filled[i] = elevations[start] + fraction * (
+                elevations[end] - elevations[start]
+            )
+    return filled
+
+
+def interpolate_voids_array(distances, elevations):
+    """Vectorised version of interpolate_voids(), returning a new float array"""
+    numpy = require_numpy()
+    distances = numpy.asarray(distances, dtype=float)
+    elevations = numpy.array(elevations, dtype=float)
+    voids = numpy.isnan(elevations)
+    if voids.any() and not voids.all():
+        elevations[voids] = numpy.interp(
+            distances[voids], distances[~voids], elevations[~voids]
+        )
+    return elevations
+
+
+def _interpolation_weights(fractions, interpolation: str):
+    """Get the weight of each neighbouring pixel, with shape (points, neighbours)"""
+    numpy = require_numpy()
+    t = fractions
+    if interpolation == "bilinear":
+        return numpy.stack((1 - t, t), axis=-1)
+    else:
+        t2 = t * t
+        t3 = t2 * t
+        return numpy.stack(
+            (
+                (-t3 + 2 * t2 - t) / 2,
+                (3 * t3 - 5 * t2 + 2) / 2,
+                (-3 * t3 + 4 * t2 + t) / 2,
+                (t3 - t2) / 2,
+            ),
+            axis=-1,
+        )
+
+
 class StraightLineEquation(NamedTuple):
     gradient: float
     c: float
@@ -169,6 +431,133 @@ class ElevationProfilePoint(NamedTuple):
     distance: float
 
 
+class ElevationProfile(NamedTuple):
+    """An elevation profile stored as numpy column arrays
+
+    Each array has one value per point along the profile
+    """
+
+    latitudes: "numpy.ndarray"
+    longitudes: "numpy.ndarray"
+    elevations: "numpy.ndarray"
+    distances: "numpy.ndarray"
+
+    def to_points(self) -> List[ElevationProfilePoint]:
+        """Convert to a list of ElevationProfilePoint"""
+        return [
+            ElevationProfilePoint(*values)
+            for values in zip(
+                self.latitudes.tolist(),
+                self.longitudes.tolist(),
+                self.elevations.tolist(),
+                self.distances.tolist(),
+            )
+        ]
+
+    def to_records(self) -> "numpy.ndarray":
+        """Convert to a numpy structured array, with one record per point"""
+        numpy = require_numpy()
+        records = numpy.empty(
+            len(self.latitudes),
+            dtype=[(name, numpy.float64) for name in ElevationProfilePoint._fields],
+        )
+        records["latitude"] = self.latitudes
+        records["longitude"] = self.longitudes
+        records["elevation"] = self.elevations
+        records["distance"] = self.distances
+        return records
+
+
+class GeoTransform(NamedTuple):
+    """Maps the rows & columns of a raster to latitudes & longitudes
+
+    Coordinates refer to pixel centres, as per the HGT format. Row 0,
+    column 0 is the north-west pixel, and rows run north to south.
+    """
+
+    north_latitude: float
+    west_longitude: float
+    pixel_width: float
+
+    def latitude(self, row):
+        """Get the latitude of the given row (or numpy array of rows)"""
+        return self.north_latitude - row * self.pixel_width
+
+    def longitude(self, column):
+        """Get the longitude of the given column (or numpy array of columns)"""
+        return self.west_longitude + column * self.pixel_width
+
+    def to_gdal(self) -> Tuple[float, float, float, float, float, float]:
+        """Get the equivalent GDAL geotransform, which refers to pixel corners"""
+        half_pixel = self.pixel_width / 2
+        return (
+            self.west_longitude - half_pixel,
+            self.pixel_width,
+            0.0,
+            self.north_latitude + half_pixel,
+            0.0,
+            -self.pixel_width,
+        )
+
+
+class RegionBlock(NamedTuple):
+    """A block of elevations from a larger region
+
+    row_offset & column_offset give the position of this block's first pixel
+    within the region.
+    """
+
+    elevations: "numpy.ndarray"
+    geotransform: GeoTransform
+    row_offset: int = 0
+    column_offset: int = 0
+
+
+class BlockExtrema(NamedTuple):
+    """The lowest & highest pixels within each square block of a height map
+
+    Block row r covers pixel rows r * block_size up to (r + 1) * block_size,
+    and likewise for block columns. Blocks along the southern and eastern
+    edges are smaller where the height map does not divide exactly.
+
+    Voids (NODATA) count as the lowest possible value for minimums, and the
+    highest possible value for maximums, so that the extrema are always safe
+    bounds for whatever value a void may take.
+    """
+
+    block_size: int
+    minimums: "numpy.ndarray"
+    maximums: "numpy.ndarray"
+
+
+def calculate_block_extrema(
+    read_rectangle: Callable, values_per_row: int, block_size: int
+) -> BlockExtrema:
+    """Calculate the BlockExtrema of a raster, one strip of blocks at a time
+
+    read_rectangle(top, bottom, left, right) must return a 2D array of the
+    raster's 0-indexed pixels, see HeightMap._read_rectangle()
+    """
+    numpy = require_numpy()
+    blocks_per_row = -(-values_per_row // block_size)
+    padding = blocks_per_row * block_size - values_per_row
+    minimums = numpy.empty((blocks_per_row, blocks_per_row), dtype=numpy.int16)
+    maximums = numpy.empty_like(minimums)
+    for block_row in range(blocks_per_row):
+        top = block_row * block_size
+        strip = read_rectangle(
+            top, min(top + block_size, values_per_row), 0, values_per_row
+        )
+        # Repeating the last column does not change the extrema of any block
+        strip = numpy.pad(strip, ((0, 0), (0, padding)), mode="edge")
+        strip = strip.reshape(len(strip), blocks_per_row, block_size)
+        minimums[block_row] = strip.min(axis=(0, 2))
+        maximums[block_row] = numpy.where(
+            strip == NODATA, numpy.iinfo(numpy.int16).max, strip
+        ).max(axis=(0, 2))
+    return BlockExtrema(block_size, minimums, maximums)
+
+
 def get_clearances(
     elevation_profile: List[ElevationProfilePoint],
     start_elevation_offset: float = 0,
@@ -194,3 +583,30 @@ def get_clearances(
         clearances.append(line_of_sight_elevation - point.elevation)
 
     return clearances
+
+
+def get_clearances_array(
+    elevation_profile: ElevationProfile,
+    start_elevation_offset: float = 0,
+    end_elevation_offset: float = 0,
+):
+    """Vectorised version of get_clearances(), taking an ElevationProfile
+
+    Returns a numpy array of clearances, one per point along the profile
+    """
+    numpy = require_numpy()
+    distances = numpy.asarray(elevation_profile.distances, dtype=float)
+    elevations = numpy.asarray(elevation_profile.elevations, dtype=float)
+
+    if len(distances) < 2 or all(
+        column[0] == column[-1] for column in elevation_profile
+    ):
+        return numpy.empty(0)
+
+    straight_line = StraightLineEquation.from_points(
+        x1=distances[0],
+        y1=elevations[0] + start_elevation_offset,
+        x2=distances[-1],
+        y2=elevations[-1] + end_elevation_offset,
+    )
+    return straight_line.y(distances) - elevations
@@ -0,0 +1,129 @@
+from typing import NamedTuple, Tuple
+
+from srtm.utilities import GeoTransform, curvature_drops, require_numpy
+
+
+class Viewshed(NamedTuple):
+    """The visibility of each pixel in a raster from a single observer
+
+    visible is a boolean array. angles is the elevation angle (in radians)
+    from the observer to each target, which is NaN for pixels outside the
+    radius or without data.
+    """
+
+    visible: "numpy.ndarray"
+    angles: "numpy.ndarray"
+    geotransform: GeoTransform
+
+
+def compute_viewshed(
+    elevations,
+    observer_row: int,
+    observer_column: int,
+    distances,
+    observer_height: float = 0,
+    target_height: float = 0,
+    apply_earth_curvature=True,
+) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+    """Calculate which pixels of the elevations array can be seen by the observer
+
+    Uses the XDraw algorithm, which sweeps outwards from the observer one ring
+    of pixels at a time. Each pixel's horizon is interpolated from the two
+    pixels of the previous ring which lie between it and the observer, so
+    horizons are shared between rays rather than traced per-pixel.
+
+    Elevations is a 2D array, and distances is an array of the same shape
+    giving the distance in meters of each pixel from the observer. Heights are
+    in meters above ground level. Pixels with NaN elevations are never visible
+    and do not obstruct the view.
+
+    Returns a tuple of (visible, angles) arrays. See Viewshed.
+    """
+    numpy = require_numpy()
+    elevations = numpy.array(elevations, dtype=float)
+    distances = numpy.asarray(distances, dtype=float)
+    rows, columns = elevations.shape
+
+    if apply_earth_curvature:
+        elevations -= curvature_drops(distances)
+    observer_elevation = elevations[observer_row, observer_column] + observer_height
+
+    # Gradients from the observer to each pixel's ground, and to each target
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        ground_gradients = (elevations - observer_elevation) / distances
+        target_elevations = elevations + target_height
+        target_gradients = (target_elevations - observer_elevation) / distances
+
+    # The steepest gradient between the observer and each pixel
+    horizons = numpy.full(elevations.shape, -numpy.inf)
+    visible = numpy.zeros(elevations.shape, dtype=bool)
+    visible[observer_row, observer_column] = True
+
+    max_ring = max(
+        observer_row,
+        rows - 1 - observer_row,
+        observer_column,
+        columns - 1 - observer_column,
+    )
+    for ring in range(1, max_ring + 1):
+        row_offsets, column_offsets = _ring_offsets(ring)
+        ring_rows = observer_row + row_offsets
+        ring_columns = observer_column + column_offsets
+        in_bounds = (
+            (ring_rows >= 0)
+            & (ring_rows < rows)
+            & (ring_columns >= 0)
+            & (ring_columns < columns)
+        )
+        row_offsets = row_offsets[in_bounds]
+        column_offsets = column_offsets[in_bounds]
+        ring_rows = ring_rows[in_bounds]
+        ring_columns = ring_columns[in_bounds]
+
+        # Where the ray to the observer crosses the previous ring. One of these
+        # will always be a whole number, the other lies between two pixels
+        scale = (ring - 1) / ring
+        crossing_rows = observer_row + row_offsets * scale
+        crossing_columns = observer_column + column_offsets * scale
+        rows1 = numpy.floor(crossing_rows).astype(numpy.intp)
+        columns1 = numpy.floor(crossing_columns).astype(numpy.intp)
+        rows2 = numpy.ceil(crossing_rows).astype(numpy.intp)
+        columns2 = numpy.ceil(crossing_columns).astype(numpy.intp)
+        weights = (crossing_rows - rows1) + (crossing_columns - columns1)
+
+        horizon1 = horizons[rows1, columns1]
+        horizon2 = horizons[rows2, columns2]
+        with numpy.errstate(invalid="ignore"):
+            previous_horizons = numpy.where(
+                weights > 0, horizon1 * (1 - weights) + horizon2 * weights, horizon1
+            )
+
+        visible[ring_rows, ring_columns] = (
+            target_gradients[ring_rows, ring_columns] >= previous_horizons
+        )
+        horizons[ring_rows, ring_columns] = numpy.fmax(
+            ground_gradients[ring_rows, ring_columns], previous_horizons
+        )
+
+    angles = numpy.arctan(target_gradients)
+    angles[observer_row, observer_column] = numpy.nan
+    return visible, angles
+
+
+def _ring_offsets(ring: int):
+    """Get the row & column offsets of all pixels exactly ring pixels away"""
+    numpy = require_numpy()
+    side = numpy.arange(-ring, ring + 1)
+    inner = numpy.arange(-ring + 1, ring)
+    row_offsets = numpy.concatenate(
+        (
+            numpy.full(len(side), -ring),
+            numpy.full(len(side), ring),
+            inner,
+            inner,
+        )
+    )
+    column_offsets = numpy.concatenate(
+        (side, side, numpy.full(len(inner), -ring), numpy.full(len(inner), ring))
+    )
+    return row_offsets, column_offsets
@@ -0,0 +1,85 @@
+"""Filling of voids, the pixels of a tile for which SRTM has no data
+
+Voids are marked with the value NODATA (-32768). Lookups report them as NODATA
+or NaN, see HeightMapCollection.get_altitudes(). Alternatively they may be
+filled once per tile, ahead of time, so that lookups pay nothing for it. See
+the --fill-voids option of srtm.convert, which stores filled tiles in the
+block-compressed format.
+"""
+from srtm.utilities import NODATA, require_numpy
+
+VOID_FILL_METHODS = ("nearest", "idw")
+# Offsets of each pixel's neighbours, nearest first, with their inverse
+# squared distances
+_NEIGHBOURS = (
+    (-1, 0, 1.0),
+    (1, 0, 1.0),
+    (0, -1, 1.0),
+    (0, 1, 1.0),
+    (-1, -1, 0.5),
+    (-1, 1, 0.5),
+    (1, -1, 0.5),
+    (1, 1, 0.5),
+)
+
+
+def validate_void_fill_method(method: str):
+    if method not in VOID_FILL_METHODS:
+        raise ValueError(
+            f"Unknown void fill method '{method}', must be one of "
+            f"{', '.join(VOID_FILL_METHODS)}"
+        )
+
+
+def fill_voids(raster_array, method: str = "nearest"):
+    """Fill the voids of a 2D raster, returning a new int16 array
+
+    Voids are filled from their edges inwards, one ring of pixels per pass.
+    Each pass fills every void which has a valid neighbour (including
+    diagonals), with the value of its nearest valid neighbour for "nearest",
+    or the mean of all its valid neighbours weighted by inverse squared
+    distance for "idw". Passes are vectorised over the remaining voids only,
+    so tiles with few voids are filled quickly. Voids are only left if the
+    raster has no valid pixels at all. Requires numpy.
+    """
+    numpy = require_numpy()
+    validate_void_fill_method(method)
+    filled = numpy.array(raster_array, dtype=numpy.int16)
+    height, width = filled.shape
+    rows, columns = numpy.nonzero(filled == NODATA)
+
+    while len(rows):
+        nearest = numpy.full(len(rows), NODATA, dtype=numpy.int16)
+        totals = numpy.zeros(len(rows))
+        weights = numpy.zeros(len(rows))
+        for row_offset, column_offset, weight in _NEIGHBOURS:
+            neighbour_rows = rows + row_offset
+            neighbour_columns = columns + column_offset
+            inside = (
+                (neighbour_rows >= 0)
+                & (neighbour_rows < height)
+                & (neighbour_columns >= 0)
+                & (neighbour_columns < width)
+            )
+            values = numpy.full(len(rows), NODATA, dtype=numpy.int16)
+            values[inside] = filled[neighbour_rows[inside], neighbour_columns[inside]]
+            valid = values != NODATA
+            totals[valid] += weight * values[valid]
+            weights[valid] += weight
+            # Neighbours are nearest first, so keep the first valid value
+            nearest = numpy.where((nearest == NODATA) & valid, values, nearest)
+
+        fillable = weights > 0
+        if not fillable.any():
+            break
+        if method == "nearest":
+            values = nearest[fillable]
+        else:
+            values = numpy.rint(totals[fillable] / weights[fillable])
+        # Filled only once the pass is complete, so that passes work outwards
+        # from the original edges of each void in every direction at once
+        filled[rows[fillable], columns[fillable]] = values
+        rows = rows[~fillable]
+        columns = columns[~fillable]
+
+    return filled
@@ -0,0 +1,47 @@
+from pathlib import Path
+from zipfile import ZipFile
+
+import pytest
+
+from srtm.base_coordinates import RasterBaseCoordinates
+
+
+def synthetic_raster(values_per_row: int = 1201, offset: int = 0):
+    """Create a predictable raster where each value is derived from its row/column"""
+    numpy = pytest.importorskip("numpy")
+    rows, columns = numpy.indices((values_per_row, values_per_row))
+    return ((rows * 10 + columns + offset) % 32000).astype(">i2")
+
+
+@pytest.fixture
+def hgt_dir(tmp_path) -> Path:
+    return tmp_path / "hgt"
+
+
+@pytest.fixture
+def write_hgt(hgt_dir):
+    """Write a synthetic HGT file into hgt_dir, returning its path
+
+    Unless a raster is given, values are derived from the row, column and
+    base coordinates. See synthetic_raster()
+    """
+    numpy = pytest.importorskip("numpy")
+
+    def write(hgt_name: str, raster=None, values_per_row=1201, zipped=False):
+        if raster is None:
+            base = RasterBaseCoordinates.from_file_name(hgt_name)
+            raster = synthetic_raster(
+                values_per_row, offset=base.latitude + base.longitude
+            )
+        hgt_dir.mkdir(parents=True, exist_ok=True)
+        data = numpy.asarray(raster, dtype=">i2").tobytes()
+        if zipped:
+            path = hgt_dir / f"{hgt_name}.hgt.zip"
+            with ZipFile(path, "w") as zip_file:
+                zip_file.writestr(f"{hgt_name}.hgt", data)
+        else:
+            path = hgt_dir / f"{hgt_name}.hgt"
+            path.write_bytes(data)
+        return path
+
+    return write
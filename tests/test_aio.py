@@ -0,0 +1,96 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from srtm.aio import AsyncHeightMapCollection
+from srtm.exceptions import NoHeightMapDataException
+from srtm.height_map_collection import Srtm3HeightMapCollection
+from srtm.height_maps import HeightMap
+
+
+@pytest.fixture()
+def count_loads(monkeypatch):
+    """Count the number of times any height map reads its file"""
+    loads = []
+    read_raw_file = HeightMap._read_raw_file
+
+    def counting_read_raw_file(self, path):
+        loads.append(self.base_coordinates)
+        return read_raw_file(self, path)
+
+    monkeypatch.setattr(HeightMap, "_read_raw_file", counting_read_raw_file)
+    return loads
+
+
+def test_aget_altitude_coalesces_loads(hgt_dir, write_hgt, count_loads):
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    async_collection = AsyncHeightMapCollection(collection)
+
+    async def burst():
+        return await asyncio.gather(
+            *(async_collection.aget_altitude(40.5, -7.5) for _ in range(20))
+        )
+
+    assert asyncio.run(burst()) == [6632] * 20
+    assert len(count_loads) == 1
+    assert not async_collection._pending_loads
+
+
+def test_aget_altitudes(hgt_dir, write_hgt, count_loads):
+    pytest.importorskip("numpy")
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    latitudes = [40.5, 40.5, 40.1]
+    longitudes = [-7.5, -6.5, -7.9]
+
+    async def query():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            async_collection = AsyncHeightMapCollection(collection, executor)
+            return await async_collection.aget_altitudes(latitudes, longitudes)
+
+    altitudes = asyncio.run(query())
+    assert (
+        altitudes.tolist() == collection.get_altitudes(latitudes, longitudes).tolist()
+    )
+    assert sorted(count_loads) == sorted(collection.height_maps.keys())
+
+
+def test_aget_altitude_interpolated_loads_neighbours(hgt_dir, write_hgt, count_loads):
+    pytest.importorskip("numpy")
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    async_collection = AsyncHeightMapCollection(collection)
+
+    # Right on the eastern edge of N40W008, so N40W007 is needed too
+    altitude = asyncio.run(
+        async_collection.aget_altitude(40.5, -7.0001, interpolation="bilinear")
+    )
+    assert len(count_loads) == 2
+    assert altitude == collection.get_altitude(
+        40.5, -7.0001, interpolation="bilinear"
+    )
+    assert len(count_loads) == 2
+
+
+def test_aget_elevation_profile(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    async_collection = AsyncHeightMapCollection(collection)
+    args = (40.103284, -7.453766, 40.073772, -6.932998)
+
+    profile = asyncio.run(async_collection.aget_elevation_profile(*args))
+    assert len(collection.tile_cache) == 2
+    assert profile == collection.get_elevation_profile(*args)
+
+
+def test_aget_altitude_missing(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    async_collection = AsyncHeightMapCollection(collection)
+    with pytest.raises(NoHeightMapDataException):
+        asyncio.run(async_collection.aget_altitude(10.5, -7.5))
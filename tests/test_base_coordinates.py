@@ -1,3 +1,5 @@
+import pytest
+
 from srtm.base_coordinates import RasterBaseCoordinates
 
 
@@ -46,3 +48,14 @@ def test_raster_base_coordinates_from_file_name_ne():
 
 def test_raster_base_coordinates_from_file_name_sw():
     assert RasterBaseCoordinates.from_file_name("S40W005") == (-40, -5)
+
+
+def test_raster_base_coordinates_from_float_arrays():
+    pytest.importorskip("numpy")
+    coordinates = [(40.1, 5.1), (40.1, -7.1), (-33.76, 18.5), (-7.9, -14.3), (40, -7)]
+    latitudes, longitudes = RasterBaseCoordinates.from_float_arrays(
+        [lat for lat, _ in coordinates], [lng for _, lng in coordinates]
+    )
+    assert list(zip(latitudes, longitudes)) == [
+        RasterBaseCoordinates.from_float(lat, lng) for lat, lng in coordinates
+    ]
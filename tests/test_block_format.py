@@ -0,0 +1,167 @@
+import pickle
+
+import pytest
+
+from srtm.block_format import (
+    HEADER_V1,
+    INDEX_ENTRY,
+    compress_raster,
+    decompress_block,
+    read_block_index,
+    read_void_fill,
+    write_block_file,
+)
+from srtm.convert import convert_hgt_file, main
+from srtm.height_map_collection import Srtm3HeightMapCollection
+from srtm.height_maps import Srtm3BlockHeightMap
+from srtm.utilities import NODATA
+from tests.conftest import synthetic_raster
+
+
+def test_compress_raster_round_trip():
+    numpy = pytest.importorskip("numpy")
+    raster = synthetic_raster(values_per_row=10)
+    data = compress_raster(raster.tobytes(), values_per_row=10, block_size=4)
+    index = read_block_index(data)
+    assert index.values_per_row == 10
+    assert index.blocks_per_row == 3
+    assert index.block_shape(0, 0) == (4, 4)
+    assert index.block_shape(2, 1) == (2, 4)
+
+    block = numpy.frombuffer(decompress_block(data, index, 7), dtype=">i2")
+    assert block.reshape(2, 4).tolist() == raster[8:10, 4:8].tolist()
+    assert index.void_fill is None
+
+    # Version 1 tiles have no void_fill
+    data = compress_raster(raster.tobytes(), 10, 4, void_fill="idw")
+    assert read_block_index(data).void_fill == "idw"
+    blocks_start = index.offsets[0]
+    v1_data = b"".join(
+        [HEADER_V1.pack(b"HGTBLOCK", 1, 1, 10, 4)]
+        + [
+            INDEX_ENTRY.pack(offset - 2, length)
+            for offset, length in zip(index.offsets, index.lengths)
+        ]
+        + [data[blocks_start:]]
+    )
+    v1_index = read_block_index(v1_data)
+    assert v1_index.void_fill is None
+    assert decompress_block(v1_data, v1_index, 7) == decompress_block(data, index, 7)
+
+
+def test_read_block_index_invalid():
+    pytest.importorskip("numpy")
+    data = compress_raster(synthetic_raster(values_per_row=10).tobytes(), 10, 4)
+    with pytest.raises(ValueError):
+        read_block_index(b"HGTBLOCK")
+    with pytest.raises(ValueError):
+        read_block_index(b"NOTBLOCK" + data[8:])
+    with pytest.raises(ValueError):
+        read_block_index(data[:-1])
+
+
+def test_convert_hgt_file(tmp_path, write_hgt):
+    block_path = convert_hgt_file(
+        write_hgt("N40W008", zipped=True), tmp_path / "blocks", block_size=100
+    )
+    assert block_path.name == "N40W008.hgtb"
+
+    height_map = Srtm3BlockHeightMap(path=block_path)
+    assert height_map.get_altitude_for_pixel(x=1201, y=1201) == 13232
+    assert height_map.get_altitude_for_pixel(x=1, y=2) == 42
+    # Only the blocks needed have been decompressed
+    assert list(height_map._blocks) == [13 * 13 - 1, 0]
+
+    assert height_map.raster_array.tolist() == synthetic_raster(offset=32).tolist()
+    assert height_map.get_altitude_for_latitude_and_longitude(40.5, -7.5) == 6632
+
+    unpickled = pickle.loads(pickle.dumps(height_map))
+    assert not unpickled._blocks
+    assert unpickled.get_altitude_for_pixel(x=1, y=2) == 42
+
+
+def test_convert_hgt_file_fill_voids(tmp_path, write_hgt):
+    raster = synthetic_raster(offset=32)
+    raster[600, 600] = NODATA
+    hgt_path = write_hgt("N40W008", raster=raster)
+    block_path = convert_hgt_file(hgt_path, tmp_path / "blocks", void_fill="nearest")
+
+    height_map = Srtm3BlockHeightMap(path=block_path)
+    assert not height_map.has_voids
+    # Filled from the pixel above
+    assert height_map.get_altitude_for_pixel(x=601, y=601) == 6622
+    assert height_map.get_altitude_for_pixel(x=1, y=2) == 42
+
+    main([str(hgt_path), "--output-dir", str(tmp_path / "idw"), "--fill-voids", "idw"])
+    height_map = Srtm3BlockHeightMap(path=tmp_path / "idw" / "N40W008.hgtb")
+    assert height_map.get_altitude_for_pixel(x=601, y=601) == 6632
+
+
+def test_convert_hgt_file_fill_voids_existing(tmp_path, write_hgt):
+    raster = synthetic_raster(offset=32)
+    raster[600, 600] = NODATA
+    hgt_path = write_hgt("N40W008", raster=raster)
+    output_dir = tmp_path / "blocks"
+
+    # Existing tiles are only reused if their voids were filled the same way
+    block_path = convert_hgt_file(hgt_path, output_dir)
+    assert Srtm3BlockHeightMap(path=block_path).has_voids
+    assert convert_hgt_file(hgt_path, output_dir, void_fill="nearest") == block_path
+    assert read_void_fill(block_path) == "nearest"
+    assert not Srtm3BlockHeightMap(path=block_path).has_voids
+    mtime_ns = block_path.stat().st_mtime_ns
+    convert_hgt_file(hgt_path, output_dir, void_fill="nearest")
+    assert block_path.stat().st_mtime_ns == mtime_ns
+
+    convert_hgt_file(hgt_path, output_dir)
+    assert read_void_fill(block_path) is None
+    assert Srtm3BlockHeightMap(path=block_path).has_voids
+
+
+def test_block_height_map_matches_hgt(tmp_path, hgt_dir, write_hgt):
+    numpy = pytest.importorskip("numpy")
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    main([str(hgt_dir), "--output-dir", str(tmp_path / "blocks"), "--processes", "1"])
+    block_collection = Srtm3HeightMapCollection(hgt_dir=tmp_path / "blocks")
+    height_map = block_collection.height_maps[(40, -8)]
+    assert isinstance(height_map, Srtm3BlockHeightMap)
+
+    latitudes = numpy.linspace(40.0, 40.99, 50)
+    longitudes = numpy.linspace(-7.99, -6.01, 50)
+    for interpolation in ("nearest", "bicubic"):
+        assert (
+            block_collection.get_altitudes(
+                latitudes, longitudes, interpolation=interpolation
+            ).tolist()
+            == collection.get_altitudes(
+                latitudes, longitudes, interpolation=interpolation
+            ).tolist()
+        )
+
+    region = block_collection.get_region(40.2, -7.3, 40.4, -6.9)
+    assert region.elevations.tolist() == (
+        collection.get_region(40.2, -7.3, 40.4, -6.9).elevations.tolist()
+    )
+    # The region did not need the whole tile to be decompressed
+    assert height_map._raster_array is None
+
+
+def test_collection_prefers_block_files(hgt_dir, write_hgt):
+    pytest.importorskip("numpy")
+    hgt_path = write_hgt("N40W008", zipped=True)
+    raster = synthetic_raster(offset=1000)
+    write_block_file(hgt_dir / "N40W008.hgtb", compress_raster(raster.tobytes(), 1201))
+    for lazy_index in (False, True):
+        collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, lazy_index=lazy_index)
+        assert collection.get_altitude(40.5, -7.5) == 7600
+    assert hgt_path.exists()
+
+
+def test_block_height_map_wrong_resolution(tmp_path):
+    pytest.importorskip("numpy")
+    path = tmp_path / "N40W008.hgtb"
+    write_block_file(path, compress_raster(synthetic_raster(10).tobytes(), 10))
+    with pytest.raises(AssertionError):
+        Srtm3BlockHeightMap(path=path).ensure_loaded()
@@ -0,0 +1,181 @@
+import struct
+
+import pytest
+
+from srtm.export import write_raster, write_raster_strips
+from srtm.height_map_collection import Srtm3HeightMapCollection
+from srtm.utilities import NODATA, GeoTransform
+
+GEOTRANSFORM = GeoTransform(north_latitude=41, west_longitude=-8, pixel_width=0.5)
+
+
+def read_tiff(path):
+    """Read the tags and raster of an uncompressed, one strip per row TIFF"""
+    numpy = pytest.importorskip("numpy")
+    data = path.read_bytes()
+    assert data[:2] == b"II"
+    (version,) = struct.unpack_from("<H", data, 2)
+    if version == 43:
+        (ifd_offset,) = struct.unpack_from("<Q", data, 8)
+        (entry_count,) = struct.unpack_from("<Q", data, ifd_offset)
+        entries_offset, entry_format = ifd_offset + 8, "<HHQ8s"
+    else:
+        assert version == 42
+        (ifd_offset,) = struct.unpack_from("<I", data, 4)
+        (entry_count,) = struct.unpack_from("<H", data, ifd_offset)
+        entries_offset, entry_format = ifd_offset + 2, "<HHI4s"
+
+    field_dtypes = {2: "u1", 3: "<u2", 4: "<u4", 12: "<f8", 16: "<u8"}
+    tags = {}
+    for n in range(entry_count):
+        tag, field_type, count, value = struct.unpack_from(
+            entry_format, data, entries_offset + n * struct.calcsize(entry_format)
+        )
+        dtype = numpy.dtype(field_dtypes[field_type])
+        if count * dtype.itemsize > len(value):
+            (offset,) = struct.unpack("<Q" if version == 43 else "<I", value)
+            value = data[offset : offset + count * dtype.itemsize]
+        tags[tag] = numpy.frombuffer(value[: count * dtype.itemsize], dtype=dtype)
+
+    columns, rows = int(tags[256][0]), int(tags[257][0])
+    dtype = {1: "<u", 2: "<i", 3: "<f"}[int(tags[339][0])] + str(tags[258][0] // 8)
+    raster = numpy.stack(
+        [
+            numpy.frombuffer(data, dtype=dtype, count=columns, offset=int(offset))
+            for offset in tags[273]
+        ]
+    )
+    assert raster.shape == (rows, columns)
+    return tags, raster
+
+
+def test_write_raster_tiff(tmp_path):
+    numpy = pytest.importorskip("numpy")
+    values = numpy.array([[1.5, numpy.nan, 3], [4, 5, 6]], dtype=numpy.float32)
+    path = write_raster(tmp_path / "values.tif", values, GEOTRANSFORM)
+    assert path.read_bytes()[2:4] == struct.pack("<H", 42)
+
+    tags, raster = read_tiff(path)
+    assert raster.dtype == "<f4"
+    assert numpy.array_equal(raster, values, equal_nan=True)
+    # Pixel scale, and the north-west corner of the north-west pixel
+    assert tags[33550].tolist() == [0.5, 0.5, 0]
+    assert tags[33922].tolist() == [0, 0, 0, -8.25, 41.25, 0]
+    # WGS84 latitude/longitude
+    assert tags[34735].tolist()[-4:] == [2048, 0, 1, 4326]
+    assert tags[42113].tobytes() == b"nan\0"
+
+
+def test_write_raster_bigtiff(tmp_path, monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    # Too small to need a BigTIFF, so pretend otherwise
+    monkeypatch.setattr("srtm.export._BIGTIFF_BYTES", 0)
+    values = numpy.arange(12, dtype=numpy.int16).reshape(3, 4)
+    values[1, 1] = NODATA
+    path = write_raster(tmp_path / "values.tif", values, GEOTRANSFORM)
+    assert path.read_bytes()[2:4] == struct.pack("<H", 43)
+
+    tags, raster = read_tiff(path)
+    assert raster.tolist() == values.tolist()
+    assert tags[273].dtype == "<u8"
+    assert tags[42113].tobytes() == b"-32768\0"
+
+
+def test_write_raster_hgt_envi_asc(tmp_path):
+    numpy = pytest.importorskip("numpy")
+    values = numpy.array([[True, False, True], [False, True, False]])
+
+    path = write_raster(tmp_path / "visible.bil", values, GEOTRANSFORM)
+    assert path.read_bytes() == bytes([1, 0, 1, 0, 1, 0])
+    header = (tmp_path / "visible.hdr").read_text().splitlines()
+    assert "data type = 1" in header
+    assert (
+        "map info = {Geographic Lat/Lon, 1, 1, -8.25, 41.25, 0.5, 0.5, "
+        "WGS-84, units=Degrees}"
+    ) in header
+    # No nodata for booleans
+    assert not any(line.startswith("data ignore value") for line in header)
+
+    slopes = numpy.array([[0.5, numpy.nan], [1 / 3, 90]], dtype=numpy.float32)
+    path = write_raster(tmp_path / "slopes.asc", slopes, GEOTRANSFORM)
+    lines = path.read_text().splitlines()
+    assert lines[:6] == [
+        "ncols 2",
+        "nrows 2",
+        "xllcorner -8.25",
+        "yllcorner 40.25",
+        "cellsize 0.5",
+        "NODATA_value -9999",
+    ]
+    assert lines[6].split() == ["0.5", "-9999"]
+    assert float(lines[7].split()[0]) == slopes[1, 0]
+
+    # Floats are rounded, with NaN as NODATA
+    path = write_raster(tmp_path / "values.hgt", slopes * 10, GEOTRANSFORM)
+    written = numpy.frombuffer(path.read_bytes(), dtype=">i2")
+    assert written.tolist() == [5, NODATA, 3, 900]
+    with pytest.raises(ValueError):
+        write_raster(tmp_path / "values.hgt", values.astype(complex), GEOTRANSFORM)
+    with pytest.raises(ValueError):
+        write_raster(tmp_path / "values.png", values, GEOTRANSFORM)
+
+
+def test_write_raster_strips(tmp_path):
+    numpy = pytest.importorskip("numpy")
+    strips = [numpy.full((2, 3), n, dtype=numpy.int16) for n in range(3)]
+    path = write_raster_strips(
+        tmp_path / "strips", strips, (6, 3), numpy.int16, GEOTRANSFORM, "envi"
+    )
+    written = numpy.frombuffer(path.read_bytes(), dtype="<i2").reshape(6, 3)
+    assert written[:, 0].tolist() == [0, 0, 1, 1, 2, 2]
+    assert "data ignore value = -32768" in (tmp_path / "strips.hdr").read_text()
+
+    # Non-contiguous & float strips are converted to big-endian int16 for HGT
+    strips = [numpy.arange(6, dtype=numpy.float32).reshape(3, 2).T + 0.4, strips[0]]
+    strips[1][0, 1] = NODATA
+    path = write_raster_strips(
+        tmp_path / "strips.hgt", strips, (4, 3), numpy.int16, GEOTRANSFORM
+    )
+    written = numpy.frombuffer(path.read_bytes(), dtype=">i2").reshape(4, 3)
+    assert written.tolist() == [[0, 2, 4], [1, 3, 5], [0, NODATA, 0], [0, 0, 0]]
+
+    with pytest.raises(AssertionError):
+        write_raster_strips(
+            tmp_path / "short.asc", strips, (7, 3), numpy.int16, GEOTRANSFORM
+        )
+
+
+def test_export_region(hgt_dir, write_hgt, tmp_path, monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    hgt_path = write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+
+    # A tile's own bounds give a copy of the tile, without its neighbours
+    path = collection.export_region(tmp_path / "N40W008.hgt", 40, -8, 41, -7)
+    assert path.read_bytes() == hgt_path.read_bytes()
+
+    write_hgt("N40W007")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+
+    # Streamed in many strips, across tiles
+    monkeypatch.setattr("srtm.height_map_collection.EXPORT_STRIP_PIXELS", 1000)
+    bounds = (40.2, -7.3, 40.4, -6.8)
+    path = collection.export_region(tmp_path / "region.tif", *bounds)
+    region = collection.get_region(*bounds)
+    tags, raster = read_tiff(path)
+    assert numpy.array_equal(raster, region.elevations)
+    geotransform = region.geotransform
+    assert tags[33922][3:5].tolist() == pytest.approx(
+        [
+            geotransform.west_longitude - geotransform.pixel_width / 2,
+            geotransform.north_latitude + geotransform.pixel_width / 2,
+        ]
+    )
+
+    # Missing tiles are filled, as for regions
+    path = collection.export_region(
+        tmp_path / "filled.bil", 40.9, -7.1, 41.1, -6.9, fill_value=numpy.nan
+    )
+    written = numpy.fromfile(path, dtype="<f8").reshape(241, 241)
+    assert numpy.isnan(written[:120]).all()
+    assert not numpy.isnan(written[121:]).any()
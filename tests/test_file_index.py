@@ -0,0 +1,105 @@
+import json
+import os
+
+from srtm import file_index
+from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.file_index import find_hgt_file, index_hgt_files, scan_hgt_dir
+
+
+def test_scan_hgt_dir(tmp_path, hgt_dir, write_hgt):
+    manifest_path = tmp_path / "manifest.json"
+    path1 = write_hgt("N40W008")
+    path2 = write_hgt("N40W007", zipped=True)
+    (hgt_dir / "Eurasia").mkdir()
+    path3 = path1.rename(hgt_dir / "Eurasia" / path1.name)
+
+    assert sorted(scan_hgt_dir(hgt_dir, manifest_path)) == sorted([path2, path3])
+
+    manifest = json.loads(manifest_path.read_text())
+    assert manifest["directories"]["Eurasia"]["files"] == [
+        {
+            "name": "N40W008.hgt",
+            "size": 1442401 * 2,
+            "mtime_ns": path3.stat().st_mtime_ns,
+        }
+    ]
+
+
+def test_scan_hgt_dir_unchanged_directories_not_rescanned(
+    tmp_path, hgt_dir, write_hgt, monkeypatch
+):
+    manifest_path = tmp_path / "manifest.json"
+    path = write_hgt("N40W008")
+    scan_hgt_dir(hgt_dir, manifest_path)
+
+    scanned = []
+    scan_directory = file_index._scan_directory
+
+    def record_scan(hgt_dir, relative_dir, mtime_ns):
+        scanned.append(relative_dir)
+        return scan_directory(hgt_dir, relative_dir, mtime_ns)
+
+    monkeypatch.setattr(file_index, "_scan_directory", record_scan)
+    # As the directory & its files haven't changed, the manifest is trusted
+    assert scan_hgt_dir(hgt_dir, manifest_path) == [path]
+    assert scanned == []
+
+    # Touching the directory causes it to be rescanned
+    stat = hgt_dir.stat()
+    os.utime(hgt_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert scan_hgt_dir(hgt_dir, manifest_path) == [path]
+    assert scanned == [""]
+
+
+def test_scan_hgt_dir_file_replaced_in_place(tmp_path, hgt_dir, write_hgt):
+    manifest_path = tmp_path / "manifest.json"
+    path = write_hgt("N40W008")
+    scan_hgt_dir(hgt_dir, manifest_path)
+
+    # Rewriting a file leaves its directory's modification time alone
+    stat = hgt_dir.stat()
+    write_hgt("N40W008", values_per_row=3601)
+    os.utime(hgt_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert scan_hgt_dir(hgt_dir, manifest_path) == [path]
+    manifest = json.loads(manifest_path.read_text())
+    assert manifest["directories"][""]["files"][0]["size"] == 3601 * 3601 * 2
+
+
+def test_scan_hgt_dir_new_file(tmp_path, hgt_dir, write_hgt):
+    manifest_path = tmp_path / "manifest.json"
+    path1 = write_hgt("N40W008")
+    scan_hgt_dir(hgt_dir, manifest_path)
+    path2 = write_hgt("N40W007")
+    stat = hgt_dir.stat()
+    os.utime(hgt_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert sorted(scan_hgt_dir(hgt_dir, manifest_path)) == [path2, path1]
+
+
+def test_scan_hgt_dir_ignores_other_manifests(tmp_path, hgt_dir, write_hgt):
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text("not json")
+    path = write_hgt("N40W008")
+    assert scan_hgt_dir(hgt_dir, manifest_path) == [path]
+
+
+def test_find_hgt_file(hgt_dir):
+    hgt_files = index_hgt_files(
+        [
+            hgt_dir / "N40W008.hgt",
+            hgt_dir / "a" / "b" / "n40w007.SRTMGL1.hgt.zip",
+            hgt_dir / "N40W006.hgt.zip",
+            hgt_dir / "N40W006.hgtb",
+        ]
+    )
+    assert sorted(hgt_files) == ["N40W006", "N40W007", "N40W008"]
+    assert find_hgt_file(hgt_files, RasterBaseCoordinates(40, -8)) == (
+        hgt_dir / "N40W008.hgt"
+    )
+    assert find_hgt_file(hgt_files, RasterBaseCoordinates(40, -7)) == (
+        hgt_dir / "a" / "b" / "n40w007.SRTMGL1.hgt.zip"
+    )
+    # Block-compressed files are preferred
+    assert find_hgt_file(hgt_files, RasterBaseCoordinates(40, -6)) == (
+        hgt_dir / "N40W006.hgtb"
+    )
+    assert find_hgt_file(hgt_files, RasterBaseCoordinates(40, -5)) is None
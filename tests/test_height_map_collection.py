@@ -1,8 +1,23 @@
+import mmap
+from math import isnan, nan, radians
+
+import pytest
+
 from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.exceptions import NoHeightMapDataException
+from srtm.height_maps import Srtm3HeightMap
 from srtm.height_map_collection import (
+    LayeredHeightMapCollection,
     Srtm3HeightMapCollection,
     Srtm1HeightMapCollection,
 )
+from srtm.utilities import EARTH_RADIUS, NODATA, get_clearances, get_clearances_array
+from tests.conftest import synthetic_raster
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 def test_srtm3_height_map_collection_build_file_index():
@@ -83,3 +98,523 @@ def test_srtm3_get_points():
     assert points[10] == (10.0, 50.00083333333333)
     assert points[-1] == (10.007499999999993, 50.00749999999999)
     assert len(points) == 100
+
+
+def test_height_map_collection_use_mmap(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, use_mmap=True)
+    assert collection.get_altitude(latitude=40.5, longitude=-7.5) == 6632
+    height_map = collection.get_height_map_for_latitude_and_longitude(40.5, -7.5)
+    assert isinstance(height_map.raster, mmap.mmap)
+
+
+def test_height_map_collection_get_altitudes(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    latitudes = [40.5, 40.5, 40.25, 40.999]
+    longitudes = [-7.5, -6.5, -7.75, -6.001]
+    altitudes = collection.get_altitudes(latitudes, longitudes)
+    assert altitudes.dtype == "int16"
+    assert list(altitudes) == [
+        collection.get_altitude(latitude, longitude)
+        for latitude, longitude in zip(latitudes, longitudes)
+    ]
+
+
+def test_height_map_collection_get_altitudes_iterables(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    altitudes = collection.get_altitudes(
+        (lat for lat in [40.5, 40.25]), (lng for lng in [-7.5, -7.75])
+    )
+    assert list(altitudes) == [6632, 9332]
+
+
+def test_height_map_collection_get_altitudes_missing(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    with pytest.raises(NoHeightMapDataException):
+        collection.get_altitudes([40.5, 50.5], [-7.5, -7.5])
+    # Nothing should have been loaded before raising
+    assert not any(hm.raster for hm in collection.height_maps.values())
+
+    altitudes = collection.get_altitudes([40.5, 50.5], [-7.5, -7.5], fill_value=-1)
+    assert altitudes.dtype == "int16"
+    assert list(altitudes) == [6632, -1]
+
+    altitudes = collection.get_altitudes([40.5, 50.5], [-7.5, -7.5], fill_value=nan)
+    assert altitudes.dtype == "float64"
+    assert altitudes[0] == 6632
+    assert isnan(altitudes[1])
+
+
+def test_height_map_collection_get_elevation_profile_arrays(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    for apply_earth_curvature in (True, False):
+        kwargs = dict(
+            start_latitude=40.103284,
+            start_longitude=-7.453766,
+            end_latitude=40.073772,
+            end_longitude=-6.932998,
+            apply_earth_curvature=apply_earth_curvature,
+        )
+        profile = collection.get_elevation_profile_arrays(**kwargs)
+        expected = collection.get_elevation_profile(**kwargs)
+
+        assert len(profile.latitudes) == len(expected) == 626
+        assert profile.latitudes.tolist() == [p.latitude for p in expected]
+        assert profile.longitudes.tolist() == [p.longitude for p in expected]
+        assert profile.elevations == pytest.approx([p.elevation for p in expected])
+        assert profile.distances == pytest.approx([p.distance for p in expected])
+        assert get_clearances_array(profile, 10, 5) == pytest.approx(
+            get_clearances(expected, 10, 5)
+        )
+
+
+def test_height_map_collection_has_line_of_sight(hgt_dir, write_hgt, monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    # Gently rolling terrain with a few sharp peaks
+    rng = numpy.random.default_rng(1)
+    for hgt_name in ("N40W008", "N40W007"):
+        raster = rng.integers(100, 140, (1201, 1201))
+        raster[rng.integers(0, 1201, 20), rng.integers(0, 1201, 20)] = 2000
+        write_hgt(hgt_name, raster=raster)
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+
+    links = [
+        (
+            *rng.uniform([40.01, -7.99], [40.99, -6.01]),
+            *rng.uniform([40.01, -7.99], [40.99, -6.01]),
+        )
+        for _ in range(30)
+    ]
+    for link in links:
+        profile = collection.get_elevation_profile_arrays(*link)
+        for offsets, min_clearance in (((10, 20), 0), ((100, 100), 5), ((0, 0), -1)):
+            clearances = get_clearances_array(profile, *offsets)
+            assert collection.has_line_of_sight(
+                *link, *offsets, min_clearance=min_clearance
+            ) == bool((clearances >= min_clearance).all())
+
+    # Clearly clear and clearly blocked links are decided by the extrema alone,
+    # so only the pixels at either end are read
+    pixels_read = []
+    read_pixels = Srtm3HeightMap._read_pixels
+
+    def count_pixels_read(self, rows, columns):
+        pixels_read.append(len(rows))
+        return read_pixels(self, rows, columns)
+
+    monkeypatch.setattr(Srtm3HeightMap, "_read_pixels", count_pixels_read)
+    assert collection.has_line_of_sight(40.2, -7.8, 40.8, -6.2, 3000, 3000)
+    assert not collection.has_line_of_sight(40.2, -7.8, 40.8, -6.2, -500, -500)
+    assert sum(pixels_read) == 4
+    assert collection.has_line_of_sight(40.5, -7.5, 40.5, -7.5)
+
+
+def test_height_map_collection_index_manifest(tmp_path, hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    manifest_path = tmp_path / "index.json"
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, index_manifest=manifest_path)
+    assert manifest_path.exists()
+    assert len(collection.height_maps) == 2
+
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, index_manifest=manifest_path)
+    assert collection.get_altitude(40.5, -6.5) == 6633
+
+
+def test_height_map_collection_lazy_index(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    (hgt_dir / "Eurasia").mkdir()
+    write_hgt("N40W007").rename(hgt_dir / "Eurasia" / "N40W007.hgt")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, lazy_index=True)
+    assert collection.height_maps == {}
+
+    assert collection.get_altitude(40.5, -6.5) == 6633
+    assert list(collection.height_maps) == [RasterBaseCoordinates(40, -7)]
+    altitudes = collection.get_altitudes([40.5, 50.5], [-7.5, -7.5], fill_value=-1)
+    assert list(altitudes) == [6632, -1]
+    with pytest.raises(NoHeightMapDataException):
+        collection.get_altitude(50.5, -7.5)
+    assert len(collection.height_maps) == 2
+
+
+def test_height_map_collection_lazy_index_file_names(hgt_dir, write_hgt):
+    # Found by the same names & at the same depths as the full index
+    (hgt_dir / "Eurasia" / "Portugal").mkdir(parents=True)
+    write_hgt("N40W008").rename(hgt_dir / "Eurasia" / "Portugal" / "N40W008.hgt")
+    write_hgt("N40W007", zipped=True).rename(hgt_dir / "N40W007.SRTMGL3.hgt.zip")
+    full = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    lazy = Srtm3HeightMapCollection(hgt_dir=hgt_dir, lazy_index=True)
+    assert len(full.height_maps) == 2
+    assert lazy.get_altitude(40.5, -7.5) == full.get_altitude(40.5, -7.5) == 6632
+    assert lazy.get_altitude(40.5, -6.5) == full.get_altitude(40.5, -6.5)
+    assert lazy.height_maps[(40, -7)].path == hgt_dir / "N40W007.SRTMGL3.hgt.zip"
+
+
+def test_height_map_collection_load_area_lazy_index(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    write_hgt("N41W008")
+    write_hgt("N43W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, lazy_index=True)
+    collection.load_area(
+        RasterBaseCoordinates.from_file_name("N40W009"),
+        RasterBaseCoordinates.from_file_name("N42W007"),
+    )
+    assert len(collection.tile_cache) == 2
+
+
+def test_height_map_collection_load_area_threads(hgt_dir, write_hgt):
+    for hgt_name in ("N40W008", "N40W007", "N41W008", "N41W007"):
+        write_hgt(hgt_name)
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    collection.load_area(
+        RasterBaseCoordinates.from_file_name("N40W008"),
+        RasterBaseCoordinates.from_file_name("N41W007"),
+        max_workers=4,
+    )
+    assert len(collection.tile_cache) == 4
+    assert collection.tile_cache.stats().misses == 4
+    assert all(hm.raster is not None for hm in collection.height_maps.values())
+
+
+def write_linear_tiles(write_hgt, names):
+    """Write tiles of a surface which is linear across all tiles"""
+    rows, columns = numpy.indices((1201, 1201))
+    for name in names:
+        base = RasterBaseCoordinates.from_file_name(name)
+        latitudes = base.latitude + 1 - rows / 1200
+        longitudes = base.longitude + columns / 1200
+        write_hgt(name, raster=numpy.rint(linear_surface(latitudes, longitudes)))
+
+
+def linear_surface(latitude, longitude):
+    return 2400 * (latitude - 40) + 3600 * (longitude + 8)
+
+
+@pytest.mark.parametrize("interpolation", ["bilinear", "bicubic"])
+def test_height_map_collection_get_altitudes_interpolated(
+    hgt_dir, write_hgt, interpolation
+):
+    write_linear_tiles(write_hgt, ["N40W008", "N40W007", "N41W008", "N41W007"])
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    # Including points right next to the edges of tiles
+    latitudes = numpy.array([40.5, 40.50001, 40.9999, 41.0001, 40.9997, 41.5])
+    longitudes = numpy.array([-7.5, -7.50002, -7.0001, -6.9997, -7.0002, -7.0004])
+    altitudes = collection.get_altitudes(
+        latitudes, longitudes, interpolation=interpolation
+    )
+    assert altitudes.dtype == "float64"
+    assert altitudes == pytest.approx(linear_surface(latitudes, longitudes))
+    assert collection.get_altitude(
+        40.50001, -7.50002, interpolation=interpolation
+    ) == pytest.approx(linear_surface(40.50001, -7.50002))
+
+
+def test_height_map_collection_get_altitudes_bilinear(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    pixel = 1 / 1200
+    latitudes = [40.5, 40.5, 40.5 - pixel / 2, 40.5 - pixel / 4]
+    longitudes = [-7.5, -7.5 + pixel / 2, -7.5, -7.5 + pixel / 4]
+    altitudes = collection.get_altitudes(
+        latitudes, longitudes, interpolation="bilinear"
+    )
+    assert altitudes == pytest.approx([6632, 6632.5, 6637, 6634.75])
+
+
+def test_height_map_collection_get_altitudes_bicubic_missing_neighbour(
+    hgt_dir, write_hgt
+):
+    write_linear_tiles(write_hgt, ["N40W008"])
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    # The edge pixels are used in place of the missing neighbouring tiles
+    altitude = collection.get_altitude(40.9999, -7.0001, interpolation="bicubic")
+    assert altitude == pytest.approx(linear_surface(40.9999, -7.0001), abs=1)
+
+
+def test_height_map_collection_get_elevation_profile_interpolated(hgt_dir, write_hgt):
+    write_linear_tiles(write_hgt, ["N40W008", "N40W007"])
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    kwargs = dict(
+        start_latitude=40.1,
+        start_longitude=-7.4,
+        end_latitude=40.2,
+        end_longitude=-6.9,
+        apply_earth_curvature=False,
+        interpolation="bilinear",
+    )
+    profile = collection.get_elevation_profile(**kwargs)
+    profile_arrays = collection.get_elevation_profile_arrays(**kwargs)
+    expected = [linear_surface(p.latitude, p.longitude) for p in profile]
+    assert [p.elevation for p in profile] == pytest.approx(expected)
+    assert profile_arrays.elevations == pytest.approx(expected)
+
+
+def test_height_map_collection_invalid_interpolation(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    with pytest.raises(ValueError):
+        collection.get_altitudes([40.5], [-7.5], interpolation="cubic")
+
+
+def test_height_map_collection_get_region(hgt_dir, write_hgt):
+    write_linear_tiles(write_hgt, ["N40W008", "N40W007", "N41W008", "N41W007"])
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    region = collection.get_region(40.9, -7.1, 41.1, -6.8)
+    assert region.elevations.shape == (241, 361)
+    assert region.elevations.dtype == "int16"
+    assert region.geotransform.north_latitude == pytest.approx(41.1)
+    assert region.geotransform.west_longitude == pytest.approx(-7.1)
+
+    rows, columns = numpy.indices(region.elevations.shape)
+    expected = linear_surface(
+        region.geotransform.latitude(rows), region.geotransform.longitude(columns)
+    )
+    assert (region.elevations == numpy.rint(expected)).all()
+
+
+def test_height_map_collection_iter_region_blocks(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    region = collection.get_region(40.2, -7.5, 40.6, -6.7)
+    blocks = list(collection.iter_region_blocks(40.2, -7.5, 40.6, -6.7, block_size=100))
+    assert len(blocks) == 5 * 10
+    assert max(block.elevations.size for block in blocks) == 100 * 100
+
+    stitched = numpy.empty_like(region.elevations)
+    for block in blocks:
+        rows, columns = block.elevations.shape
+        stitched[
+            block.row_offset : block.row_offset + rows,
+            block.column_offset : block.column_offset + columns,
+        ] = block.elevations
+        assert block.geotransform.latitude(0) == pytest.approx(
+            region.geotransform.latitude(block.row_offset)
+        )
+        assert block.geotransform.longitude(0) == pytest.approx(
+            region.geotransform.longitude(block.column_offset)
+        )
+    assert (stitched == region.elevations).all()
+
+    # Values match point lookups
+    latitude = region.geotransform.latitude(123)
+    longitude = region.geotransform.longitude(456)
+    assert region.elevations[123, 456] == collection.get_altitude(latitude, longitude)
+
+
+def test_height_map_collection_get_region_missing(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    with pytest.raises(NoHeightMapDataException):
+        collection.get_region(40.5, -7.5, 40.6, -6.5)
+    assert len(collection.tile_cache) == 0
+
+    region = collection.get_region(40.5, -7.5, 40.6, -6.5, fill_value=-32768)
+    assert (region.elevations[:, 601:] == -32768).all()
+    assert (region.elevations[:, :600] != -32768).all()
+
+
+def test_height_map_collection_get_region_whole_degrees(hgt_dir, write_hgt):
+    hgt_path = write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    # Edge pixels are shared with the missing neighbours, but N40W008 has them
+    region = collection.get_region(40, -8, 41, -7)
+    tile = numpy.fromfile(hgt_path, ">i2").reshape(1201, 1201)
+    assert (region.elevations == tile).all()
+    region = collection.get_region(40.0, -8.0, 40.5, -7.5)
+    assert region.elevations.shape == (601, 601)
+    assert (region.elevations == tile[600:, :601]).all()
+
+    # A pixel beyond the edge is only in the missing neighbour
+    with pytest.raises(NoHeightMapDataException):
+        collection.get_region(39.999, -8, 40.5, -7.5)
+    with pytest.raises(NoHeightMapDataException):
+        collection.get_region(40, -8, 41.001, -7)
+
+
+def write_void_tile(write_hgt):
+    """Write N40W008 with voids at (40.5, -7.5) and the 2 pixels east of it"""
+    raster = synthetic_raster(offset=32)
+    raster[600, 600:603] = NODATA
+    write_hgt("N40W008", raster=raster)
+
+
+def test_height_map_collection_get_altitudes_voids(hgt_dir, write_hgt):
+    write_void_tile(write_hgt)
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    pixel = 1 / 1200
+    latitudes = [40.5, 40.5, 40.5 + pixel]
+    longitudes = [-7.5, -7.5 - pixel, -7.5]
+
+    altitudes = collection.get_altitudes(latitudes, longitudes)
+    assert altitudes.tolist() == [NODATA, 6631, 6622]
+    assert collection.get_altitude(40.5, -7.5) == NODATA
+    altitudes = collection.get_altitudes(latitudes, longitudes, void_value=nan)
+    assert altitudes.dtype == "float64"
+    assert isnan(altitudes[0]) and altitudes[1:].tolist() == [6631, 6622]
+    assert collection.get_altitude(40.5, -7.5, void_value=0) == 0
+
+    # Interpolation near voids is unknown, except at exact pixels
+    altitudes = collection.get_altitudes(
+        [40.5, 40.5, 40.5 + pixel / 2],
+        [-7.5 - pixel / 2, -7.5 - pixel, -7.5 - pixel / 2],
+        interpolation="bilinear",
+    )
+    assert isnan(altitudes[0]) and isnan(altitudes[2])
+    assert altitudes[1] == 6631
+
+    assert collection.height_maps[(40, -8)].has_voids
+    region = collection.get_region(40.4, -7.6, 40.6, -7.4, fill_value=nan)
+    assert numpy.isnan(region.elevations).sum() == 3
+    region = collection.get_region(40.4, -7.6, 40.6, -7.4)
+    assert (region.elevations == NODATA).sum() == 3
+
+
+def test_height_map_collection_get_elevation_profile_voids(hgt_dir, write_hgt):
+    write_void_tile(write_hgt)
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    pixel = 1 / 1200
+    # Across the voids, with points falling halfway between pixels
+    kwargs = dict(
+        start_latitude=40.5,
+        start_longitude=-7.5 - 2 * pixel,
+        end_latitude=40.5,
+        end_longitude=-7.5 + 4 * pixel,
+        apply_earth_curvature=False,
+    )
+    for voids, expected in (
+        ("nan", [6630, 6631, nan, nan, nan, nan, 6635, 6636]),
+        ("skip", [6630, 6631, 6635, 6636]),
+        ("interpolate", [6630, 6631, 6631.8, 6632.6, 6633.4, 6634.2, 6635, 6636]),
+    ):
+        profile = collection.get_elevation_profile(**kwargs, voids=voids)
+        profile_arrays = collection.get_elevation_profile_arrays(**kwargs, voids=voids)
+        for elevations in ([p.elevation for p in profile], profile_arrays.elevations):
+            assert elevations == pytest.approx(expected, nan_ok=True)
+        assert len(profile_arrays.distances) == len(expected)
+
+    with pytest.raises(ValueError):
+        collection.get_elevation_profile_arrays(**kwargs, voids="zero")
+
+    # Clearances over voids are unknown, so voids block the line of sight
+    link = (40.5, -7.5 - 2 * pixel, 40.5, -7.5 + 4 * pixel)
+    profile = collection.get_elevation_profile_arrays(*link)
+    assert not (get_clearances_array(profile, 1000, 1000) >= 0).all()
+    assert not collection.has_line_of_sight(*link, 1000, 1000)
+    assert collection.has_line_of_sight(40.4, -7.6, 40.4, -7.4, 1000, 1000)
+
+
+def test_layered_height_map_collection(tmp_path, hgt_dir, write_hgt):
+    numpy = pytest.importorskip("numpy")
+    # SRTM1 covers only N40W008, SRTM3 covers it and N40W007
+    srtm1_dir = tmp_path / "srtm1"
+    srtm1_dir.mkdir()
+    (srtm1_dir / "N40W008.hgt").write_bytes(
+        synthetic_raster(values_per_row=3601, offset=1).tobytes()
+    )
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    srtm1 = Srtm1HeightMapCollection(hgt_dir=srtm1_dir)
+    srtm3 = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    collection = LayeredHeightMapCollection([srtm1, srtm3])
+    assert collection.height_map_class is srtm1.height_map_class
+    assert collection.height_maps[(40, -8)].values_per_row == 3601
+    assert collection.height_maps[(40, -7)].values_per_row == 1201
+
+    # One batch across both resolutions, without falling back per point
+    latitudes = [40.5, 40.5, 40.5]
+    longitudes = [-7.5, -6.5, -7.5 + 1 / 3600]
+    altitudes = collection.get_altitudes(latitudes, longitudes)
+    assert altitudes.tolist() == [
+        srtm1.get_altitude(40.5, -7.5),
+        srtm3.get_altitude(40.5, -6.5),
+        srtm1.get_altitude(40.5, -7.5 + 1 / 3600),
+    ]
+    assert collection.get_altitude(40.5, -6.5) == srtm3.get_altitude(40.5, -6.5)
+    # Tiles are loaded by the layered collection's own tile cache
+    assert len(collection.tile_cache) == 2
+
+    with pytest.raises(NoHeightMapDataException):
+        collection.get_altitudes([40.5, 41.5], [-7.5, -7.5])
+    assert collection.get_altitudes(
+        [40.5, 41.5], [-7.5, -7.5], fill_value=-1
+    ).tolist() == [srtm1.get_altitude(40.5, -7.5), -1]
+
+    # Regions are sampled on the SRTM1 grid, with SRTM3 pixels repeated
+    region = collection.get_region(40.5, -7.01, 40.51, -6.99)
+    assert region.elevations.shape == (37, 73)
+    assert region.elevations[0, 0] == srtm1.get_altitude(40.51, -7.01)
+    assert region.elevations[0, -1] == srtm3.get_altitude(40.51, -6.99)
+    assert region.elevations[-1, -4:].tolist() == [
+        srtm3.get_altitude(40.5, -6.99 - pixels / 3600) for pixels in (3, 2, 1, 0)
+    ]
+
+    profile = collection.get_elevation_profile_arrays(40.5, -7.1, 40.5, -6.9)
+    assert len(profile.elevations) == 721
+    assert collection.has_line_of_sight(40.5, -7.1, 40.5, -6.9, 40000, 40000)
+
+    # Lazy collections are searched as tiles are needed
+    lazy = LayeredHeightMapCollection(
+        [Srtm1HeightMapCollection(hgt_dir=srtm1_dir, lazy_index=True), srtm3]
+    )
+    assert lazy.get_altitude(40.5, -7.5) == srtm1.get_altitude(40.5, -7.5)
+    assert lazy.get_altitude(40.5, -6.5) == srtm3.get_altitude(40.5, -6.5)
+    assert lazy.get_altitudes([41.5], [-7.5], fill_value=0).tolist() == [0]
+
+
+def test_height_map_collection_get_terrain(hgt_dir, write_hgt):
+    write_linear_tiles(write_hgt, ["N40W008", "N40W007"])
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    base = RasterBaseCoordinates(40, -8)
+    slopes = collection.get_tile_terrain(base, "slope")
+    assert slopes.values.shape == (1201, 1201)
+    assert slopes.geotransform.north_latitude == 41
+    assert collection.get_tile_terrain(base, "slope") is slopes
+    assert collection.get_tile_terrain((40, -8), "slope") is slopes
+
+    # The surface rises 3m per pixel east and 2m per pixel north
+    pixel_height = EARTH_RADIUS * radians(1 / 1200)
+    latitudes = slopes.geotransform.latitude(numpy.arange(1201))[:, None]
+    dz_east = 3 / (pixel_height * numpy.cos(numpy.radians(latitudes)))
+    expected = numpy.degrees(numpy.arctan(numpy.hypot(dz_east, 2 / pixel_height)))
+    # Including the eastern edge, which uses pixels from N40W007
+    assert numpy.allclose(slopes.values[1:-1, 1:], expected[1:-1], rtol=1e-5)
+    # Other edges have no neighbouring tiles, so repeat their own pixels
+    assert (slopes.values[0] < expected[0]).all()
+
+    # Facing downhill, to the south-west
+    aspects = collection.get_tile_terrain(base, "aspect").values
+    assert ((aspects[1:-1] > 180) & (aspects[1:-1] < 270)).all()
+    curvatures = collection.get_tile_terrain(base, "curvature").values
+    assert numpy.abs(curvatures[1:-1, 1:-1]).max() < 1e-9
+
+    # Regions match the tiles they are within
+    region = collection.get_terrain(40.2, -7.3, 40.3, -7.2, "aspect")
+    assert region.values.shape == (121, 121)
+    assert (region.values == aspects[840:961, 840:961]).all()
+    hillshade = collection.get_terrain(40.2, -7.3, 40.3, -6.8, "hillshade")
+    assert ((hillshade.values > 0) & (hillshade.values < 1)).all()
+    # Built from the cached tiles
+    assert (
+        hillshade.values[:, 360:]
+        == collection.get_tile_terrain((40, -7), "hillshade").values[840:961, :241]
+    ).all()
+    whole = collection.get_terrain(40, -8, 41, -7, "slope")
+    assert (whole.values == slopes.values).all()
+    assert len(collection._terrain_cache) == 4
+
+    with pytest.raises(NoHeightMapDataException):
+        collection.get_terrain(40.9, -7.3, 41.1, -7.2, "slope")
+    partial = collection.get_terrain(
+        40.9, -7.3, 41.1, -7.2, "slope", allow_missing=True
+    )
+    assert numpy.isnan(partial.values[:119]).all()
+    assert not numpy.isnan(partial.values[121:]).any()
+    with pytest.raises(ValueError):
+        collection.get_tile_terrain(base, "roughness")
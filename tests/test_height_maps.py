@@ -1,7 +1,15 @@
+import mmap
+import os
+import pickle
+import shutil
+import threading
 from pathlib import Path
 
+import pytest
+
 from srtm.height_maps import Srtm3HeightMap
 from srtm.utilities import get_srtm3_file_path
+from tests.conftest import synthetic_raster
 
 
 def test_get_altitude_for_pixed():
@@ -64,3 +72,207 @@ def test_get_altitude():
         height_map.get_altitude_for_latitude_and_longitude(latitude=40, longitude=-7)
         == 390
     )
+
+
+def test_raster_array(write_hgt):
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008"))
+    array = height_map.raster_array
+    assert array.shape == (1201, 1201)
+    assert array.dtype.str == ">i2"
+    # A view onto the raster bytes, not a copy
+    assert not array.flags.owndata
+    assert array[0, 0] == 32
+    assert array[1, 0] == 42
+    assert array[0, 1] == 33
+
+
+def test_get_altitude_for_pixel_synthetic(write_hgt):
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008"))
+    assert height_map.get_altitude_for_pixel(x=1, y=1) == 32
+    assert height_map.get_altitude_for_pixel(x=2, y=1) == 33
+    assert height_map.get_altitude_for_pixel(x=1, y=2) == 42
+    assert height_map.get_altitude_for_pixel(x=1201, y=1201) == 13232
+    assert isinstance(height_map.get_altitude_for_pixel(x=1, y=1), int)
+
+
+def test_get_altitudes_for_pixels(write_hgt):
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008"))
+    altitudes = height_map.get_altitudes_for_pixels(
+        xs=[1, 2, 1, 1201], ys=[1, 1, 2, 1201]
+    )
+    assert list(altitudes) == [32, 33, 42, 13232]
+    assert altitudes.dtype == "int16"
+
+
+def test_get_altitudes_for_pixels_out_of_range(write_hgt):
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008"))
+    with pytest.raises(ValueError):
+        height_map.get_altitudes_for_pixels(xs=[0], ys=[1])
+    with pytest.raises(ValueError):
+        height_map.get_altitudes_for_pixels(xs=[1], ys=[1202])
+
+
+def test_ensure_loaded_mmap(write_hgt):
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008"), use_mmap=True)
+    height_map.ensure_loaded()
+    assert isinstance(height_map.raster, mmap.mmap)
+    assert height_map.get_altitude_for_pixel(x=1201, y=1201) == 13232
+    assert height_map.raster_array[1, 0] == 42
+
+
+def test_ensure_loaded_mmap_zip_is_read(write_hgt):
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008", zipped=True), use_mmap=True)
+    height_map.ensure_loaded()
+    assert isinstance(height_map.raster, bytes)
+    assert height_map.get_altitude_for_pixel(x=1201, y=1201) == 13232
+
+
+def test_ensure_loaded_cache_dir(tmp_path, write_hgt):
+    cache_dir = tmp_path / "cache"
+    path = write_hgt("N40W008", zipped=True)
+    height_map = Srtm3HeightMap(path=path, cache_dir=cache_dir, use_mmap=True)
+    height_map.ensure_loaded()
+    assert isinstance(height_map.raster, mmap.mmap)
+    assert height_map.get_altitude_for_pixel(x=1201, y=1201) == 13232
+
+    cached_paths = list(cache_dir.iterdir())
+    assert len(cached_paths) == 1
+    assert cached_paths[0].stat().st_size == 1442401 * 2
+
+    # Subsequent loads reuse the extracted file
+    other_height_map = Srtm3HeightMap(path=path, cache_dir=cache_dir)
+    assert other_height_map.extract_to_cache() == cached_paths[0]
+
+
+def test_ensure_loaded_cache_dir_zip_changed(tmp_path, write_hgt):
+    cache_dir = tmp_path / "cache"
+    path = write_hgt("N40W008", zipped=True)
+    height_map = Srtm3HeightMap(path=path, cache_dir=cache_dir)
+    old_cached_path = height_map.extract_to_cache()
+
+    raster = synthetic_raster(offset=1)
+    write_hgt("N40W008", raster=raster, zipped=True)
+    os.utime(path, ns=(0, 0))
+    height_map.ensure_loaded(force=True)
+    assert height_map.get_altitude_for_pixel(x=1, y=1) == 1
+    assert not old_cached_path.exists()
+    assert len(list(cache_dir.iterdir())) == 1
+
+
+def test_ensure_loaded_cache_dir_same_tile(tmp_path, write_hgt, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    path = write_hgt("N40W008", zipped=True)
+    (tmp_path / "copy").mkdir()
+    other_path = Path(shutil.copy2(path, tmp_path / "copy" / path.name))
+    height_map = Srtm3HeightMap(path=path, cache_dir=cache_dir)
+    other_height_map = Srtm3HeightMap(path=other_path, cache_dir=cache_dir)
+
+    # Different zip files of the same tile keep their own extractions
+    cached_path = height_map.extract_to_cache()
+    other_cached_path = other_height_map.extract_to_cache()
+    assert cached_path != other_cached_path
+    assert cached_path.exists()
+
+    # Extracted again if another process removed it after extracting a newer
+    # version of the zip file
+    extractions = []
+    original_extract_to_cache = Srtm3HeightMap.extract_to_cache
+
+    def extract_to_cache(self):
+        extracted_path = original_extract_to_cache(self)
+        extractions.append(extracted_path)
+        if len(extractions) == 1:
+            extracted_path.unlink()
+        return extracted_path
+
+    monkeypatch.setattr(Srtm3HeightMap, "extract_to_cache", extract_to_cache)
+    height_map.ensure_loaded()
+    assert height_map.get_altitude_for_pixel(x=1201, y=1201) == 13232
+    assert extractions == [cached_path, cached_path]
+
+
+def test_ensure_loaded_concurrently_loads_once(write_hgt, monkeypatch):
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008"))
+    reads = []
+    read_raw_file = Srtm3HeightMap._read_raw_file
+
+    def slow_read_raw_file(self, path):
+        reads.append(path)
+        # Give the other threads time to queue up behind this load
+        threading.Event().wait(0.05)
+        return read_raw_file(self, path)
+
+    monkeypatch.setattr(Srtm3HeightMap, "_read_raw_file", slow_read_raw_file)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def load():
+        barrier.wait()
+        results.append(height_map.ensure_loaded())
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(reads) == 1
+    assert len(results) == 8
+    assert all(raster is height_map.raster for raster in results)
+
+
+def test_ensure_loaded_invalid_is_not_published(write_hgt):
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008", values_per_row=100))
+    with pytest.raises(AssertionError):
+        height_map.ensure_loaded()
+    assert height_map.raster is None
+
+
+def test_height_map_pickles_without_lock(write_hgt):
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008"))
+    height_map.ensure_loaded()
+    unpickled = pickle.loads(pickle.dumps(height_map))
+    assert unpickled.raster is None
+    assert unpickled.get_altitude_for_pixel(x=1201, y=1201) == 13232
+
+
+def test_get_altitude_for_latitude_and_longitude_interpolated(write_hgt):
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008"))
+    pixel = 1 / 1200
+    # Beyond the edges, the edge pixels are used. So bicubic interpolation
+    # between the first two pixels (32 & 33) sees values of 32, 32, 33, 34
+    for interpolation, edge_altitude in (("bilinear", 32.5), ("bicubic", 32.4375)):
+        assert height_map.get_altitude_for_latitude_and_longitude(
+            40.5, -7.5 + pixel / 2, interpolation=interpolation
+        ) == pytest.approx(6632.5)
+        assert height_map.get_altitude_for_latitude_and_longitude(
+            41, -8 + pixel / 2, interpolation=interpolation
+        ) == pytest.approx(edge_altitude)
+        altitudes = height_map.get_altitudes_for_latitudes_and_longitudes(
+            [40.5, 40.5 - pixel / 2], [-7.5, -7.5], interpolation=interpolation
+        )
+        assert altitudes == pytest.approx([6632, 6637])
+
+
+def test_block_extrema(write_hgt):
+    numpy = pytest.importorskip("numpy")
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008"))
+    block_extrema = height_map.block_extrema
+    # 1201 pixels make 37 whole blocks of 32, plus a block of 17
+    assert block_extrema.block_size == 32
+    assert block_extrema.minimums.shape == (38, 38)
+    assert block_extrema.minimums[1, 2] == 32 * 10 + 64 + 32
+    assert block_extrema.maximums[1, 2] == 63 * 10 + 95 + 32
+    assert block_extrema.maximums[37, 37] == 13232
+
+    raster_array = height_map.raster_array
+    assert block_extrema.minimums.min() == raster_array.min()
+    assert block_extrema.maximums.max() == raster_array.max()
+
+    # The extrema are kept when the data is unloaded, unless forcibly reloaded
+    height_map.unload()
+    assert height_map.block_extrema is block_extrema
+    assert height_map.raster is None
+    height_map.ensure_loaded(force=True)
+    assert numpy.array_equal(height_map.block_extrema.maximums, block_extrema.maximums)
+    assert height_map.block_extrema is not block_extrema
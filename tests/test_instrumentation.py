@@ -0,0 +1,100 @@
+import pickle
+
+import pytest
+
+from srtm.exceptions import NoHeightMapDataException
+from srtm.height_map_collection import Srtm3HeightMapCollection
+from srtm.instrumentation import Metrics, StatsdInstrumentation
+
+
+def test_metrics(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    write_hgt("N40W007", zipped=True)
+    metrics = Metrics()
+    collection = Srtm3HeightMapCollection(
+        hgt_dir=hgt_dir, max_loaded_tiles=1, instrumentation=metrics
+    )
+
+    assert collection.get_altitude(40.5, -7.5) == 6632
+    assert collection.get_altitude(40.5, -6.5) == 6633
+    with pytest.raises(NoHeightMapDataException):
+        collection.get_altitude(10.5, 10.5)
+    # Including points set to a fill_value
+    altitudes = collection.get_altitudes([10.5, 11.5], [10.5, 10.5], fill_value=0)
+    assert list(altitudes) == [0, 0]
+
+    snapshot = metrics.snapshot()
+    assert snapshot["tile_loads"] == {"read": 1, "zip": 1}
+    assert snapshot["tile_load_bytes"] == {"read": 1201 ** 2 * 2, "zip": 1201 ** 2 * 2}
+    assert snapshot["tile_load_seconds"]["zip"] > 0
+    assert snapshot["tile_evictions"] == 1
+    assert snapshot["tile_accesses"] == {"N40W008": 1, "N40W007": 1}
+    assert snapshot["lookups"] == {"get_altitude": 2, "get_altitudes": 1}
+    assert snapshot["no_data"] == {"N10E010": 2, "N11E010": 1}
+    assert metrics.hot_tiles(1) in ([("N40W008", 1)], [("N40W007", 1)])
+
+
+def test_metrics_nested_lookups(hgt_dir, write_hgt):
+    pytest.importorskip("numpy")
+    write_hgt("N40W008")
+    metrics = Metrics()
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    collection.instrument(metrics)
+
+    collection.get_altitudes([40.1, 40.2, 40.3], [-7.5, -7.5, -7.5])
+    profile = collection.get_elevation_profile(40.1, -7.9, 40.1, -7.8)
+    snapshot = metrics.snapshot()
+    # get_elevation_profile() uses get_altitudes(), which is not reported
+    assert snapshot["lookups"] == {"get_altitudes": 1, "get_elevation_profile": 1}
+    assert snapshot["lookup_points"] == {
+        "get_altitudes": 3,
+        "get_elevation_profile": len(profile),
+    }
+
+    prometheus = metrics.to_prometheus()
+    assert "# TYPE srtm_lookups_total counter\n" in prometheus
+    assert 'srtm_lookups_total{method="get_altitudes"} 1\n' in prometheus
+    assert 'srtm_tile_accesses_total{tile="N40W008"}' in prometheus
+    assert "srtm_tile_evictions_total 0\n" in prometheus
+    assert "tile_accesses" not in metrics.to_prometheus(per_tile=False)
+
+
+def test_instrument_removed(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    metrics = Metrics()
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, instrumentation=metrics)
+    collection.instrument(None)
+    assert "get_altitude" not in collection.__dict__
+    assert "load" not in collection.tile_cache.__dict__
+    assert collection.get_altitude(40.5, -7.5) == 6632
+    assert metrics.snapshot()["lookups"] == {}
+    assert metrics.snapshot()["tile_loads"] == {}
+
+
+def test_instrumented_collection_pickles(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, instrumentation=Metrics())
+    unpickled = pickle.loads(pickle.dumps(collection))
+    assert unpickled.instrumentation is None
+    assert unpickled.height_maps[(40, -8)].instrumentation is None
+    assert unpickled.get_altitude(40.5, -7.5) == 6632
+
+
+def test_statsd_instrumentation(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    lines = []
+    collection = Srtm3HeightMapCollection(
+        hgt_dir=hgt_dir, instrumentation=StatsdInstrumentation(lines.append)
+    )
+    collection.get_altitude(40.5, -7.5)
+    with pytest.raises(NoHeightMapDataException):
+        collection.get_altitude(0.5, 0.5)
+    assert [line.split(":")[0] for line in lines] == [
+        "srtm.tile_load.read",
+        "srtm.tile_load_bytes.read",
+        "srtm.lookup.get_altitude",
+        "srtm.lookup_points.get_altitude",
+        "srtm.no_data",
+    ]
+    assert lines[1] == f"srtm.tile_load_bytes.read:{1201 ** 2 * 2}|c"
+    assert lines[0].endswith("|ms")
@@ -0,0 +1,145 @@
+import pickle
+from pathlib import Path
+
+import pytest
+
+from srtm.exceptions import NoHeightMapDataException
+from srtm.height_map_collection import Srtm3HeightMapCollection
+from srtm.height_maps import Srtm3HeightMap
+from srtm.overviews import (
+    aggregate_raster,
+    overview_factors,
+    overview_height_map_class,
+    validate_overview,
+)
+from srtm.utilities import NODATA
+
+
+def test_overview_factors():
+    assert overview_factors(1201) == [2, 4, 8, 16]
+    assert overview_factors(3601) == [2, 4, 8, 16]
+    assert overview_factors(5) == [2]
+    with pytest.raises(ValueError):
+        validate_overview(1201, 3, "mean")
+    with pytest.raises(ValueError):
+        validate_overview(1201, 2, "median")
+
+
+def test_aggregate_raster():
+    numpy = pytest.importorskip("numpy")
+    raster = numpy.array(
+        [
+            [1, 2, 3, 4, 5],
+            [6, 7, 8, 9, 10],
+            [11, 12, 13, 14, 15],
+            [16, 17, 18, 19, 20],
+            [21, 22, 23, 24, 100],
+        ]
+    )
+    overviews = aggregate_raster(raster, 2)
+    # Boxes of 3x3 pixels centred on every other pixel, clipped to the raster
+    assert overviews["min"].tolist() == [[1, 2, 4], [6, 7, 9], [16, 17, 19]]
+    assert overviews["max"].tolist() == [[7, 9, 10], [17, 19, 20], [22, 24, 100]]
+    assert overviews["mean"].tolist() == [[4, 6, 7], [12, 13, 14], [19, 20, 41]]
+
+    # Voids are left out, unless the whole box is void
+    raster[:2, :2] = NODATA
+    overviews = aggregate_raster(raster, 2)
+    assert overviews["min"][0].tolist() == [NODATA, 3, 4]
+    assert overviews["max"][0].tolist() == [NODATA, 9, 10]
+    assert overviews["mean"][0].tolist() == [NODATA, 6, 7]
+
+
+def test_overview_height_map_class():
+    overview_class = overview_height_map_class(Srtm3HeightMap, 4)
+    assert overview_class.values_per_row == 301
+    assert overview_height_map_class(Srtm3HeightMap, 4) is overview_class
+    height_map = overview_class(path=Path("N40W008.4x.mean.ovr"))
+    assert isinstance(pickle.loads(pickle.dumps(height_map)), overview_class)
+
+
+def test_build_and_get_overview(hgt_dir, write_hgt):
+    pytest.importorskip("numpy")
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    paths = collection.build_overviews(factors=[4])
+    assert sorted(path.name for path in paths) == [
+        "N40W008.4x.max.ovr",
+        "N40W008.4x.mean.ovr",
+        "N40W008.4x.min.ovr",
+    ]
+    assert not collection.tile_cache
+
+    # Overview files are not mistaken for tiles
+    collection.build_file_index()
+    assert len(collection.height_maps) == 1
+
+    mean = collection.get_overview(4)
+    assert collection.get_overview(4) is mean
+    assert mean.get_altitude(40.5, -7.5) == 6632
+    height_map = mean.get_height_map_for_latitude_and_longitude(40.5, -7.5)
+    assert height_map.values_per_row == 301
+    # The box around tile pixel (4, 0) is clipped to columns 0-2, centred on 1
+    assert height_map.get_altitude_for_pixel(x=1, y=2) == 40 + 1 + 32
+    assert collection.get_overview(4, "min").get_altitude(40.5, -7.5) == 6632 - 22
+    assert collection.get_overview(4, "max").get_altitude(40.5, -7.5) == 6632 + 22
+
+    with pytest.raises(ValueError):
+        collection.get_overview(3)
+
+
+def test_overview_bounds_full_resolution(hgt_dir, write_hgt):
+    numpy = pytest.importorskip("numpy")
+    raster = numpy.random.default_rng(1).integers(0, 2000, (1201, 1201))
+    write_hgt("N40W008", raster=raster)
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    collection.build_overviews(factors=[8])
+    minimum = collection.get_overview(8, "min")
+    maximum = collection.get_overview(8, "max")
+    for latitude, longitude in [(40.01, -7.99), (40.5, -7.5), (40.777, -7.123)]:
+        altitude = collection.get_altitude(latitude, longitude)
+        assert (
+            minimum.get_altitude(latitude, longitude)
+            <= altitude
+            <= maximum.get_altitude(latitude, longitude)
+        )
+
+
+def test_overview_missing(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    with pytest.raises(NoHeightMapDataException, match="build_overviews"):
+        collection.get_overview(2).get_altitude(40.5, -7.5)
+
+
+def test_overview_built_after_get_overview(hgt_dir, write_hgt):
+    numpy = pytest.importorskip("numpy")
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    mean = collection.get_overview(4)
+    with pytest.raises(NoHeightMapDataException):
+        mean.get_altitude(40.5, -7.5)
+
+    collection.build_overviews(factors=[4])
+    assert mean.get_altitude(40.5, -7.5) == 6632
+    assert len(mean.tile_cache) == 1
+
+    # Rebuilt overviews replace those already loaded
+    write_hgt("N40W008", raster=numpy.full((1201, 1201), 7))
+    collection.build_file_index()
+    collection.build_overviews(factors=[4], overwrite=True)
+    assert not mean.tile_cache
+    assert mean.get_altitude(40.5, -7.5) == 7
+
+
+def test_get_overview_for_resolution(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    # SRTM3 pixels are about 93m
+    assert collection.get_overview_for_resolution(50) is collection
+    assert collection.get_overview_for_resolution(200).factor == 2
+    assert collection.get_overview_for_resolution(500, "max").factor == 4
+    assert collection.get_overview_for_resolution(500, "max").aggregation == "max"
+    assert collection.get_overview_for_resolution(100000).factor == 16
+    overview = collection.get_overview(2)
+    assert overview.get_overview_for_resolution(500) is collection.get_overview(4)
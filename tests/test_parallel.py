@@ -0,0 +1,52 @@
+import pickle
+
+from srtm.height_map_collection import Srtm3HeightMapCollection
+from srtm.parallel import Link, get_clearances_batch, iter_clearances
+from srtm.utilities import get_clearances
+
+
+def make_links():
+    return [
+        Link(40.1 + n / 100, -7.9 + n / 50, 40.9 - n / 200, -6.1 - n / 100, 10, n)
+        for n in range(20)
+    ]
+
+
+def expected_clearances(collection, links):
+    return [
+        get_clearances(collection.get_elevation_profile(*link[:4]), *link[4:])
+        for link in links
+    ]
+
+
+def test_get_clearances_batch(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    links = make_links()
+    clearances = get_clearances_batch(collection, links, processes=2, chunk_size=3)
+    assert clearances == expected_clearances(collection, links)
+
+
+def test_iter_clearances_serial(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    links = make_links()
+    # Plain tuples are accepted too
+    clearances = iter_clearances(collection, map(tuple, links), processes=1)
+    assert next(clearances) == expected_clearances(collection, links[:1])[0]
+    assert len(list(clearances)) == len(links) - 1
+    # The serial path does not alter the collection's loading behaviour
+    assert not any(hm.use_mmap for hm in collection.height_maps.values())
+
+
+def test_collection_pickles_without_data(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, use_mmap=True)
+    altitude = collection.get_altitude(40.5, -7.5)
+
+    unpickled = pickle.loads(pickle.dumps(collection))
+    assert not any(hm.raster for hm in unpickled.height_maps.values())
+    assert len(unpickled.tile_cache) == 0
+    assert unpickled.get_altitude(40.5, -7.5) == altitude
@@ -0,0 +1,61 @@
+from math import atan, cos, degrees, radians
+
+import pytest
+
+from srtm.terrain import compute_terrain
+from srtm.utilities import EARTH_RADIUS, NODATA, GeoTransform
+
+# Pixels of one arc-second at the equator, so are close to square
+GEOTRANSFORM = GeoTransform(
+    north_latitude=0.01, west_longitude=0, pixel_width=1 / 3600
+)
+PIXEL_SIZE = EARTH_RADIUS * radians(1 / 3600)
+
+
+def test_compute_terrain_ramp():
+    numpy = pytest.importorskip("numpy")
+    # Rising northwards by 0.1m per meter
+    rows, _ = numpy.indices((6, 5))
+    elevations = 1000 - rows * PIXEL_SIZE * 0.1
+
+    slopes = compute_terrain(elevations, GEOTRANSFORM, "slope")
+    assert slopes.dtype == "float32"
+    assert slopes.shape == (4, 3)
+    assert slopes == pytest.approx(numpy.full((4, 3), degrees(atan(0.1))))
+    # Facing downhill, to the south
+    assert compute_terrain(elevations, GEOTRANSFORM, "aspect") == pytest.approx(
+        numpy.full((4, 3), 180)
+    )
+    assert compute_terrain(elevations, GEOTRANSFORM, "curvature") == pytest.approx(
+        numpy.zeros((4, 3)), abs=1e-6
+    )
+
+    # Lit from the south, the light is 45 - slope degrees from the normal
+    hillshade = compute_terrain(elevations, GEOTRANSFORM, "hillshade", azimuth=180)
+    expected = cos(radians(45 - degrees(atan(0.1))))
+    assert hillshade == pytest.approx(numpy.full((4, 3), expected), rel=1e-5)
+    # And from the north, less so
+    hillshade = compute_terrain(elevations, GEOTRANSFORM, "hillshade", azimuth=0)
+    assert (hillshade < expected).all()
+
+
+def test_compute_terrain_peak_and_voids():
+    numpy = pytest.importorskip("numpy")
+    elevations = numpy.zeros((5, 5), dtype=numpy.int16)
+    elevations[2, 2] = 10
+    curvatures = compute_terrain(elevations, GEOTRANSFORM, "curvature")
+    assert curvatures[1, 1] > 0
+    assert curvatures[0, 1] < 0
+    aspects = compute_terrain(elevations, GEOTRANSFORM, "aspect")
+    # Flat around the corners, and facing away from the peak elsewhere
+    assert numpy.isnan(aspects[1, 1])
+    assert aspects[0, 1] == pytest.approx(0)
+    assert aspects[1, 2] == pytest.approx(90, abs=0.01)
+
+    elevations[0, 0] = NODATA
+    slopes = compute_terrain(elevations, GEOTRANSFORM, "slope")
+    assert numpy.isnan(slopes[0, 0])
+    assert numpy.isnan(slopes).sum() == 1
+
+    with pytest.raises(ValueError):
+        compute_terrain(elevations, GEOTRANSFORM, "roughness")
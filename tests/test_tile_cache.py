@@ -0,0 +1,137 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from srtm.height_map_collection import Srtm3HeightMapCollection
+from srtm.height_maps import Srtm3HeightMap
+from srtm.tile_cache import TileCache, TileCacheStats
+
+
+def test_tile_cache_hits_and_misses(write_hgt):
+    cache = TileCache()
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008"))
+    cache.load(height_map)
+    cache.load(height_map)
+    assert height_map.raster is not None
+    assert cache.stats() == TileCacheStats(
+        hits=1, misses=1, evictions=0, loaded_tiles=1, loaded_bytes=1442401 * 2
+    )
+
+
+def test_tile_cache_max_tiles_evicts_least_recently_used(write_hgt):
+    cache = TileCache(max_tiles=2)
+    height_map1 = Srtm3HeightMap(path=write_hgt("N40W008"))
+    height_map2 = Srtm3HeightMap(path=write_hgt("N40W007"))
+    height_map3 = Srtm3HeightMap(path=write_hgt("N40W006"))
+    cache.load(height_map1)
+    cache.load(height_map2)
+    cache.load(height_map1)
+    cache.load(height_map3)
+
+    assert height_map1.raster is not None
+    assert height_map2.raster is None
+    assert height_map3.raster is not None
+    assert height_map2 not in cache
+    assert cache.stats().evictions == 1
+    assert cache.stats().loaded_tiles == 2
+
+
+def test_tile_cache_max_bytes(write_hgt):
+    cache = TileCache(max_bytes=1442401 * 2)
+    height_map1 = Srtm3HeightMap(path=write_hgt("N40W008"))
+    height_map2 = Srtm3HeightMap(path=write_hgt("N40W007"))
+    cache.load(height_map1)
+    cache.load(height_map2)
+    assert height_map1.raster is None
+    assert height_map2.raster is not None
+    assert cache.stats().loaded_bytes == 1442401 * 2
+
+
+def test_tile_cache_always_keeps_latest(write_hgt):
+    cache = TileCache(max_bytes=1)
+    height_map = Srtm3HeightMap(path=write_hgt("N40W008"))
+    cache.load(height_map)
+    assert height_map.raster is not None
+    assert len(cache) == 1
+
+
+def test_tile_cache_pinned(write_hgt):
+    cache = TileCache(max_tiles=1)
+    height_map1 = Srtm3HeightMap(path=write_hgt("N40W008"))
+    height_map2 = Srtm3HeightMap(path=write_hgt("N40W007"))
+    with cache.pinned(height_map1):
+        with cache.pinned(height_map1):
+            pass
+        # Pinned height maps stay loaded, even over budget
+        cache.load(height_map2)
+        assert height_map1.raster is not None
+        assert len(cache) == 2
+    # And are unloaded once unpinned
+    assert height_map1.raster is None
+    assert height_map2.raster is not None
+    assert cache.stats().loaded_tiles == 1
+
+
+def test_collection_max_loaded_tiles(hgt_dir, write_hgt):
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, max_loaded_tiles=1)
+    assert collection.get_altitude(40.5, -7.5) == 6632
+    assert collection.get_altitude(40.5, -6.5) == 6633
+    assert collection.get_altitude(40.5, -7.5) == 6632
+    assert list(collection.get_altitudes([40.5, 40.5], [-7.5, -6.5])) == [6632, 6633]
+
+    loaded = [hm for hm in collection.height_maps.values() if hm.raster]
+    assert len(loaded) == 1
+    stats = collection.tile_cache.stats()
+    assert stats.hits == 1
+    assert stats.misses == 4
+    assert stats.evictions == 3
+
+
+def test_tile_cache_concurrent_loads(write_hgt):
+    cache = TileCache(max_tiles=2)
+    height_maps = [
+        Srtm3HeightMap(path=write_hgt(hgt_name))
+        for hgt_name in ("N40W008", "N40W007", "N40W006")
+    ]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(cache.load, height_maps * 20))
+
+    stats = cache.stats()
+    assert stats.hits + stats.misses == 60
+    assert stats.loaded_tiles == 2
+    assert stats.loaded_bytes == 2 * 1442401 * 2
+    assert sum(hm.raster is not None for hm in height_maps) == 2
+
+
+def test_collection_concurrent_lookups_stay_within_budget(
+    hgt_dir, write_hgt, monkeypatch
+):
+    hgt_names = ("N40W008", "N40W007", "N40W006")
+    for hgt_name in hgt_names:
+        write_hgt(hgt_name)
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, max_loaded_tiles=1)
+
+    # Slow lookups, giving other threads the chance to evict tiles mid-read
+    get_altitude_for_pixel = Srtm3HeightMap.get_altitude_for_pixel
+
+    def slow_get_altitude_for_pixel(self, x, y):
+        time.sleep(0.001)
+        return get_altitude_for_pixel(self, x, y)
+
+    monkeypatch.setattr(
+        Srtm3HeightMap, "get_altitude_for_pixel", slow_get_altitude_for_pixel
+    )
+    points = [(40.5, longitude + 0.5) for longitude in (-8, -7, -6)] * 50
+
+    def get_altitude(point):
+        return collection.get_altitude(*point)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        altitudes = list(executor.map(get_altitude, points))
+    assert altitudes == [6632, 6633, 6634] * 50
+
+    # Tiles were never reloaded outside the cache, where they'd never be freed
+    loaded = [hm for hm in collection.height_maps.values() if hm.raster]
+    assert len(loaded) == len(collection.tile_cache) == 1
+    assert collection.tile_cache.stats().loaded_bytes == 1442401 * 2
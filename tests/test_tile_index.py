@@ -0,0 +1,74 @@
+import pickle
+from pathlib import Path
+
+import pytest
+
+from srtm.base_coordinates import RasterBaseCoordinates
+from srtm.height_maps import Srtm3HeightMap
+from srtm.tile_index import TileIndex
+
+
+def make_height_map(hgt_name: str) -> Srtm3HeightMap:
+    return Srtm3HeightMap(path=Path(f"{hgt_name}.hgt"))
+
+
+def test_tile_index():
+    height_maps = [make_height_map(name) for name in ("N40W008", "S01E000", "N89E179")]
+    index = TileIndex(height_maps)
+    assert len(index) == 3
+    assert list(index) == [height_map.base_coordinates for height_map in height_maps]
+    assert index.values() == height_maps
+    assert index[RasterBaseCoordinates(40, -8)] is height_maps[0]
+    assert index[(-1, 0)] is height_maps[1]
+    assert index.get_tile(89, 179) is height_maps[2]
+    assert (40, -8) in index
+    assert (40, -7) not in index
+    assert index.get((40, -7)) is None
+    with pytest.raises(KeyError):
+        index[(40, -7)]
+    assert index == {
+        height_map.base_coordinates: height_map for height_map in height_maps
+    }
+
+
+def test_tile_index_get_tile_for_latitude_and_longitude():
+    index = TileIndex([make_height_map("N40W008"), make_height_map("S01E000")])
+    for latitude, longitude in ((40.5, -7.5), (40.5, 0.5), (-0.5, 0.5), (90, 180)):
+        base = RasterBaseCoordinates.from_float(latitude, longitude)
+        height_map = index.get_tile_for_latitude_and_longitude(latitude, longitude)
+        assert height_map is index.get(base)
+    # Outside of the world
+    assert index.get_tile_for_latitude_and_longitude(-90.5, -180.5) is None
+
+
+def test_tile_index_set_and_delete():
+    index = TileIndex()
+    height_map = make_height_map("N40W008")
+    index[(40, -8)] = height_map
+    replacement = make_height_map("N40W008")
+    index[(40, -8)] = replacement
+    assert len(index) == 1
+    assert index[(40, -8)] is replacement
+
+    with pytest.raises(ValueError):
+        index[(40, -7)] = height_map
+    with pytest.raises(KeyError):
+        index[(90, 0)] = make_height_map("N90E000")
+
+    del index[(40, -8)]
+    assert len(index) == 0
+    assert (40, -8) not in index
+    with pytest.raises(KeyError):
+        del index[(40, -8)]
+
+    # Positions are reused
+    index[(41, 0)] = make_height_map("N41E000")
+    assert len(index._height_maps) == 1
+    assert list(index) == [(41, 0)]
+
+
+def test_tile_index_pickle():
+    index = TileIndex([make_height_map("N40W008")])
+    unpickled = pickle.loads(pickle.dumps(index))
+    assert unpickled[(40, -8)].path == Path("N40W008.hgt")
+    assert unpickled.get_tile(40, -8).values_per_row == 1201
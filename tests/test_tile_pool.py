@@ -0,0 +1,89 @@
+import pickle
+
+import pytest
+
+from srtm.convert import convert_hgt_file
+from srtm.height_map_collection import Srtm3HeightMapCollection
+from srtm.instrumentation import Metrics
+from srtm.parallel import get_clearances_batch
+from srtm.tile_pool import start_tile_pool
+from tests.test_parallel import expected_clearances, make_links
+
+TILE_BYTES = 1201 * 1201 * 2
+
+
+@pytest.fixture
+def tile_pool():
+    tile_pool = start_tile_pool(max_unused_tiles=1)
+    yield tile_pool
+    tile_pool.shutdown()
+
+
+def test_tile_pool_shares_tiles(hgt_dir, write_hgt, tile_pool):
+    write_hgt("N40W008")
+    write_hgt("N40W007", zipped=True)
+    metrics = Metrics()
+    collection = Srtm3HeightMapCollection(
+        hgt_dir=hgt_dir, tile_pool=tile_pool, instrumentation=metrics
+    )
+    plain = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+
+    assert collection.get_altitude(40.5, -7.5) == plain.get_altitude(40.5, -7.5) == 6632
+    assert collection.get_altitude(40.5, -6.5) == plain.get_altitude(40.5, -6.5)
+    assert metrics.snapshot()["tile_loads"] == {"shared": 2}
+    assert tile_pool.stats().shared_tiles == 2
+    assert tile_pool.stats().shared_bytes == 2 * TILE_BYTES
+    assert tile_pool.stats().references == 2
+
+    # Rasters are read-only views onto the shared memory
+    height_map = collection.height_maps[(40, -8)]
+    assert not height_map.raster_array.flags.writeable
+    with pytest.raises(TypeError):
+        height_map.raster[0] = 0
+
+    # Another "process" attaches to the same memory, without loading again
+    unpickled = pickle.loads(pickle.dumps(collection))
+    assert unpickled.get_altitude(40.5, -7.5) == 6632
+    assert tile_pool.stats().loads == 2
+    assert tile_pool.stats().references == 3
+
+    # Processes detach as tiles are unloaded, and unused tiles are freed
+    # beyond max_unused_tiles
+    collection.tile_cache.clear()
+    unpickled.tile_cache.clear()
+    assert tile_pool.stats().references == 0
+    assert tile_pool.stats().shared_tiles == 1
+    assert tile_pool.stats().frees == 1
+    # The remaining unused tile is reattached, the freed tile reloaded
+    assert collection.get_altitude(40.5, -6.5) == plain.get_altitude(40.5, -6.5)
+    assert collection.get_altitude(40.5, -7.5) == 6632
+    assert tile_pool.stats().loads == 3
+
+
+def test_tile_pool_block_tiles(hgt_dir, write_hgt, tile_pool):
+    hgt_path = write_hgt("N40W008")
+    convert_hgt_file(hgt_path, hgt_dir)
+    hgt_path.unlink()
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, tile_pool=tile_pool)
+    # Shared decompressed
+    assert collection.get_altitude(40.5, -7.5) == 6632
+    assert collection.get_altitudes([40.5, 40.25], [-7.5, -7.5]).tolist() == [
+        6632,
+        9632,
+    ]
+    assert tile_pool.stats().shared_bytes == TILE_BYTES
+
+
+def test_tile_pool_processes(hgt_dir, write_hgt, tile_pool):
+    write_hgt("N40W008")
+    write_hgt("N40W007")
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir, tile_pool=tile_pool)
+    links = make_links()
+    clearances = get_clearances_batch(collection, links, processes=2, chunk_size=3)
+    assert clearances == expected_clearances(
+        Srtm3HeightMapCollection(hgt_dir=hgt_dir), links
+    )
+    # Each tile was loaded once, however many processes used it, and the
+    # references of the exited processes are dropped
+    assert tile_pool.stats().loads == 2
+    assert tile_pool.stats().references == 0
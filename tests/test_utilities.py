@@ -1,4 +1,22 @@
+from math import isnan
+from random import Random
+
+import pytest
+
 from srtm.utilities import points_on_line, apply_curvature, StraightLineEquation, ElevationProfilePoint, get_clearances
+from srtm.utilities import (
+    points_on_line_array,
+    haversine,
+    haversine_array,
+    apply_curvature_array,
+    get_clearances_array,
+    interpolate_pixels,
+    interpolate_voids,
+    interpolate_voids_array,
+    voids_to_nan,
+    ElevationProfile,
+    NODATA,
+)
 
 
 def test_points_on_line():
@@ -67,3 +85,103 @@ def test_get_clearances():
     ]
     assert get_clearances(profile) == [0, 5, -10, 0]
     assert get_clearances(profile, 1, 1) == [1, 6, -9, 1]
+
+
+def test_points_on_line_array():
+    pytest.importorskip("numpy")
+    random = Random(1)
+    lines = [(0, 0, 2, 2), (2, 2, 0, 0), (0, 0, 0, 0), (0, 0, 5, 0), (0, 0, 0, -5)]
+    lines += [tuple(random.randint(-50, 50) for _ in range(4)) for _ in range(500)]
+    for line in lines:
+        xs, ys = points_on_line_array(*line)
+        assert list(zip(xs.tolist(), ys.tolist())) == points_on_line(*line), line
+
+
+def test_haversine_array():
+    numpy = pytest.importorskip("numpy")
+    latitudes = numpy.array([40.1, -33.7, 0])
+    longitudes = numpy.array([-7.4, 18.5, 0])
+    distances = haversine_array(40, -7, latitudes, longitudes)
+    expected = [haversine(40, -7, lat, lng) for lat, lng in zip(latitudes, longitudes)]
+    assert distances == pytest.approx(expected)
+
+
+def test_apply_curvature_array():
+    numpy = pytest.importorskip("numpy")
+    for count in (7, 6, 1):
+        points = [
+            ElevationProfilePoint(10 + n / 10, -10, n * 10, n * 1000)
+            for n in range(count)
+        ]
+        adjusted = apply_curvature_array(
+            numpy.array([p.latitude for p in points]),
+            numpy.array([p.longitude for p in points]),
+            numpy.array([p.elevation for p in points]),
+        )
+        expected = [p.elevation for p in apply_curvature(points)]
+        assert adjusted == pytest.approx(expected)
+
+
+def test_elevation_profile_conversions():
+    numpy = pytest.importorskip("numpy")
+    profile = ElevationProfile(
+        numpy.array([1.0, 2.0]),
+        numpy.array([3.0, 4.0]),
+        numpy.array([5.0, 6.0]),
+        numpy.array([0.0, 10.0]),
+    )
+    assert profile.to_points() == [
+        ElevationProfilePoint(1.0, 3.0, 5.0, 0.0),
+        ElevationProfilePoint(2.0, 4.0, 6.0, 10.0),
+    ]
+    records = profile.to_records()
+    assert records["elevation"].tolist() == [5.0, 6.0]
+    assert records[1]["distance"] == 10.0
+
+
+def test_get_clearances_array():
+    numpy = pytest.importorskip("numpy")
+    profile = ElevationProfile(
+        numpy.zeros(4),
+        numpy.zeros(4),
+        numpy.array([10.0, 5.0, 20.0, 10.0]),
+        numpy.array([0.0, 1.0, 2.0, 3.0]),
+    )
+    assert get_clearances_array(profile).tolist() == [0, 5, -10, 0]
+    assert get_clearances_array(profile, 1, 1).tolist() == [1, 6, -9, 1]
+
+    single_point = ElevationProfile(*(column[:1] for column in profile))
+    assert get_clearances_array(single_point).tolist() == []
+
+
+def test_interpolate_voids():
+    nan = float("nan")
+    distances = [0.0, 1.0, 2.0, 4.0, 5.0, 6.0]
+    elevations = [nan, 10.0, nan, 40.0, nan, nan]
+    expected = [10.0, 10.0, 20.0, 40.0, 40.0, 40.0]
+    assert interpolate_voids(distances, elevations) == expected
+    assert isnan(interpolate_voids([0.0], [nan])[0])
+
+    numpy = pytest.importorskip("numpy")
+    assert interpolate_voids_array(
+        numpy.array(distances), numpy.array(elevations)
+    ).tolist() == expected
+
+
+def test_interpolate_pixels_voids():
+    numpy = pytest.importorskip("numpy")
+    raster = numpy.arange(16).reshape(4, 4) * 10
+    raster[1, 1] = NODATA
+    assert voids_to_nan(raster[1, :2]).tolist()[0] == 40.0
+    assert isnan(voids_to_nan(raster[1, :2])[1])
+
+    def get_pixels(rows, columns):
+        return raster[numpy.clip(rows, 0, 3), numpy.clip(columns, 0, 3)]
+
+    rows = numpy.array([0.5, 0.0, 2.5])
+    columns = numpy.array([0.5, 1.0, 2.5])
+    values = interpolate_pixels(get_pixels, rows, columns, "bilinear")
+    # Only points which the void contributes to are unknown, so not the point
+    # exactly at the pixel above it
+    assert numpy.isnan(values[0])
+    assert values[1:].tolist() == [10.0, 125.0]
@@ -0,0 +1,142 @@
+import pytest
+
+from srtm.height_map_collection import Srtm3HeightMapCollection
+from srtm.viewshed import compute_viewshed
+
+numpy = pytest.importorskip("numpy")
+
+
+def planar_distances(shape, observer_row, observer_column, pixel_size=30):
+    rows, columns = numpy.indices(shape)
+    return numpy.hypot(rows - observer_row, columns - observer_column) * pixel_size
+
+
+def test_compute_viewshed_flat():
+    elevations = numpy.zeros((21, 31))
+    visible, angles = compute_viewshed(
+        elevations,
+        observer_row=10,
+        observer_column=5,
+        distances=planar_distances(elevations.shape, 10, 5),
+        observer_height=10,
+        apply_earth_curvature=False,
+    )
+    assert visible.all()
+    assert (angles[~numpy.isnan(angles)] < 0).all()
+
+
+def test_compute_viewshed_wall():
+    elevations = numpy.zeros((21, 21))
+    elevations[:, 15] = 100
+    visible, _ = compute_viewshed(
+        elevations,
+        observer_row=10,
+        observer_column=10,
+        distances=planar_distances(elevations.shape, 10, 10),
+        observer_height=10,
+        apply_earth_curvature=False,
+    )
+    assert visible[:, :16].all()
+    assert not visible[:, 16:].any()
+
+
+def test_compute_viewshed_target_height():
+    elevations = numpy.zeros((1, 21))
+    elevations[0, 5] = 20
+    kwargs = dict(
+        observer_row=0,
+        observer_column=0,
+        distances=planar_distances(elevations.shape, 0, 0),
+        observer_height=10,
+        apply_earth_curvature=False,
+    )
+    visible, _ = compute_viewshed(elevations, **kwargs)
+    assert visible[0, :6].all()
+    assert not visible[0, 6:].any()
+
+    # A 60m mast is visible over the ridge 15 pixels further on
+    visible, _ = compute_viewshed(elevations, target_height=60, **kwargs)
+    assert visible[0, 20]
+
+
+def bilinear(elevations, row, column):
+    row1, column1 = int(row), int(column)
+    row2 = min(row1 + 1, elevations.shape[0] - 1)
+    column2 = min(column1 + 1, elevations.shape[1] - 1)
+    row_weight, column_weight = row - row1, column - column1
+    top = (
+        elevations[row1, column1] * (1 - column_weight)
+        + elevations[row1, column2] * column_weight
+    )
+    bottom = (
+        elevations[row2, column1] * (1 - column_weight)
+        + elevations[row2, column2] * column_weight
+    )
+    return top * (1 - row_weight) + bottom * row_weight
+
+
+def test_compute_viewshed_matches_ray_tracing():
+    # Smooth hills, where the approximation should closely match tracing each ray
+    rows, columns = numpy.indices((41, 41))
+    elevations = 50 * numpy.sin(rows / 6) * numpy.cos(columns / 5) + rows
+    distances = planar_distances(elevations.shape, 20, 20)
+    visible, _ = compute_viewshed(
+        elevations, 20, 20, distances, observer_height=5, apply_earth_curvature=False
+    )
+
+    observer_elevation = elevations[20, 20] + 5
+    expected = numpy.ones(elevations.shape, dtype=bool)
+    for row, column in numpy.ndindex(elevations.shape):
+        if (row, column) == (20, 20):
+            continue
+        distance = distances[row, column]
+        target_gradient = (elevations[row, column] - observer_elevation) / distance
+        for fraction in numpy.linspace(0, 1, 100)[1:-1]:
+            elevation = bilinear(
+                elevations, 20 + (row - 20) * fraction, 20 + (column - 20) * fraction
+            )
+            gradient = (elevation - observer_elevation) / (distance * fraction)
+            if gradient > target_gradient:
+                expected[row, column] = False
+                break
+
+    assert (visible == expected).mean() > 0.97
+
+
+def test_collection_get_viewshed(hgt_dir, write_hgt):
+    flat = numpy.zeros((1201, 1201))
+    write_hgt("N40W008", raster=flat)
+    write_hgt("N40W007", raster=flat)
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    viewshed = collection.get_viewshed(
+        latitude=40.5, longitude=-7.01, radius=2000, observer_height=10
+    )
+
+    assert viewshed.visible.shape == viewshed.angles.shape
+    rows, columns = viewshed.visible.shape
+    # Observer is in the centre of the window
+    assert viewshed.geotransform.latitude((rows - 1) / 2) == pytest.approx(40.5)
+    assert viewshed.geotransform.longitude((columns - 1) / 2) == pytest.approx(
+        -7.01, abs=1 / 1200
+    )
+    # Corners are outside the radius, but the edges are (nearly) within it
+    assert not viewshed.visible[0, 0]
+    assert numpy.isnan(viewshed.angles[0, 0])
+    assert viewshed.visible[1, columns // 2]
+    assert viewshed.visible[rows // 2, 1]
+    assert viewshed.visible[rows // 2, -2]
+
+
+def test_collection_get_viewshed_curvature(hgt_dir, write_hgt):
+    write_hgt("N40W008", raster=numpy.zeros((1201, 1201)))
+    collection = Srtm3HeightMapCollection(hgt_dir=hgt_dir)
+    # Over flat ground the horizon is ~3.6km away for a 1m observer
+    viewshed = collection.get_viewshed(
+        latitude=40.5, longitude=-7.5, radius=10000, observer_height=1
+    )
+    rows, columns = viewshed.visible.shape
+    middle_row = viewshed.visible[rows // 2]
+    visible_columns = numpy.flatnonzero(middle_row)
+    visible_width = (visible_columns[-1] - visible_columns[0]) / 2
+    visible_distance = visible_width * 92 * 0.76
+    assert 2500 < visible_distance < 5000
@@ -0,0 +1,57 @@
+import pytest
+
+from srtm.utilities import NODATA
+from srtm.voids import fill_voids
+
+
+def test_fill_voids_nearest():
+    numpy = pytest.importorskip("numpy")
+    raster = numpy.array(
+        [
+            [10, 20, 30, 40, 50],
+            [10, NODATA, NODATA, NODATA, 50],
+            [10, NODATA, NODATA, NODATA, 50],
+            [10, NODATA, NODATA, NODATA, 50],
+            [10, 20, 30, 40, 50],
+        ],
+        dtype=">i2",
+    )
+    filled = fill_voids(raster)
+    assert filled.dtype == "int16"
+    # Edges first, from the nearest neighbour (above, below, left then right)
+    # then the centre from the filled pixel above it
+    assert filled.tolist() == [
+        [10, 20, 30, 40, 50],
+        [10, 20, 30, 40, 50],
+        [10, 10, 30, 50, 50],
+        [10, 20, 30, 40, 50],
+        [10, 20, 30, 40, 50],
+    ]
+    # The original raster is untouched
+    assert (raster == NODATA).sum() == 9
+
+
+def test_fill_voids_idw():
+    numpy = pytest.importorskip("numpy")
+    raster = numpy.full((5, 5), 100, dtype=numpy.int16)
+    raster[:, 3:] = 200
+    raster[2, 2] = NODATA
+    # Weighted 1 for the 4 neighbours & 0.5 for the 4 diagonals
+    expected = (3 * 100 + 200 + 0.5 * (2 * 100 + 2 * 200)) / 6
+    assert fill_voids(raster, "idw")[2, 2] == round(expected) == 133
+
+    # Large voids are filled in from all sides
+    raster = numpy.full((50, 60), NODATA, dtype=numpy.int16)
+    raster[0] = 10
+    raster[-1] = 20
+    filled = fill_voids(raster, "idw")
+    assert (filled != NODATA).all()
+    assert filled.min() == 10 and filled.max() == 20
+
+
+def test_fill_voids_all_void():
+    numpy = pytest.importorskip("numpy")
+    raster = numpy.full((3, 3), NODATA, dtype=numpy.int16)
+    assert (fill_voids(raster) == NODATA).all()
+    with pytest.raises(ValueError):
+        fill_voids(raster, "kriging")